@@ -4,18 +4,59 @@ Flask PDF OCR Service
 Extracts text from PDF files using PyMuPDF and pdfplumber
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Request, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 import fitz  # PyMuPDF
 import pdfplumber
 import PyPDF2
 import io
+import json
+import contextlib
+import functools
 import logging
 import os
+import threading
+import time
 from werkzeug.utils import secure_filename
 import tempfile
 
+from extraction_cache import ExtractionCache, hash_stream
+from metrics import StageTimings, observe_extraction, observe_cache_hit, observe_coalesced, render_metrics
+from coalescing import SingleFlight
+from job_queue import JobQueue, JobStore, QueueFull, JOBS_DIR, DONE, FAILED
+from ocr import get_ocr_engine, ocr_status
+from incremental import extract_pages_incremental
+from near_duplicates import iter_near_unique_pages, remove_near_duplicate_pages, NEAR_DUPLICATE_THRESHOLD
+from probe import probe_document, document_metadata
+from pdf_source import PdfSource, upload_buffer, open_fitz, source_size, INGEST_SPILL_THRESHOLD
+from memory_budget import MemoryBudget, OUTPUT_SPILL_THRESHOLD
+from page_engine import extract_pages, extract_documents, iter_pages_adaptive, iter_pages_pymupdf, count_pages, shutdown_pools, BACKEND_NAMES, STRUCTURE_BACKEND, EXTRACTION_WORKERS, EXTRACTION_SHARD_SIZE
+from structure import build_sections, iter_blocks
+from chunking import chunk_blocks, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+from text_cleaning import (
+    clean_extracted_text,
+    iter_unique_pages,
+    remove_duplicate_pages,
+    detect_repetitive_content,
+    validate_text_quality,
+    text_cleaner,
+)
+
+class IngestRequest(Request):
+    """Buffers file uploads in memory, spilling large ones to one temp file"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return upload_buffer(total_content_length)
+    
+    @property
+    def max_content_length(self):
+        # A batch carries many files, so it gets its own request size limit
+        if self.path == '/extract-batch':
+            return BATCH_MAX_CONTENT_LENGTH
+        return super().max_content_length
+
 app = Flask(__name__)
+app.request_class = IngestRequest
 CORS(app)  # Enable CORS for Laravel integration
 
 # Configure logging
@@ -26,6 +67,15 @@ logger = logging.getLogger(__name__)
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'pdf'}
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+CACHE_ENABLED = os.getenv('PDF_CACHE_ENABLED', 'true').lower() == 'true'
+CACHE_DIR = os.getenv('PDF_CACHE_DIR', 'cache')
+CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024))  # 256MB on disk
+PAGE_CACHE_DIR = os.getenv('PDF_PAGE_CACHE_DIR', 'page_cache')
+PAGE_CACHE_MAX_BYTES = int(os.getenv('PDF_PAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024))  # 256MB on disk
+PAGE_CACHE_MIN_PAGES = int(os.getenv('PDF_PAGE_CACHE_MIN_PAGES', 50))  # Smaller documents are re-extracted whole
+SLOW_DOCUMENT_SECONDS = float(os.getenv('PDF_SLOW_DOCUMENT_SECONDS', 5))  # Log stage breakdown above this
+BATCH_MAX_FILES = int(os.getenv('PDF_BATCH_MAX_FILES', 50))
+BATCH_MAX_CONTENT_LENGTH = int(os.getenv('PDF_BATCH_MAX_CONTENT_LENGTH', 128 * 1024 * 1024))  # 128MB per batch
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
@@ -33,308 +83,329 @@ app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 # Create upload folder if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Extraction results keyed by upload content, shared by both extract endpoints
+extraction_cache = ExtractionCache(CACHE_DIR, CACHE_MAX_BYTES) if CACHE_ENABLED else None
+
+# Extracted pages keyed by page fingerprint, so edited re-uploads only
+# re-extract the pages that changed
+page_cache = ExtractionCache(PAGE_CACHE_DIR, PAGE_CACHE_MAX_BYTES) if CACHE_ENABLED else None
+
+# Extractions in progress, shared by identical requests that arrive meanwhile
+in_flight = SingleFlight()
+
 def allowed_file(filename):
     """Check if the uploaded file is a PDF"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def clean_extracted_text(text):
-    """Clean up extracted text by removing excessive whitespace and artifacts"""
-    import re
-    
-    if not text:
-        return ""
-    
-    # Remove excessive whitespace
-    text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)  # Max 2 consecutive newlines
-    text = re.sub(r'[ \t]+', ' ', text)  # Normalize spaces
-    
-    # Remove common OCR artifacts
-    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)  # Control characters
-    
-    # Remove lines that are just page numbers or headers repeated
-    lines = text.split('\n')
-    cleaned_lines = []
-    
-    for line in lines:
-        stripped = line.strip()
-        # Skip empty lines
-        if not stripped:
-            cleaned_lines.append(line)
-            continue
-            
-        # Skip if line is just numbers (likely page numbers)
-        if stripped.isdigit() and len(stripped) <= 3:
-            continue
-            
-        # Skip very short repetitive lines
-        if len(stripped) <= 2:
-            continue
-            
-        cleaned_lines.append(line)
-    
-    return '\n'.join(cleaned_lines)
+def join_page_texts(page_texts):
+    """Combine pages with proper formatting"""
+    return '\n\n'.join(
+        f"--- Page {page_data['page_num']} ---\n{page_data['text']}"
+        for page_data in page_texts
+    )
+
+def deduplicate_pages(page_texts, near_duplicate_threshold=None):
+    """Remove duplicate pages; near-duplicates too when a similarity threshold is given"""
+    if near_duplicate_threshold is not None:
+        return remove_near_duplicate_pages(page_texts, near_duplicate_threshold)
+    return remove_duplicate_pages(page_texts)
+
+def wants_tables(form):
+    """Whether the caller asked for structured tables next to the text"""
+    return form.get('extract_tables', 'false').lower() == 'true'
 
-def remove_duplicate_pages(page_texts):
-    """Remove duplicate pages based on content similarity"""
-    if len(page_texts) <= 1:
-        return page_texts
+def extraction_options(near_duplicate_threshold, extract_tables=False):
+    """Options that change an auto extraction result, for its cache key"""
+    options = {'near_duplicate_threshold': near_duplicate_threshold}
+    if extract_tables:
+        options['extract_tables'] = True
+    return options
+
+def get_near_duplicate_threshold(form):
+    """
+    Read the near-duplicate options from a request form.
+    Returns None for exact duplicate removal only; raises ValueError on a bad threshold.
+    """
+    if form.get('near_duplicates', 'false').lower() != 'true':
+        return None
     
-    unique_pages = []
-    seen_content = set()
+    threshold = float(form.get('similarity_threshold', NEAR_DUPLICATE_THRESHOLD))
+    if not 0 < threshold <= 1:
+        raise ValueError('similarity_threshold must be between 0 and 1')
+    return threshold
+
+def get_chunk_options(form):
+    """
+    Read max_tokens and overlap_tokens from a request form.
+    Raises ValueError when they are not integers or the overlap does not fit.
+    """
+    max_tokens = int(form.get('max_tokens', CHUNK_MAX_TOKENS))
+    overlap_tokens = int(form.get('overlap_tokens', CHUNK_OVERLAP_TOKENS))
+    if max_tokens < 50:
+        raise ValueError('max_tokens must be at least 50')
+    if not 0 <= overlap_tokens <= max_tokens // 2:
+        raise ValueError('overlap_tokens must be between 0 and half of max_tokens')
+    return max_tokens, overlap_tokens
+
+def wants_memory_bounded(form):
+    """Whether the caller asked for memory-bounded extraction"""
+    return form.get('memory_bounded', 'false').lower() == 'true'
+
+def wants_profile(form):
+    """Whether the caller asked for the stage timing breakdown in the response"""
+    return form.get('profile', 'false').lower() == 'true'
+
+def cached_response(cached, timings, profile):
+    """
+    A result served from the cache; its profile covers the lookup alone and
+    says so with cache_hit
+    """
+    response = dict(cached, cached=True)
+    if profile:
+        timings.finish()
+        response['profile'] = dict(timings.as_dict(), cache_hit=True)
+    return response
+
+def extraction_profile(timings):
+    """Profile of a result that was extracted for this request"""
+    return dict(timings.as_dict(), cache_hit=False)
+
+def record_extraction(endpoint, filename, timings):
+    """Finish a document's timings, feed /metrics and log it if it was slow"""
+    elapsed = timings.finish()
+    observe_extraction(endpoint, timings)
     
-    for page_data in page_texts:
-        # Create a signature of the page content
-        content = page_data['text'].strip()
-        
-        # Skip empty pages
-        if not content:
-            continue
+    if elapsed >= SLOW_DOCUMENT_SECONDS:
+        logger.warning(f"Slow document {filename}: {elapsed:.2f}s ({timings.summary()})")
+
+def extract_text_pymupdf(pdf_source, workers=None, shard_size=None, near_duplicate_threshold=None, timings=None, structured=False):
+    """
+    Extract text using PyMuPDF (fitz) - Best for most PDFs.
+    With structured=True the same pass also reads font sizes and returns
+    (text, sections), sections being the heading tree of build_sections().
+    """
+    timings = timings or StageTimings()
+    try:
+        backend = STRUCTURE_BACKEND if structured else 'pymupdf'
+        page_texts = extract_pages(pdf_source, backend, workers, shard_size, timings=timings)
         
-        # Create a hash of first 500 chars (or full content if shorter)
-        content_hash = hash(content[:500])
+        # Remove duplicate pages
+        with timings.measure('dedupe'):
+            page_texts = deduplicate_pages(page_texts, near_duplicate_threshold)
         
-        # Check for exact duplicates
-        if content_hash not in seen_content:
-            seen_content.add(content_hash)
-            unique_pages.append(page_data)
-        else:
-            logger.info(f"Skipping duplicate page {page_data['page_num']}")
-    
-    return unique_pages
-
-def detect_repetitive_content(text, min_repetitions=3):
-    """Detect and remove repetitive content patterns"""
-    import re
-    from collections import Counter
-    
-    lines = text.split('\n')
-    
-    # Count line occurrences
-    line_counts = Counter(line.strip() for line in lines if line.strip())
-    
-    # Find lines that repeat excessively
-    repetitive_lines = {
-        line for line, count in line_counts.items() 
-        if count >= min_repetitions and len(line) > 10
-    }
-    
-    if not repetitive_lines:
+        text = join_page_texts(page_texts).strip()
+        if structured:
+            with timings.measure('structure'):
+                return text, build_sections(page_texts)
         return text
+    except Exception as e:
+        logger.error(f"PyMuPDF extraction failed: {str(e)}")
+        return (None, []) if structured else None
+
+def extract_text_pymupdf_bounded(pdf_source, near_duplicate_threshold=None, timings=None, budget=None):
+    """
+    Memory-bounded PyMuPDF extraction: pages are read one at a time and
+    written straight to a spooled file, so neither the page list nor the
+    joined text is built in memory. Stops at the end of the page that used up
+    the RSS budget, returning what was extracted so far with partial=True.
+    The finished text is still read back into one string for the JSON
+    response and the cache: the budget bounds extraction, not the size of
+    the text returned.
+    """
+    timings = timings or StageTimings()
+    budget = budget or MemoryBudget()
+    page_count = count_pages(pdf_source)
     
-    # Remove excessive repetitions
-    cleaned_lines = []
-    line_seen_count = {}
+    source = iter_pages_pymupdf(pdf_source, timings)
+    if near_duplicate_threshold is not None:
+        pages = iter_near_unique_pages(source, near_duplicate_threshold)
+    else:
+        pages = iter_unique_pages(source)
     
-    for line in lines:
-        stripped = line.strip()
+    pages_extracted = 0
+    last_page = 0
+    partial = False
+    with tempfile.SpooledTemporaryFile(max_size=OUTPUT_SPILL_THRESHOLD, mode='w+', encoding='utf-8') as output:
+        try:
+            for page_data in pages:
+                if pages_extracted:
+                    output.write('\n\n')
+                output.write(f"--- Page {page_data['page_num']} ---\n{page_data['text']}")
+                pages_extracted += 1
+                last_page = page_data['page_num']
+                
+                if budget.exceeded() and last_page < page_count:
+                    partial = True
+                    break
+        finally:
+            pages.close()
+            source.close()
         
-        if stripped in repetitive_lines:
-            # Keep only first few occurrences
-            count = line_seen_count.get(stripped, 0)
-            line_seen_count[stripped] = count + 1
-            
-            if count < 2:  # Keep max 2 occurrences
-                cleaned_lines.append(line)
-            else:
-                logger.info(f"Removing repetitive content: {stripped[:50]}...")
-        else:
-            cleaned_lines.append(line)
+        output.seek(0)
+        text = output.read().strip()
+    
+    if partial:
+        logger.warning(f"Memory budget reached after page {last_page} of {page_count}, returning partial text")
     
-    return '\n'.join(cleaned_lines)
+    return {
+        'text': text,
+        'method': 'PyMuPDF',
+        'success': bool(text),
+        'partial': partial,
+        'pages_extracted': pages_extracted,
+        'last_page': last_page,
+        'page_count': page_count,
+        'memory': budget.as_dict()
+    }
 
-def validate_text_quality(text):
-    """Check if extracted text is of good quality"""
-    if not text or len(text.strip()) < 10:
-        return False, "Text too short"
+def extract_chunks(pdf_source, max_tokens=None, overlap_tokens=None, near_duplicate_threshold=None, timings=None):
+    """
+    Extract a document and split it into quiz-sized chunks in the same pass.
+    Pages are read with their font metadata so chunks can start at headings;
+    pages PyMuPDF finds no text on go through the adaptive pipeline (OCR
+    included) and are chunked as plain text.
+    """
+    timings = timings or StageTimings()
     
-    # Check for excessive repetition
-    lines = [l.strip() for l in text.split('\n') if l.strip()]
-    if not lines:
-        return False, "No content lines"
+    # An empty or non-PDF upload fails like it does on the other endpoints
+    try:
+        page_count = count_pages(pdf_source)
+    except Exception as e:
+        logger.error(f"Could not open PDF for chunking: {str(e)}")
+        return {'success': False, 'chunks': [], 'method': None}
     
-    from collections import Counter
-    line_counts = Counter(lines)
-    most_common = line_counts.most_common(1)[0]
+    page_texts = extract_pages(pdf_source, STRUCTURE_BACKEND, timings=timings)
+    for page_data in page_texts:
+        page_data['method'] = BACKEND_NAMES['pymupdf']
     
-    # If any line repeats more than 50% of total lines, it's likely garbage
-    if len(lines) > 10 and most_common[1] > len(lines) * 0.5:
-        return False, f"Excessive repetition detected: '{most_common[0][:50]}...'"
+    extracted = {page_data['page_num'] - 1 for page_data in page_texts}
+    missing = [page_num for page_num in range(page_count) if page_num not in extracted]
+    if missing:
+        page_texts += extract_pages(pdf_source, 'adaptive', timings=timings, pages=missing)
+        page_texts.sort(key=lambda page_data: page_data['page_num'])
     
-    # Check for reasonable character distribution
-    alpha_chars = sum(c.isalpha() for c in text)
-    if len(text) > 0 and alpha_chars / len(text) < 0.3:
-        return False, "Too few alphabetic characters"
+    # Remove duplicate pages
+    with timings.measure('dedupe'):
+        page_texts = deduplicate_pages(page_texts, near_duplicate_threshold)
     
-    return True, "Quality OK"
-
-def extract_text_pymupdf(pdf_path):
-    """Extract text using PyMuPDF (fitz) - Best for most PDFs"""
-    try:
-        doc = fitz.open(pdf_path)
-        text = ""
-        page_texts = []
-        
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            page_text = page.get_text()
-            
-            # Clean up the page text
-            page_text = clean_extracted_text(page_text)
-            
-            # Only add non-empty pages
-            if page_text.strip():
-                page_texts.append({
-                    'page_num': page_num + 1,
-                    'text': page_text.strip()
-                })
-        
-        doc.close()
-        
-        # Remove duplicate pages
-        page_texts = remove_duplicate_pages(page_texts)
-        
-        # Combine pages with proper formatting
-        for page_data in page_texts:
-            text += f"--- Page {page_data['page_num']} ---\n"
-            text += page_data['text']
-            text += "\n\n"
-        
-        return text.strip()
-    except Exception as e:
-        logger.error(f"PyMuPDF extraction failed: {str(e)}")
-        return None
+    method = summarize_page_methods(page_texts)
+    with timings.measure('chunking'):
+        chunks = chunk_blocks(iter_blocks(page_texts), max_tokens, overlap_tokens)
+    
+    return {
+        'success': bool(chunks),
+        'chunks': chunks,
+        'method': method
+    }
 
-def extract_text_pdfplumber(pdf_path):
+def extract_text_pdfplumber(pdf_source, workers=None, shard_size=None, near_duplicate_threshold=None, timings=None):
     """Extract text using pdfplumber - Good for tables and complex layouts"""
+    timings = timings or StageTimings()
     try:
-        text = ""
-        page_texts = []
-        
-        with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages):
-                page_text = page.extract_text()
-                
-                if page_text:
-                    # Clean up the page text
-                    page_text = clean_extracted_text(page_text)
-                    
-                    if page_text.strip():
-                        page_texts.append({
-                            'page_num': page_num + 1,
-                            'text': page_text.strip()
-                        })
+        page_texts = extract_pages(pdf_source, 'pdfplumber', workers, shard_size, timings=timings)
         
         # Remove duplicate pages
-        page_texts = remove_duplicate_pages(page_texts)
-        
-        # Combine pages with proper formatting
-        for page_data in page_texts:
-            text += f"--- Page {page_data['page_num']} ---\n"
-            text += page_data['text']
-            text += "\n\n"
+        with timings.measure('dedupe'):
+            page_texts = deduplicate_pages(page_texts, near_duplicate_threshold)
         
         # Remove repetitive content
-        text = detect_repetitive_content(text.strip())
+        with timings.measure('finalize'):
+            text = detect_repetitive_content(join_page_texts(page_texts).strip())
         
         return text.strip()
     except Exception as e:
         logger.error(f"pdfplumber extraction failed: {str(e)}")
         return None
 
-def extract_text_pypdf2(pdf_path):
+def extract_text_pypdf2(pdf_source, workers=None, shard_size=None, near_duplicate_threshold=None, timings=None):
     """Extract text using PyPDF2 - Fallback option"""
+    timings = timings or StageTimings()
     try:
-        text = ""
-        page_texts = []
-        
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                page_text = page.extract_text()
-                
-                if page_text:
-                    # Clean up the page text
-                    page_text = clean_extracted_text(page_text)
-                    
-                    if page_text.strip():
-                        page_texts.append({
-                            'page_num': page_num + 1,
-                            'text': page_text.strip()
-                        })
+        page_texts = extract_pages(pdf_source, 'pypdf2', workers, shard_size, timings=timings)
         
         # Remove duplicate pages
-        page_texts = remove_duplicate_pages(page_texts)
-        
-        # Combine pages with proper formatting
-        for page_data in page_texts:
-            text += f"--- Page {page_data['page_num']} ---\n"
-            text += page_data['text']
-            text += "\n\n"
+        with timings.measure('dedupe'):
+            page_texts = deduplicate_pages(page_texts, near_duplicate_threshold)
         
         # Remove repetitive content
-        text = detect_repetitive_content(text.strip())
+        with timings.measure('finalize'):
+            text = detect_repetitive_content(join_page_texts(page_texts).strip())
         
         return text.strip()
     except Exception as e:
         logger.error(f"PyPDF2 extraction failed: {str(e)}")
         return None
 
-def extract_text_from_pdf(pdf_path):
-    """Try multiple extraction methods for best results"""
-    
-    # Method 1: Try PyMuPDF first (usually best)
-    text = extract_text_pymupdf(pdf_path)
-    if text and len(text.strip()) > 10:
-        # Validate quality
-        is_valid, quality_msg = validate_text_quality(text)
-        
-        if is_valid:
-            # Final cleanup: remove any remaining repetitive content
-            text = detect_repetitive_content(text)
-            
-            return {
-                'text': text,
-                'method': 'PyMuPDF',
-                'success': True,
-                'quality': quality_msg
-            }
+def summarize_page_methods(page_texts):
+    """Describe which backends produced the pages, e.g. 'PyMuPDF+pdfplumber'"""
+    used = {page_data['method'] for page_data in page_texts}
+    # Text backends in cascade order, then OCR engines
+    names = [name for name in BACKEND_NAMES.values() if name in used]
+    names += sorted(used - set(BACKEND_NAMES.values()))
+    return '+'.join(names) or 'none'
+
+def extract_text_from_pdf(pdf_source, near_duplicate_threshold=None, progress=None, timings=None, tables=False):
+    """
+    Extract text page by page: every page goes through PyMuPDF first and only
+    pages that fail the quality check are re-extracted with pdfplumber/PyPDF2.
+    Image-only pages are OCRed instead, when an OCR engine is available.
+    With tables=True, ruled tables are also returned as structured rows.
+    Callers have already missed the result cache; documents of at least
+    PAGE_CACHE_MIN_PAGES pages then take the pages already extracted in an
+    earlier upload from the page cache.
+    """
+    backend = 'tables' if tables else 'adaptive'
+    reuse = None
+    try:
+        if page_cache and count_pages(pdf_source, backend) >= PAGE_CACHE_MIN_PAGES:
+            page_texts, pages_reused, pages_recomputed = extract_pages_incremental(
+                pdf_source, backend, page_cache, progress=progress, timings=timings
+            )
+            reuse = {'pages_reused': pages_reused, 'pages_recomputed': pages_recomputed}
         else:
-            logger.warning(f"PyMuPDF extraction quality issue: {quality_msg}")
+            page_texts = extract_pages(pdf_source, backend, progress=progress, timings=timings)
+    except Exception as e:
+        logger.error(f"Adaptive extraction failed: {str(e)}")
+        page_texts = []
     
-    # Method 2: Try pdfplumber (good for complex layouts)
-    text = extract_text_pdfplumber(pdf_path)
-    if text and len(text.strip()) > 10:
-        is_valid, quality_msg = validate_text_quality(text)
-        
-        if is_valid:
-            text = detect_repetitive_content(text)
-            
-            return {
-                'text': text,
-                'method': 'pdfplumber',
-                'success': True,
-                'quality': quality_msg
-            }
-        else:
-            logger.warning(f"pdfplumber extraction quality issue: {quality_msg}")
+    result = build_text_result(page_texts, near_duplicate_threshold, timings, tables)
+    if reuse and result['success']:
+        result.update(reuse)
+    return result
+
+def build_text_result(page_texts, near_duplicate_threshold=None, timings=None, tables=False):
+    """Deduplicate, join and validate adaptively extracted pages"""
+    timings = timings or StageTimings()
+    
+    # Remove duplicate pages
+    with timings.measure('dedupe'):
+        page_texts = deduplicate_pages(page_texts, near_duplicate_threshold)
+    
+    page_tables = [table for page_data in page_texts for table in page_data.get('tables', ())]
     
-    # Method 3: Try PyPDF2 as fallback
-    text = extract_text_pypdf2(pdf_path)
-    if text and len(text.strip()) > 10:
-        is_valid, quality_msg = validate_text_quality(text)
+    text = join_page_texts(page_texts).strip()
+    if text and len(text) > 10:
+        # Validate quality of the combined document and remove any remaining
+        # repetitive content, sharing one pass over its lines
+        with timings.measure('finalize'):
+            is_valid, quality_msg, text = text_cleaner.finalize(text)
         
-        if is_valid:
-            text = detect_repetitive_content(text)
-            
-            return {
+        # Cell text rarely reads as prose; found tables are a result of their own
+        if is_valid or page_tables:
+            result = {
                 'text': text,
-                'method': 'PyPDF2',
+                'method': summarize_page_methods(page_texts),
                 'success': True,
-                'quality': quality_msg
+                'quality': quality_msg,
+                'page_methods': {
+                    page_data['page_num']: page_data['method'] for page_data in page_texts
+                }
             }
+            if tables:
+                result['tables'] = page_tables
+            return result
         else:
-            logger.warning(f"PyPDF2 extraction quality issue: {quality_msg}")
+            logger.warning(f"Extraction quality issue: {quality_msg}")
     
     return {
         'text': '',
@@ -343,16 +414,191 @@ def extract_text_from_pdf(pdf_path):
         'error': 'Could not extract quality text from PDF'
     }
 
+def build_text_response(result):
+    """Response body for a successful extract_text_from_pdf result"""
+    response = {
+        'success': True,
+        'text': result['text'],
+        'method': result['method'],
+        'char_count': len(result['text']),
+        'word_count': len(result['text'].split()),
+        'line_count': len(result['text'].splitlines()),
+        'quality': result.get('quality', 'Unknown'),
+        'page_methods': result['page_methods']
+    }
+    if 'tables' in result:
+        response['tables'] = result['tables']
+        response['table_count'] = len(result['tables'])
+    if 'pages_reused' in result:
+        response['pages_reused'] = result['pages_reused']
+        response['pages_recomputed'] = result['pages_recomputed']
+    return response
+
+# Facts about one extraction run rather than the document: a cache hit did not reuse or recompute anything
+RUN_FIELDS = ('pages_reused', 'pages_recomputed')
+
+def cache_entry(response):
+    """A response as stored in the result cache, the same whichever endpoint stored it"""
+    return {key: value for key, value in response.items() if key not in RUN_FIELDS}
+
+def build_bounded_response(result):
+    """Response body for a successful extract_text_pymupdf_bounded result"""
+    return {
+        'success': True,
+        'text': result['text'],
+        'method': result['method'],
+        'char_count': len(result['text']),
+        'word_count': len(result['text'].split()),
+        'line_count': len(result['text'].splitlines()),
+        'partial': result['partial'],
+        'pages_extracted': result['pages_extracted'],
+        'last_page': result['last_page'],
+        'page_count': result['page_count'],
+        'memory': result['memory']
+    }
+
+def run_extraction_job(pdf_path, options, progress):
+    """Job runner: the /extract-text pipeline on a saved upload"""
+    timings = StageTimings()
+    timings.bytes = source_size(pdf_path)
+    result = extract_text_from_pdf(
+        pdf_path, options.get('near_duplicate_threshold'), progress, timings,
+        options.get('extract_tables', False)
+    )
+    record_extraction('jobs', os.path.basename(pdf_path), timings)
+    if not result['success']:
+        raise RuntimeError(result.get('error', 'Extraction failed'))
+    
+    response = build_text_response(result)
+    if extraction_cache and options.get('cache_key'):
+        extraction_cache.put(options['cache_key'], cache_entry(response))
+    return dict(response, cached=False)
+
+# Background extraction jobs, started on first use so that only the process
+# serving requests (not the debug reloader's parent) resumes stored jobs
+job_queue = None
+job_queue_lock = threading.Lock()
+
+# Set once a worker starts shutting down, to fail its readiness probe
+shutting_down = threading.Event()
+
+def get_job_queue():
+    global job_queue
+    with job_queue_lock:
+        if job_queue is None:
+            job_queue = JobQueue(JobStore(JOBS_DIR), run_extraction_job)
+            job_queue.recover()
+    return job_queue
+
+def describe_job(job):
+    """Public view of a stored job"""
+    pages_total = job['pages_total']
+    response = {
+        'success': job['status'] != FAILED,
+        'job_id': job['id'],
+        'status': job['status'],
+        'filename': job['filename'],
+        'progress': {
+            'pages_done': job['pages_done'],
+            'pages_total': pages_total,
+            'percent': round(100 * job['pages_done'] / pages_total, 1) if pages_total else None
+        },
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at']
+    }
+    
+    if job['status'] == DONE:
+        response['progress']['percent'] = 100.0
+        response['result'] = job['result']
+    elif job['status'] == FAILED:
+        response['error'] = job['error']
+    
+    return response
+
+def upload_hash(file):
+    """SHA-256 of an uploaded file, computed once per request"""
+    hashes = g.setdefault('upload_hashes', {})
+    if id(file) not in hashes:
+        hashes[id(file)] = hash_stream(file.stream)
+    return hashes[id(file)]
+
+def coalesce_uploads(endpoint):
+    """
+    Single-flight decorator for single-file extract endpoints. Requests for
+    the same upload (by SHA-256) with the same form fields, arriving while
+    one of them is being extracted, wait for it and get its response with
+    coalesced=true instead of extracting the document again.
+    """
+    
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            file = request.files.get('file')
+            if file is None or not allowed_file(file.filename):
+                return view(*args, **kwargs)
+            
+            key = (endpoint, upload_hash(file), tuple(sorted(request.form.items(multi=True))))
+            
+            def extract():
+                # Responses are not shared between threads; their JSON body is
+                response = app.make_response(view(*args, **kwargs))
+                return response.get_json(), response.status_code
+            
+            (body, status), coalesced = in_flight.do(key, extract)
+            if coalesced:
+                observe_coalesced(endpoint)
+                body = dict(body, coalesced=True)
+            return jsonify(body), status
+        return wrapper
+    return decorator
+
 @app.route('/', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
         'service': 'PDF OCR Service',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'extraction': {
+            'workers': EXTRACTION_WORKERS,
+            'shard_size': EXTRACTION_SHARD_SIZE
+        },
+        'ingest': {
+            'spill_threshold': INGEST_SPILL_THRESHOLD
+        },
+        'cache': extraction_cache.stats() if extraction_cache else {'enabled': False},
+        'page_cache': page_cache.stats() if page_cache else {'enabled': False},
+        'ocr': ocr_status(),
+        'coalescing': in_flight.stats(),
+        # Only once started: get_job_queue() would create the job store
+        'jobs': job_queue.stats() if job_queue is not None else {'started': False}
     })
 
+@app.route('/health/live', methods=['GET'])
+def liveness():
+    """Liveness probe: the process answers requests"""
+    return jsonify({'status': 'alive'})
+
+@app.route('/health/ready', methods=['GET'])
+def readiness():
+    """Readiness probe: the job store is reachable and the worker is not shutting down"""
+    if shutting_down.is_set():
+        return jsonify({'status': 'shutting_down'}), 503
+    try:
+        get_job_queue().store.counts()
+    except Exception as e:
+        logger.error(f"Readiness check failed: {str(e)}")
+        return jsonify({'status': 'not_ready', 'error': str(e)}), 503
+    return jsonify({'status': 'ready'})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Extraction timings and counters in the Prometheus text format"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/extract-text', methods=['POST'])
+@coalesce_uploads('extract-text')
 def extract_text():
     """Extract text from uploaded PDF file"""
     
@@ -380,27 +626,61 @@ def extract_text():
         }), 400
     
     try:
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            file.save(temp_file.name)
-            temp_path = temp_file.name
-        
-        # Extract text from PDF
-        result = extract_text_from_pdf(temp_path)
+        near_duplicate_threshold = get_near_duplicate_threshold(request.form)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid similarity_threshold: {str(e)}'
+        }), 400
+    
+    profile = wants_profile(request.form)
+    extract_tables = wants_tables(request.form)
+    memory_bounded = wants_memory_bounded(request.form)
+    
+    # Memory-bounded extraction reads PyMuPDF text only; tables need pdfplumber
+    if memory_bounded and extract_tables:
+        return jsonify({
+            'success': False,
+            'error': 'memory_bounded cannot be combined with extract_tables'
+        }), 400
+    
+    try:
+        # Serve repeat uploads straight from the cache
+        timings = StageTimings()
+        cache_key = None
+        if extraction_cache:
+            with timings.measure('cache_lookup'):
+                cache_key = ExtractionCache.make_key(
+                    upload_hash(file), 'bounded' if memory_bounded else 'auto',
+                    extraction_options(near_duplicate_threshold, extract_tables)
+                )
+                cached = extraction_cache.get(cache_key)
+            if cached is not None:
+                observe_cache_hit('extract-text')
+                return jsonify(cached_response(cached, timings, profile))
         
-        # Clean up temporary file
-        os.unlink(temp_path)
+        # Extract text straight from the uploaded bytes
+        with PdfSource.from_upload(file) as pdf_source:
+            timings.bytes = pdf_source.size
+            if memory_bounded:
+                result = extract_text_pymupdf_bounded(pdf_source, near_duplicate_threshold, timings)
+            else:
+                result = extract_text_from_pdf(
+                    pdf_source, near_duplicate_threshold, timings=timings, tables=extract_tables
+                )
+        record_extraction('extract-text', file.filename, timings)
         
         if result['success']:
-            return jsonify({
-                'success': True,
-                'text': result['text'],
-                'method': result['method'],
-                'char_count': len(result['text']),
-                'word_count': len(result['text'].split()),
-                'line_count': len(result['text'].splitlines()),
-                'quality': result.get('quality', 'Unknown')
-            })
+            response = build_bounded_response(result) if memory_bounded else build_text_response(result)
+            
+            # A partial result is down to memory pressure at the time, not the document
+            if cache_key and not response.get('partial'):
+                extraction_cache.put(cache_key, cache_entry(response))
+            
+            response = dict(response, cached=False)
+            if profile:
+                response['profile'] = extraction_profile(timings)
+            return jsonify(response)
         else:
             return jsonify({
                 'success': False,
@@ -409,17 +689,227 @@ def extract_text():
             
     except Exception as e:
         logger.error(f"Error processing PDF: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Internal server error: {str(e)}'
+        }), 500
+
+@app.route('/extract-batch', methods=['POST'])
+def extract_batch():
+    """
+    Extract text from many uploaded PDFs in one request.
+    Files are sent as repeated 'files' (or 'files[]') fields. Every file gets
+    an entry in 'results', in upload order, shaped like an /extract-text
+    response plus its filename; one bad file does not fail the batch.
+    """
+    started = time.perf_counter()
+    
+    files = request.files.getlist('files') + request.files.getlist('files[]')
+    if not files:
+        return jsonify({'success': False, 'error': 'No files provided'}), 400
+    
+    if len(files) > BATCH_MAX_FILES:
+        return jsonify({
+            'success': False,
+            'error': f'Too many files: {len(files)} (max {BATCH_MAX_FILES})'
+        }), 400
+    
+    try:
+        near_duplicate_threshold = get_near_duplicate_threshold(request.form)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid similarity_threshold: {str(e)}'}), 400
+    
+    profile = wants_profile(request.form)
+    extract_tables = wants_tables(request.form)
+    
+    try:
+        results = [None] * len(files)
+        pending = []  # (index, cache_key, pdf_source, timings) still to extract
+        
+        with contextlib.ExitStack() as stack:
+            # Answer what we can from the cache and wrap the rest
+            for index, file in enumerate(files):
+                if file.filename == '' or not allowed_file(file.filename):
+                    results[index] = {'success': False, 'error': 'Only PDF files are allowed'}
+                    continue
+                
+                timings = StageTimings()
+                cache_key = None
+                if extraction_cache:
+                    with timings.measure('cache_lookup'):
+                        cache_key = ExtractionCache.make_key(
+                            hash_stream(file.stream), 'auto',
+                            extraction_options(near_duplicate_threshold, extract_tables)
+                        )
+                        cached = extraction_cache.get(cache_key)
+                    if cached is not None:
+                        observe_cache_hit('extract-batch')
+                        results[index] = cached_response(cached, timings, profile)
+                        continue
+                
+                pdf_source = stack.enter_context(PdfSource.from_upload(file))
+                timings.bytes = pdf_source.size
+                pending.append((index, cache_key, pdf_source, timings))
+            
+            ingest_done = time.perf_counter()
+            
+            # Fan every document's shards out over the worker pool together
+            documents = extract_documents(
+                [pdf_source for _, _, pdf_source, _ in pending], 'tables' if extract_tables else 'adaptive',
+                timings=[timings for _, _, _, timings in pending]
+            )
+            
+            extraction_done = time.perf_counter()
         
-        # Clean up temp file if it exists
-        if 'temp_path' in locals() and os.path.exists(temp_path):
-            os.unlink(temp_path)
+        for (index, cache_key, _, timings), page_texts in zip(pending, documents):
+            if isinstance(page_texts, Exception):
+                logger.error(f"Batch extraction failed for {files[index].filename}: {str(page_texts)}")
+                results[index] = {'success': False, 'error': f'Processing error: {str(page_texts)}'}
+                continue
+            
+            result = build_text_result(page_texts, near_duplicate_threshold, timings, extract_tables)
+            record_extraction('extract-batch', files[index].filename, timings)
+            if not result['success']:
+                results[index] = {'success': False, 'error': result.get('error', 'Extraction failed')}
+                continue
             
+            response = build_text_response(result)
+            if cache_key:
+                extraction_cache.put(cache_key, cache_entry(response))
+            results[index] = dict(response, cached=False)
+            if profile:
+                results[index]['profile'] = extraction_profile(timings)
+        
+        finished = time.perf_counter()
+        
+        for file, result in zip(files, results):
+            result['filename'] = file.filename
+        
+        succeeded = sum(1 for result in results if result['success'])
+        return jsonify({
+            'success': True,
+            'results': results,
+            'file_count': len(files),
+            'succeeded': succeeded,
+            'failed': len(files) - succeeded,
+            'cached': sum(1 for result in results if result.get('cached')),
+            'timing': {
+                'ingest_ms': round((ingest_done - started) * 1000, 2),
+                'extraction_ms': round((extraction_done - ingest_done) * 1000, 2),
+                'cleaning_ms': round((finished - extraction_done) * 1000, 2),
+                'total_ms': round((finished - started) * 1000, 2)
+            }
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in batch extraction: {str(e)}")
         return jsonify({
             'success': False,
             'error': f'Internal server error: {str(e)}'
         }), 500
 
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue a PDF for background extraction and return its job id at once.
+    Poll GET /jobs/<job_id> for progress and the /extract-text style result.
+    """
+    
+    if 'file' not in request.files:
+        return jsonify({'success': False, 'error': 'No file provided'}), 400
+    
+    file = request.files['file']
+    
+    if file.filename == '' or not allowed_file(file.filename):
+        return jsonify({'success': False, 'error': 'Invalid file'}), 400
+    
+    try:
+        near_duplicate_threshold = get_near_duplicate_threshold(request.form)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid similarity_threshold: {str(e)}'}), 400
+    
+    extract_tables = wants_tables(request.form)
+    
+    try:
+        queue = get_job_queue()
+        filename = secure_filename(file.filename)
+        options = extraction_options(near_duplicate_threshold, extract_tables)
+        
+        # A cached upload becomes a job that is already done
+        if extraction_cache:
+            options['cache_key'] = ExtractionCache.make_key(
+                hash_stream(file.stream), 'auto',
+                extraction_options(near_duplicate_threshold, extract_tables)
+            )
+            cached = extraction_cache.get(options['cache_key'])
+            if cached is not None:
+                observe_cache_hit('jobs')
+                job_id = queue.store.create(filename, options, DONE, dict(cached, cached=True))
+                return jsonify(describe_job(queue.store.get(job_id))), 200
+        
+        job_id = queue.submit(file, filename, options)
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f'/jobs/{job_id}'
+        }), 202
+        
+    except QueueFull as e:
+        logger.warning(f"Rejecting extraction job: {str(e)}")
+        return jsonify({'success': False, 'error': 'Job queue is full, try again later'}), 503
+    except Exception as e:
+        logger.error(f"Error queueing PDF: {str(e)}")
+        return jsonify({'success': False, 'error': f'Internal server error: {str(e)}'}), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Progress (pages done / total) and, once finished, the result of a job"""
+    job = get_job_queue().store.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify(describe_job(job))
+
+@app.route('/probe', methods=['POST'])
+def probe():
+    """
+    Cheap look at a PDF before extracting it: metadata, page count, xref size
+    and the estimated share of text versus scanned pages from a page sample
+    """
+    
+    if 'file' not in request.files:
+        return jsonify({'success': False, 'error': 'No file provided'}), 400
+    
+    file = request.files['file']
+    
+    if file.filename == '' or not allowed_file(file.filename):
+        return jsonify({'success': False, 'error': 'Invalid file'}), 400
+    
+    try:
+        sample_size = int(request.form.get('sample_pages', 0)) or None
+    except ValueError:
+        return jsonify({'success': False, 'error': 'sample_pages must be an integer'}), 400
+    
+    try:
+        started = time.perf_counter()
+        with PdfSource.from_upload(file) as pdf_source:
+            result = probe_document(pdf_source, sample_size)
+        
+        return jsonify(dict(
+            result,
+            success=True,
+            elapsed_ms=round((time.perf_counter() - started) * 1000, 2)
+        ))
+        
+    except Exception as e:
+        logger.error(f"Error probing PDF: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Could not read PDF: {str(e)}'
+        }), 422
+
 @app.route('/extract-text-advanced', methods=['POST'])
+@coalesce_uploads('extract-text-advanced')
 def extract_text_advanced():
     """Extract text with additional options and metadata"""
     
@@ -434,47 +924,97 @@ def extract_text_advanced():
     # Get options from request
     include_metadata = request.form.get('include_metadata', 'false').lower() == 'true'
     preferred_method = request.form.get('method', 'auto')
+    profile = wants_profile(request.form)
+    extract_tables = wants_tables(request.form)
+    include_structure = request.form.get('include_structure', 'false').lower() == 'true'
+    memory_bounded = wants_memory_bounded(request.form)
+    
+    # Sections come from PyMuPDF's font metadata, read in the same pass as the text
+    if include_structure:
+        if preferred_method not in ('auto', 'pymupdf'):
+            return jsonify({'success': False, 'error': 'include_structure requires method pymupdf or auto'}), 400
+        preferred_method = 'pymupdf'
+    
+    # Memory-bounded extraction streams PyMuPDF pages; it keeps no page list to build sections from
+    if memory_bounded:
+        if preferred_method not in ('auto', 'pymupdf') or include_structure:
+            return jsonify({'success': False, 'error': 'memory_bounded requires method pymupdf or auto, without include_structure'}), 400
+        preferred_method = 'pymupdf'
+    
+    try:
+        near_duplicate_threshold = get_near_duplicate_threshold(request.form)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid similarity_threshold: {str(e)}'}), 400
     
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            file.save(temp_file.name)
-            temp_path = temp_file.name
-        
-        # Extract metadata if requested
-        metadata = {}
-        if include_metadata:
-            try:
-                doc = fitz.open(temp_path)
-                metadata = {
-                    'page_count': len(doc),
-                    'title': doc.metadata.get('title', ''),
-                    'author': doc.metadata.get('author', ''),
-                    'subject': doc.metadata.get('subject', ''),
-                    'creator': doc.metadata.get('creator', ''),
-                    'producer': doc.metadata.get('producer', ''),
-                    'creation_date': doc.metadata.get('creationDate', ''),
-                    'modification_date': doc.metadata.get('modDate', '')
+        timings = StageTimings()
+        cache_key = None
+        if extraction_cache:
+            with timings.measure('cache_lookup'):
+                cache_key = ExtractionCache.make_key(
+                    upload_hash(file), preferred_method,
+                    dict(
+                        extraction_options(near_duplicate_threshold, extract_tables),
+                        include_metadata=include_metadata,
+                        include_structure=include_structure,
+                        memory_bounded=memory_bounded
+                    )
+                )
+                cached = extraction_cache.get(cache_key)
+            if cached is not None:
+                observe_cache_hit('extract-text-advanced')
+                return jsonify(cached_response(cached, timings, profile))
+        
+        with PdfSource.from_upload(file) as pdf_source:
+            timings.bytes = pdf_source.size
+            
+            # Extract metadata if requested
+            metadata = {}
+            if include_metadata:
+                try:
+                    with timings.measure('metadata'), open_fitz(pdf_source) as doc:
+                        metadata = document_metadata(doc)
+                except Exception as e:
+                    logger.warning(f"Could not extract metadata: {str(e)}")
+            
+            # Extract text based on preferred method
+            page_methods = None
+            tables = None
+            sections = None
+            reuse = {}
+            bounded = {}
+            if memory_bounded:
+                result = extract_text_pymupdf_bounded(pdf_source, near_duplicate_threshold, timings)
+                text = result['text']
+                method = result['method']
+                bounded = {
+                    key: result[key] for key in ('partial', 'pages_extracted', 'last_page', 'page_count', 'memory')
                 }
-                doc.close()
-            except Exception as e:
-                logger.warning(f"Could not extract metadata: {str(e)}")
-        
-        # Extract text based on preferred method
-        if preferred_method == 'pymupdf':
-            text = extract_text_pymupdf(temp_path)
-            method = 'PyMuPDF'
-        elif preferred_method == 'pdfplumber':
-            text = extract_text_pdfplumber(temp_path)
-            method = 'pdfplumber'
-        elif preferred_method == 'pypdf2':
-            text = extract_text_pypdf2(temp_path)
-            method = 'PyPDF2'
-        else:
-            result = extract_text_from_pdf(temp_path)
-            text = result['text']
-            method = result['method']
+            elif include_structure:
+                text, sections = extract_text_pymupdf(
+                    pdf_source, near_duplicate_threshold=near_duplicate_threshold, timings=timings, structured=True
+                )
+                method = 'PyMuPDF'
+            elif preferred_method == 'pymupdf':
+                text = extract_text_pymupdf(pdf_source, near_duplicate_threshold=near_duplicate_threshold, timings=timings)
+                method = 'PyMuPDF'
+            elif preferred_method == 'pdfplumber':
+                text = extract_text_pdfplumber(pdf_source, near_duplicate_threshold=near_duplicate_threshold, timings=timings)
+                method = 'pdfplumber'
+            elif preferred_method == 'pypdf2':
+                text = extract_text_pypdf2(pdf_source, near_duplicate_threshold=near_duplicate_threshold, timings=timings)
+                method = 'PyPDF2'
+            else:
+                result = extract_text_from_pdf(
+                    pdf_source, near_duplicate_threshold, timings=timings, tables=extract_tables
+                )
+                text = result['text']
+                method = result['method']
+                page_methods = result.get('page_methods')
+                tables = result.get('tables')
+                reuse = {key: result[key] for key in ('pages_reused', 'pages_recomputed') if key in result}
         
-        os.unlink(temp_path)
+        record_extraction('extract-text-advanced', file.filename, timings)
         
         if text and len(text.strip()) > 0:
             response = {
@@ -486,9 +1026,28 @@ def extract_text_advanced():
                 'line_count': len(text.splitlines())
             }
             
+            if page_methods is not None:
+                response['page_methods'] = page_methods
+            
+            if tables is not None:
+                response['tables'] = tables
+                response['table_count'] = len(tables)
+            
+            if sections is not None:
+                response['sections'] = sections
+            
+            response.update(reuse)
+            response.update(bounded)
+            
             if include_metadata:
                 response['metadata'] = metadata
-                
+            
+            if cache_key and not response.get('partial'):
+                extraction_cache.put(cache_key, cache_entry(response))
+            
+            response = dict(response, cached=False)
+            if profile:
+                response['profile'] = extraction_profile(timings)
             return jsonify(response)
         else:
             return jsonify({
@@ -498,12 +1057,208 @@ def extract_text_advanced():
             
     except Exception as e:
         logger.error(f"Error in advanced extraction: {str(e)}")
-        if 'temp_path' in locals() and os.path.exists(temp_path):
-            os.unlink(temp_path)
         return jsonify({
             'success': False,
             'error': f'Processing error: {str(e)}'
         }), 500
 
+@app.route('/chunk', methods=['POST'])
+@coalesce_uploads('chunk')
+def chunk():
+    """
+    Extract a PDF straight into sentence-aligned, token-budgeted chunks for
+    the quiz services, starting new chunks at section headings
+    """
+    
+    if 'file' not in request.files:
+        return jsonify({'success': False, 'error': 'No file provided'}), 400
+    
+    file = request.files['file']
+    
+    if file.filename == '' or not allowed_file(file.filename):
+        return jsonify({'success': False, 'error': 'Invalid file'}), 400
+    
+    try:
+        max_tokens, overlap_tokens = get_chunk_options(request.form)
+        near_duplicate_threshold = get_near_duplicate_threshold(request.form)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid chunk options: {str(e)}'}), 400
+    
+    profile = wants_profile(request.form)
+    
+    try:
+        timings = StageTimings()
+        cache_key = None
+        if extraction_cache:
+            with timings.measure('cache_lookup'):
+                cache_key = ExtractionCache.make_key(
+                    upload_hash(file), 'chunk',
+                    dict(
+                        extraction_options(near_duplicate_threshold),
+                        max_tokens=max_tokens,
+                        overlap_tokens=overlap_tokens
+                    )
+                )
+                cached = extraction_cache.get(cache_key)
+            if cached is not None:
+                observe_cache_hit('chunk')
+                return jsonify(cached_response(cached, timings, profile))
+        
+        with PdfSource.from_upload(file) as pdf_source:
+            timings.bytes = pdf_source.size
+            result = extract_chunks(pdf_source, max_tokens, overlap_tokens, near_duplicate_threshold, timings)
+        record_extraction('chunk', file.filename, timings)
+        
+        if not result['success']:
+            return jsonify({
+                'success': False,
+                'error': 'Could not extract text from PDF'
+            }), 422
+        
+        response = {
+            'success': True,
+            'chunks': result['chunks'],
+            'chunk_count': len(result['chunks']),
+            'method': result['method'],
+            'max_tokens': max_tokens,
+            'overlap_tokens': overlap_tokens
+        }
+        
+        if cache_key:
+            extraction_cache.put(cache_key, cache_entry(response))
+        
+        response = dict(response, cached=False)
+        if profile:
+            response['profile'] = extraction_profile(timings)
+        return jsonify(response)
+        
+    except Exception as e:
+        logger.error(f"Error chunking PDF: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Processing error: {str(e)}'
+        }), 500
+
+@app.route('/extract-text-stream', methods=['POST'])
+def extract_text_stream():
+    """
+    Stream extracted pages as NDJSON while the document is processed.
+    Emits a 'start' line with the page count, one 'page' line per cleaned,
+    non-duplicate page, then an 'end' summary (or an 'error' line).
+    """
+    
+    if 'file' not in request.files:
+        return jsonify({'success': False, 'error': 'No file provided'}), 400
+    
+    file = request.files['file']
+    
+    if file.filename == '' or not allowed_file(file.filename):
+        return jsonify({'success': False, 'error': 'Invalid file'}), 400
+    
+    try:
+        near_duplicate_threshold = get_near_duplicate_threshold(request.form)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid similarity_threshold: {str(e)}'}), 400
+    
+    profile = wants_profile(request.form)
+    extract_tables = wants_tables(request.form)
+    filename = file.filename
+    
+    # Wrap the upload before returning: Flask closes request files once the
+    # view returns, while the generator keeps running
+    try:
+        pdf_source = PdfSource.from_upload(file)
+    except Exception as e:
+        logger.error(f"Error reading upload for streaming: {str(e)}")
+        return jsonify({'success': False, 'error': f'Processing error: {str(e)}'}), 500
+    
+    def generate():
+        started = time.perf_counter()
+        timings = StageTimings()
+        page_methods = {}
+        char_count = 0
+        
+        try:
+            with pdf_source:
+                timings.bytes = pdf_source.size
+                yield json.dumps({
+                    'type': 'start',
+                    'page_count': count_pages(pdf_source)
+                }) + '\n'
+                
+                pages = iter_pages_adaptive(pdf_source, timings=timings, tables=extract_tables)
+                if near_duplicate_threshold is not None:
+                    pages = iter_near_unique_pages(pages, near_duplicate_threshold)
+                else:
+                    pages = iter_unique_pages(pages)
+                page_started = time.perf_counter()
+                
+                for page_data in pages:
+                    now = time.perf_counter()
+                    page_methods[page_data['page_num']] = page_data['method']
+                    char_count += len(page_data['text'])
+                    
+                    event = {
+                        'type': 'page',
+                        'page_num': page_data['page_num'],
+                        'text': page_data['text'],
+                        'method': page_data['method'],
+                        'char_count': len(page_data['text']),
+                        'elapsed_ms': round((now - page_started) * 1000, 2)
+                    }
+                    if extract_tables:
+                        event['tables'] = page_data.get('tables', [])
+                    yield json.dumps(event) + '\n'
+                    
+                    page_started = time.perf_counter()
+            
+            record_extraction('extract-text-stream', filename, timings)
+            
+            summary = {
+                'type': 'end',
+                'success': bool(page_methods),
+                'method': summarize_page_methods(
+                    [{'method': method} for method in page_methods.values()]
+                ),
+                'page_count': len(page_methods),
+                'char_count': char_count,
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+            }
+            if profile:
+                summary['profile'] = timings.as_dict()
+            yield json.dumps(summary) + '\n'
+            
+        except Exception as e:
+            logger.error(f"Error in streaming extraction: {str(e)}")
+            yield json.dumps({
+                'type': 'error',
+                'success': False,
+                'error': f'Processing error: {str(e)}'
+            }) + '\n'
+    
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.call_on_close(pdf_source.close)
+    return response
+
+def create_app():
+    """
+    App factory for WSGI servers (see gunicorn.conf.py). With preload it runs
+    once before workers fork, so only fork-safe state is set up here; job
+    threads and extraction pools start in each worker on first use.
+    """
+    get_ocr_engine()
+    return app
+
+def shutdown():
+    """
+    Stop a worker's background work: queued jobs stay queued in the job
+    store and running ones are requeued by the next worker to start
+    """
+    shutting_down.set()
+    with job_queue_lock:
+        if job_queue is not None:
+            job_queue.shutdown(wait=False)
+    shutdown_pools()
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
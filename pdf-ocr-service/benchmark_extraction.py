@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Extraction benchmark on a synthetic PDF corpus
+Generates text-heavy, table-heavy, duplicate-page and 500-page documents with
+PyMuPDF, runs every extractor plus the full extract_text_from_pdf cascade on
+them (also as a first upload through an empty page cache) and reports
+pages/sec, p50/p95 latency and peak RSS as JSON
+
+    python benchmark_extraction.py [--repeat 5] [--output results.json] [--compare previous.json]
+                                   [--documents text_heavy ...] [--extractors pymupdf cascade ...]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue as queue_module
+import random
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+EXTRACTORS = ('pymupdf', 'pdfplumber', 'pypdf2', 'cascade', 'cascade_cold_page_cache')
+
+WORDS = (
+    "thread process memory kernel scheduler mutex semaphore deadlock queue "
+    "priority interrupt context switch virtual page table cache register "
+    "pipeline instruction branch latency throughput bandwidth allocation"
+).split()
+
+# --- Synthetic corpus ---
+
+def sentence(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(6, 16))]
+    return ' '.join(words).capitalize() + '.'
+
+def add_text_page(doc, rng, title):
+    """A page of running text under a heading"""
+    page = doc.new_page()
+    page.insert_text((56, 64), title, fontsize=16)
+    body = ' '.join(sentence(rng) for _ in range(45))
+    page.insert_textbox(fitz.Rect(56, 90, 540, 800), body, fontsize=10)
+
+def add_table_page(doc, rng, title, rows=28, columns=5):
+    """A page holding one ruled table of words and numbers"""
+    page = doc.new_page()
+    page.insert_text((56, 56), title, fontsize=14)
+
+    left, top, width, height = 56, 72, 96, 24
+    shape = page.new_shape()
+    for row in range(rows + 1):
+        y = top + row * height
+        shape.draw_line((left, y), (left + columns * width, y))
+    for column in range(columns + 1):
+        x = left + column * width
+        shape.draw_line((x, top), (x, top + rows * height))
+    shape.finish(width=0.5)
+    shape.commit()
+
+    for row in range(rows):
+        for column in range(columns):
+            if row == 0:
+                cell = f"Column {column + 1}"
+            elif column == 0:
+                cell = rng.choice(WORDS)
+            else:
+                cell = f"{rng.uniform(0, 1000):.2f}"
+            page.insert_text((left + column * width + 4, top + row * height + 16), cell, fontsize=9)
+
+def text_heavy(rng):
+    doc = fitz.open()
+    for page_num in range(40):
+        add_text_page(doc, rng, f"Lecture {page_num + 1}")
+    return doc
+
+def table_heavy(rng):
+    doc = fitz.open()
+    for page_num in range(40):
+        add_table_page(doc, rng, f"Results table {page_num + 1}")
+    return doc
+
+def duplicate_pages(rng):
+    """Slides exported with every build step: runs of near-identical pages"""
+    doc = fitz.open()
+    for slide in range(12):
+        bullets = [sentence(rng) for _ in range(5)]
+        for step in range(1, 6):
+            page = doc.new_page()
+            page.insert_text((56, 64), f"Slide {slide + 1}", fontsize=16)
+            page.insert_textbox(
+                fitz.Rect(56, 90, 540, 800),
+                '\n'.join(f"- {bullet}" for bullet in bullets[:step]),
+                fontsize=12
+            )
+    return doc
+
+def large(rng):
+    doc = fitz.open()
+    for page_num in range(500):
+        if page_num % 10 == 9:
+            add_table_page(doc, rng, f"Appendix table {page_num + 1}", rows=12)
+        else:
+            add_text_page(doc, rng, f"Chapter {page_num // 25 + 1}, page {page_num + 1}")
+    return doc
+
+DOCUMENTS = {
+    'text_heavy': text_heavy,
+    'table_heavy': table_heavy,
+    'duplicate_pages': duplicate_pages,
+    'large_500_pages': large,
+}
+
+def build_corpus(corpus_dir, names=None, seed=7):
+    """Write the corpus once; the fixed seed makes it identical between runs"""
+    os.makedirs(corpus_dir, exist_ok=True)
+    paths = {}
+    for name in names or DOCUMENTS:
+        build = DOCUMENTS[name]
+        path = os.path.join(corpus_dir, f'{name}.pdf')
+        if not os.path.exists(path):
+            with build(random.Random(f'{seed}-{name}')) as doc:
+                doc.save(path, deflate=True)
+        paths[name] = path
+    return paths
+
+# --- Measurement ---
+
+def peak_rss_mb():
+    """Peak resident set size of this process"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+def run_case(path, extractor, repeat, queue):
+    """Child process body: time one extractor on one document"""
+    import logging
+    logging.disable(logging.WARNING)
+    import app
+    from extraction_cache import ExtractionCache
+
+    functions = {
+        'pymupdf': app.extract_text_pymupdf,
+        'pdfplumber': app.extract_text_pdfplumber,
+        'pypdf2': app.extract_text_pypdf2,
+        'cascade': lambda source: app.extract_text_from_pdf(source)['text'],
+        'cascade_cold_page_cache': lambda source: app.extract_text_from_pdf(source)['text'],
+    }
+    extract = functions[extractor]
+
+    latencies = []
+    text = ''
+    for _ in range(repeat):
+        page_cache_dir = None
+        if extractor == 'cascade_cold_page_cache':
+            # Every run is a first upload: fingerprint, miss and store every page
+            page_cache_dir = tempfile.mkdtemp(prefix='pdf-ocr-bench-pages-')
+            app.page_cache = ExtractionCache(page_cache_dir, app.PAGE_CACHE_MAX_BYTES)
+            app.PAGE_CACHE_MIN_PAGES = 0
+        started = time.perf_counter()
+        text = extract(path) or ''
+        latencies.append(time.perf_counter() - started)
+        if page_cache_dir:
+            shutil.rmtree(page_cache_dir, ignore_errors=True)
+
+    queue.put({'latencies': latencies, 'chars': len(text), 'peak_rss_mb': peak_rss_mb()})
+
+def measure(path, extractor, repeat):
+    """
+    Run one case in a fresh process so its peak RSS is its own and no
+    extractor benefits from another's warm caches
+    """
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=run_case, args=(path, extractor, repeat, queue))
+    process.start()
+    try:
+        # Poll so a crashed child is reported instead of blocking forever
+        while process.is_alive():
+            try:
+                return queue.get(timeout=1)
+            except queue_module.Empty:
+                pass
+        try:
+            return queue.get(timeout=1)
+        except queue_module.Empty:
+            raise RuntimeError(f"{extractor} run on {path} exited with code {process.exitcode}")
+    finally:
+        process.join()
+
+def run_benchmark(paths, repeat, extractors=EXTRACTORS):
+    results = []
+    for name, path in paths.items():
+        with fitz.open(path) as doc:
+            page_count = len(doc)
+
+        for extractor in extractors:
+            measured = measure(path, extractor, repeat)
+            latencies = measured['latencies']
+            p50 = percentile(latencies, 0.5)
+            results.append({
+                'document': name,
+                'extractor': extractor,
+                'pages': page_count,
+                'bytes': os.path.getsize(path),
+                'runs': len(latencies),
+                'chars': measured['chars'],
+                'p50_ms': round(p50 * 1000, 2),
+                'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+                'mean_ms': round(statistics.mean(latencies) * 1000, 2),
+                'pages_per_sec': round(page_count / p50, 1) if p50 else None,
+                'peak_rss_mb': measured['peak_rss_mb']
+            })
+            print(
+                f"  {name:<16} {extractor:<23} {results[-1]['p50_ms']:>9.1f} ms p50 "
+                f"{results[-1]['p95_ms']:>9.1f} ms p95 {results[-1]['pages_per_sec']:>8} pages/s "
+                f"{results[-1]['peak_rss_mb']:>7} MB"
+            )
+    return results
+
+def compare(results, previous_path):
+    """Print p50 change against a previous results file"""
+    with open(previous_path) as f:
+        previous = {(r['document'], r['extractor']): r for r in json.load(f)['results']}
+
+    print(f"\nChange in p50 latency against {previous_path}:")
+    for result in results:
+        before = previous.get((result['document'], result['extractor']))
+        if not before or not before['p50_ms']:
+            continue
+        change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100
+        print(f"  {result['document']:<16} {result['extractor']:<23} {change:+7.1f}%")
+
+def library_versions():
+    import pdfplumber
+    import PyPDF2
+    return {
+        'pymupdf': fitz.VersionBind,
+        'pdfplumber': pdfplumber.__version__,
+        'pypdf2': PyPDF2.__version__,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='runs per extractor and document')
+    parser.add_argument('--workers', type=int, default=1, help='PDF_EXTRACTION_WORKERS for the runs')
+    parser.add_argument('--corpus-dir', default=os.path.join(tempfile.gettempdir(), 'pdf-ocr-bench-corpus'))
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='previous results file to compare against')
+    parser.add_argument('--documents', nargs='+', choices=list(DOCUMENTS), help='only these documents')
+    parser.add_argument('--extractors', nargs='+', choices=EXTRACTORS, default=EXTRACTORS, help='only these extractors')
+    args = parser.parse_args()
+
+    # Children inherit these: no result cache, fixed parallelism
+    os.environ['PDF_CACHE_ENABLED'] = 'false'
+    os.environ['PDF_EXTRACTION_WORKERS'] = str(args.workers)
+
+    paths = build_corpus(args.corpus_dir, args.documents)
+    print(f"Corpus in {args.corpus_dir}, {args.repeat} runs per case:")
+    results = run_benchmark(paths, args.repeat, args.extractors)
+
+    report = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'libraries': library_versions(),
+        'settings': {'repeat': args.repeat, 'workers': args.workers, 'extractors': list(args.extractors)},
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: TextCleaner vs the previous per-call cleaning functions
+Checks that both produce identical output, then times them on synthetic pages
+"""
+
+import logging
+import random
+import sys
+import timeit
+
+from text_cleaning import TextCleaner
+
+logging.disable(logging.INFO)
+
+# --- Previous implementations, kept verbatim as the reference ---
+
+def legacy_clean_extracted_text(text):
+    import re
+
+    if not text:
+        return ""
+
+    text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
+    text = re.sub(r'[ \t]+', ' ', text)
+    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
+
+    lines = text.split('\n')
+    cleaned_lines = []
+
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            cleaned_lines.append(line)
+            continue
+        if stripped.isdigit() and len(stripped) <= 3:
+            continue
+        if len(stripped) <= 2:
+            continue
+        cleaned_lines.append(line)
+
+    return '\n'.join(cleaned_lines)
+
+def legacy_detect_repetitive_content(text, min_repetitions=3):
+    import re
+    from collections import Counter
+
+    lines = text.split('\n')
+    line_counts = Counter(line.strip() for line in lines if line.strip())
+    repetitive_lines = {
+        line for line, count in line_counts.items()
+        if count >= min_repetitions and len(line) > 10
+    }
+
+    if not repetitive_lines:
+        return text
+
+    cleaned_lines = []
+    line_seen_count = {}
+
+    for line in lines:
+        stripped = line.strip()
+        if stripped in repetitive_lines:
+            count = line_seen_count.get(stripped, 0)
+            line_seen_count[stripped] = count + 1
+            if count < 2:
+                cleaned_lines.append(line)
+        else:
+            cleaned_lines.append(line)
+
+    return '\n'.join(cleaned_lines)
+
+def legacy_validate_text_quality(text):
+    if not text or len(text.strip()) < 10:
+        return False, "Text too short"
+
+    lines = [l.strip() for l in text.split('\n') if l.strip()]
+    if not lines:
+        return False, "No content lines"
+
+    from collections import Counter
+    line_counts = Counter(lines)
+    most_common = line_counts.most_common(1)[0]
+
+    if len(lines) > 10 and most_common[1] > len(lines) * 0.5:
+        return False, f"Excessive repetition detected: '{most_common[0][:50]}...'"
+
+    alpha_chars = sum(c.isalpha() for c in text)
+    if len(text) > 0 and alpha_chars / len(text) < 0.3:
+        return False, "Too few alphabetic characters"
+
+    return True, "Quality OK"
+
+# --- Synthetic corpus ---
+
+WORDS = (
+    "thread process memory kernel scheduler mutex semaphore deadlock "
+    "queue priority interrupt context switch virtual page table cache"
+).split()
+
+def make_page(rng, page_num, lines=40):
+    """A lecture-notes style page with headers, page numbers and noise"""
+    out = ["CS2040 Operating Systems - Lecture Notes", ""]
+    for _ in range(lines):
+        roll = rng.random()
+        if roll < 0.05:
+            out.append("   \t  ")
+        elif roll < 0.08:
+            out.append("\x0c" + " ".join(rng.choice(WORDS) for _ in range(8)))
+        elif roll < 0.10:
+            out.append("-")
+        else:
+            out.append("  ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 14))))
+    out += ["", "", "", str(page_num)]
+    return "\n".join(out)
+
+def make_corpus(pages=200, seed=7):
+    rng = random.Random(seed)
+    return [make_page(rng, n + 1) for n in range(pages)]
+
+def joined(page_texts):
+    return '\n\n'.join(f"--- Page {n} ---\n{t.strip()}" for n, t in enumerate(page_texts, 1))
+
+def check_equivalence(cleaner, pages):
+    cleaned = [cleaner.clean(p) for p in pages]
+    assert cleaned == [legacy_clean_extracted_text(p) for p in pages], "clean() differs"
+
+    for text in cleaned + [joined(cleaned), "", "12345 ---- 67890\n" * 20, "same line here\n" * 30,
+                 "Résumé: naïve café scheduling across cores\n" * 4]:
+        assert cleaner.validate(text) == legacy_validate_text_quality(text), "validate() differs"
+        assert cleaner.remove_repetitions(text) == legacy_detect_repetitive_content(text), \
+            "remove_repetitions() differs"
+
+    document = joined(cleaned)
+    is_valid, quality_msg = legacy_validate_text_quality(document)
+    expected = (is_valid, quality_msg, legacy_detect_repetitive_content(document))
+    assert cleaner.finalize(document) == expected, "finalize() differs"
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"  {label:<28} {seconds * 1000:9.3f} ms")
+    return seconds
+
+if __name__ == '__main__':
+    page_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    pages = make_corpus(page_count)
+    cleaner = TextCleaner()
+
+    check_equivalence(cleaner, pages)
+    print(f"Outputs identical on {page_count} synthetic pages")
+
+    cleaned = [cleaner.clean(p) for p in pages]
+    document = joined(cleaned)
+
+    print("\nPer-page cleaning + quality check (whole corpus):")
+    old = bench("legacy functions", lambda: [
+        legacy_validate_text_quality(legacy_clean_extracted_text(p)) for p in pages
+    ], 5)
+    new = bench("TextCleaner", lambda: [cleaner.validate(cleaner.clean(p)) for p in pages], 5)
+    print(f"  speedup: {old / new:.2f}x")
+
+    print("\nDocument validate + repetition removal:")
+    old = bench("legacy functions", lambda: legacy_detect_repetitive_content(
+        document if legacy_validate_text_quality(document)[0] else ""
+    ), 10)
+    new = bench("TextCleaner.finalize", lambda: cleaner.finalize(document), 10)
+    print(f"  speedup: {old / new:.2f}x")
@@ -0,0 +1,159 @@
+"""
+Content-aware chunking for quiz generation
+Extracted text is split into sentence-aligned chunks that fit a token
+budget, start at section headings where they can and repeat the last
+sentences of the previous chunk, so every quiz call gets a complete piece
+of the document with enough context around it
+"""
+
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+CHUNK_MAX_TOKENS = int(os.getenv('PDF_CHUNK_MAX_TOKENS', 750))  # ~3000 characters, the chunk size Laravel used
+CHUNK_OVERLAP_TOKENS = int(os.getenv('PDF_CHUNK_OVERLAP_TOKENS', 50))  # Trailing sentences repeated in the next chunk
+CHUNK_MIN_TOKENS = 25  # ~100 characters; the quiz services skip shorter content
+
+# The quiz models use different tokenizers; ~4 characters per token holds
+# for English prose with all of them
+CHARS_PER_TOKEN = 4
+
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+(?=["\'(\[]?[A-Z0-9])')
+BULLET = re.compile(r'(?:[•▪◦●○■□►\-–*]|\d{1,2}[.)]|[a-z][.)])\s')
+
+def estimate_tokens(text):
+    return max(1, -(-len(text) // CHARS_PER_TOKEN))
+
+def split_sentences(text):
+    """
+    Sentences of a block of extracted text. Wrapped lines are joined
+    (hyphenated words back together); list items always start a new sentence.
+    """
+    items = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        if not items or BULLET.match(line):
+            items.append(line)
+        elif items[-1].endswith('-') and line[0].islower():
+            items[-1] = items[-1][:-1] + line
+        else:
+            items[-1] += ' ' + line
+
+    sentences = []
+    for item in items:
+        sentences.extend(sentence for sentence in SENTENCE_END.split(item) if sentence)
+    return sentences
+
+def split_long_sentence(sentence, max_tokens):
+    """Word-aligned pieces of a sentence too long for one chunk"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(sentence) <= max_chars:
+        return [sentence]
+
+    pieces = []
+    piece = ''
+    for word in sentence.split(' '):
+        if piece and len(piece) + 1 + len(word) > max_chars:
+            pieces.append(piece)
+            piece = ''
+        piece = f'{piece} {word}' if piece else word[:max_chars]
+    if piece:
+        pieces.append(piece)
+    return pieces
+
+class Chunker:
+    """
+    Collects sentences into chunks of at most max_tokens (estimated).
+    A chunk is closed before the sentence that would overflow it and the
+    next one opens with the previous chunk's trailing sentences, up to
+    overlap_tokens. A new section starts a new chunk, without overlap, once
+    the current one is at least half full; smaller sections share a chunk.
+    """
+
+    def __init__(self, max_tokens=None, overlap_tokens=None):
+        self.max_tokens = max_tokens or CHUNK_MAX_TOKENS
+        self.overlap_tokens = CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+        self.chunks = []
+        self.sentences = []  # (sentence, tokens, page_num, section) of the open chunk
+        self.tokens = 0
+        self.fresh = 0  # sentences in the open chunk not carried over as overlap
+        self.section = None
+
+    def add_block(self, section, page_num, text):
+        if section != self.section:
+            if self.tokens >= self.max_tokens // 2:
+                self.close(overlap=False)
+            self.section = section
+
+        for sentence in split_sentences(text):
+            for piece in split_long_sentence(sentence, self.max_tokens):
+                self.add_sentence(piece, page_num, section)
+
+    def add_sentence(self, sentence, page_num, section):
+        tokens = estimate_tokens(sentence)
+        if self.fresh and self.tokens + tokens > self.max_tokens:
+            self.close()
+        # Overlap gives way when it leaves no room for the new sentence
+        while self.sentences and self.tokens + tokens > self.max_tokens:
+            self.tokens -= self.sentences.pop(0)[1]
+
+        self.sentences.append((sentence, tokens, page_num, section))
+        self.tokens += tokens
+        self.fresh += 1
+
+    def close(self, overlap=True):
+        """Emit the open chunk and start the next one with its overlap"""
+        if not self.fresh:
+            return
+
+        text = ' '.join(sentence for sentence, _, _, _ in self.sentences)
+        pages = [page_num for _, _, page_num, _ in self.sentences]
+        self.chunks.append({
+            'index': len(self.chunks),
+            'text': text,
+            'token_estimate': self.tokens,
+            'char_count': len(text),
+            'page_start': min(pages),
+            'page_end': max(pages),
+            'section': self.sentences[len(self.sentences) - self.fresh][3]
+        })
+
+        carried = []
+        carried_tokens = 0
+        if overlap:
+            for sentence in reversed(self.sentences):
+                if carried_tokens + sentence[1] > self.overlap_tokens:
+                    break
+                carried.insert(0, sentence)
+                carried_tokens += sentence[1]
+        self.sentences = carried
+        self.tokens = carried_tokens
+        self.fresh = 0
+
+    def finish(self):
+        """All chunks; a too-short remainder joins the previous chunk if it fits"""
+        fresh = self.sentences[len(self.sentences) - self.fresh:]
+        fresh_tokens = sum(tokens for _, tokens, _, _ in fresh)
+        if self.chunks and fresh and fresh_tokens < CHUNK_MIN_TOKENS:
+            previous = self.chunks[-1]
+            if previous['token_estimate'] + fresh_tokens <= self.max_tokens:
+                previous['text'] += ' ' + ' '.join(sentence for sentence, _, _, _ in fresh)
+                previous['token_estimate'] += fresh_tokens
+                previous['char_count'] = len(previous['text'])
+                previous['page_end'] = max(previous['page_end'], fresh[-1][2])
+                return self.chunks
+
+        self.close()
+        return self.chunks
+
+def chunk_blocks(blocks, max_tokens=None, overlap_tokens=None):
+    """Chunks of (section, page_num, text) blocks in reading order"""
+    chunker = Chunker(max_tokens, overlap_tokens)
+    for section, page_num, text in blocks:
+        chunker.add_block(section, page_num, text)
+    return chunker.finish()
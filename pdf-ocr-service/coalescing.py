@@ -0,0 +1,72 @@
+"""
+Request coalescing
+When many identical uploads arrive together (a whole class uploading the
+same handout), the first one is extracted and the rest wait for it and
+share its result instead of extracting the document again in parallel
+"""
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class Flight:
+    """One call in progress and the callers waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. Callers that arrive while a
+    call for their key is in flight block until it finishes and get its
+    result, or its exception. Coalescing is per process: gunicorn workers
+    do not see each other's flights.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """Return (fn's result, whether it came from another caller's call)"""
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+            else:
+                flight.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            # Callers arriving from here on start a new call (or hit the cache)
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+            if flight.waiters:
+                logger.info(f"Shared one extraction with {flight.waiters} identical requests")
+        return flight.result, False
+
+    def stats(self):
+        with self.lock:
+            return {
+                'in_flight': len(self.flights),
+                'waiting': sum(flight.waiters for flight in self.flights.values()),
+                'coalesced': self.coalesced
+            }
@@ -0,0 +1,243 @@
+"""
+Content-addressed cache for PDF extraction results
+Entries are keyed by the SHA-256 of the uploaded bytes plus the extraction
+method and options, stored as JSON files on disk and evicted least recently
+used first once the store grows past its size budget. Several processes
+(gunicorn workers) can share one cache directory: the store's size is kept
+in a counter file updated under a file lock, so the budget holds for all of
+them together
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no file locks, so only one process should use a cache directory
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when extraction output changes so stale entries are never served
+CACHE_VERSION = 2
+
+# Eviction frees the store down to this share of its budget, so the entry
+# files are rescanned once per batch of evictions rather than on every write
+EVICT_TO = 0.9
+
+def hash_stream(stream, chunk_size=1024 * 1024):
+    """SHA-256 of a binary stream, rewound afterwards so it can be read again"""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+class ExtractionCache:
+    """On-disk extraction cache with LRU eviction under a byte budget"""
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.lock_path = os.path.join(cache_dir, '.lock')
+        self.size_path = os.path.join(cache_dir, '.bytes')
+
+        # key -> entry size in bytes, least recently used first. Only as
+        # fresh as this process's last scan plus its own reads and writes
+        self.entries = OrderedDict()
+        # Size of the whole store, shared with the other processes
+        self.total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(content_hash, method, options=None):
+        """Build a cache key from the document hash, method and options"""
+        payload = json.dumps({
+            'version': CACHE_VERSION,
+            'sha256': content_hash,
+            'method': method,
+            'options': options or {}
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    @contextmanager
+    def _store_lock(self):
+        """Exclusive lock on the store, held by one process at a time"""
+        with open(self.lock_path, 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_index(self):
+        """Rebuild the LRU order and the shared store size from the entry files"""
+        with self.lock, self._store_lock():
+            self._scan()
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+            self._write_store_bytes()
+        logger.info(f"Extraction cache loaded: {len(self.entries)} entries, {self.total_bytes} bytes")
+
+    def _scan(self):
+        """Index every entry on disk, oldest modification time first"""
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                found.append((stat.st_mtime, name[:-len('.json')], stat.st_size))
+
+        self.entries = OrderedDict((key, size) for _, key, size in sorted(found))
+        self.total_bytes = sum(self.entries.values())
+
+    def _read_store_bytes(self):
+        try:
+            with open(self.size_path, 'r') as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _write_store_bytes(self):
+        with open(self.size_path, 'w') as f:
+            f.write(str(self.total_bytes))
+
+    def _add_store_bytes(self, delta):
+        """Apply a size change to the shared store size (store lock held)"""
+        total = self._read_store_bytes()
+        if total is None:
+            # Counter lost: the entry files already include the change
+            self._scan()
+        else:
+            self.total_bytes = max(0, total + delta)
+        self._write_store_bytes()
+
+    def _remove(self, key):
+        """Delete an entry (store lock held); returns the bytes freed"""
+        self.entries.pop(key, None)
+        path = self._path(key)
+        try:
+            size = os.path.getsize(path)
+            os.unlink(path)
+        except OSError:
+            # Already evicted by another process
+            return 0
+        return size
+
+    def _evict(self):
+        """
+        Free the store down to EVICT_TO of its budget (store lock held).
+        Other processes add and read entries too, so the entry files are
+        rescanned first to evict in the store's LRU order, not this process's
+        """
+        self._scan()
+        target = self.max_bytes * EVICT_TO
+        while self.total_bytes > target and self.entries:
+            self.total_bytes -= self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def get(self, key):
+        """Return the cached result for key, or None on a miss"""
+        with self.lock:
+            path = self._path(key)
+            if key not in self.entries:
+                # Another process may have stored it since this one scanned
+                try:
+                    self.entries[key] = os.path.getsize(path)
+                except OSError:
+                    self.misses += 1
+                    return None
+
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    value = json.load(f)
+                # Touch the file so LRU order survives a restart and is seen
+                # by the other processes
+                os.utime(path, None)
+            except (OSError, ValueError) as e:
+                if os.path.exists(path):
+                    logger.warning(f"Dropping unreadable cache entry {key}: {str(e)}")
+                    with self._store_lock():
+                        self._add_store_bytes(-self._remove(key))
+                else:
+                    # Evicted by another process
+                    self.entries.pop(key, None)
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a JSON-serialisable result under key"""
+        data = json.dumps(value).encode('utf-8')
+        if len(data) > self.max_bytes:
+            return
+
+        with self.lock, self._store_lock():
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+
+            # Write to a temp file of our own and rename it, so neither readers
+            # nor a concurrent writer of the same key see a partial entry
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{key}.", suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            except OSError:
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+                raise
+
+            self.entries.pop(key, None)
+            self.entries[key] = len(data)
+            self._add_store_bytes(len(data) - replaced)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+                self._write_store_bytes()
+
+    def stats(self):
+        """Hit/miss counters and store size for the health endpoint"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': True,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,51 @@
+"""
+Gunicorn settings for the PDF OCR service
+
+    gunicorn -c gunicorn.conf.py
+
+One worker process with several threads by default: extraction already runs
+in the worker's process pool, so request threads mostly wait on it and on
+uploads, and all requests share one pool, job queue and result cache
+"""
+
+import os
+import signal
+
+wsgi_app = 'app:create_app()'
+bind = os.getenv('PDF_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv('PDF_WEB_WORKERS', 1))
+threads = int(os.getenv('PDF_WEB_THREADS', 8))  # >1 switches to the gthread worker
+worker_class = 'gthread' if threads > 1 else 'sync'
+preload_app = True
+
+timeout = int(os.getenv('PDF_WEB_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('PDF_WEB_GRACEFUL_TIMEOUT', 30))  # In-flight uploads get this long on SIGTERM
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+
+def post_worker_init(worker):
+    # Resume interrupted background jobs without waiting for a request
+    from app import get_job_queue, shutting_down
+    get_job_queue()
+
+    # Fail readiness as soon as SIGTERM arrives, while in-flight requests
+    # drain for graceful_timeout; worker_exit only runs once they are done
+    handle_exit = worker.handle_exit
+
+    def handle_sigterm(sig, frame):
+        shutting_down.set()
+        handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    signal.siginterrupt(signal.SIGTERM, False)
+
+def worker_int(worker):
+    # SIGINT/SIGQUIT: quick shutdown, no draining
+    from app import shutting_down
+    shutting_down.set()
+
+def worker_exit(server, worker):
+    from app import shutdown
+    shutdown()
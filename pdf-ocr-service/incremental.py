@@ -0,0 +1,78 @@
+"""
+Incremental re-extraction
+Every page is fingerprinted by what it draws and its extracted result is
+cached under that fingerprint, so re-uploading an edited document only
+re-extracts the pages that changed and splices in the rest
+"""
+
+import logging
+
+from extraction_cache import ExtractionCache
+from metrics import StageTimings
+from ocr import get_ocr_engine
+from page_engine import extract_pages
+from pdf_source import open_fitz, page_fingerprint
+
+logger = logging.getLogger(__name__)
+
+def document_fingerprints(pdf_source):
+    """Fingerprint of every page, in page order"""
+    with open_fitz(pdf_source) as doc:
+        font_digests = {}
+        return [page_fingerprint(page, font_digests) for page in doc]
+
+def page_cache_key(fingerprint, backend):
+    """Page results also depend on the extraction mode and the OCR engine"""
+    engine = get_ocr_engine()
+    return ExtractionCache.make_key(fingerprint, backend, {'ocr': engine.name if engine else None})
+
+def renumber_page(page_data, page_num):
+    """A cached page placed at page_num (1-based) of the new document"""
+    page_data = dict(page_data, page_num=page_num)
+    if 'tables' in page_data:
+        page_data['tables'] = [dict(table, page_num=page_num) for table in page_data['tables']]
+    return page_data
+
+def extract_pages_incremental(pdf_source, backend, page_cache, progress=None, timings=None):
+    """
+    extract_pages() for the adaptive backends, extracting only pages whose
+    fingerprint is not in page_cache and storing the ones it extracts.
+    Pages on which a backend or OCR raised are returned but not stored, so
+    a transient failure is retried on the next upload instead of sticking.
+    Returns (page_texts, pages_reused, pages_recomputed).
+    """
+    timings = timings or StageTimings()
+    with timings.measure('fingerprint'):
+        keys = [page_cache_key(fingerprint, backend) for fingerprint in document_fingerprints(pdf_source)]
+
+    # page index -> cached page dict, or None for a page with no output
+    cached = {}
+    for page_num, key in enumerate(keys):
+        entry = page_cache.get(key)
+        if entry is not None:
+            cached[page_num] = entry['page']
+    missing = [page_num for page_num in range(len(keys)) if page_num not in cached]
+
+    if progress:
+        progress(len(cached), len(keys))
+    extracted = {}
+    if missing:
+        page_progress = (lambda done, total: progress(len(cached) + done, len(keys))) if progress else None
+        for page_data in extract_pages(pdf_source, backend, progress=page_progress, timings=timings, pages=missing):
+            extracted[page_data['page_num'] - 1] = page_data
+
+        for page_num in missing:
+            if page_num + 1 in timings.failed_pages:
+                continue
+            # None is a page that was read fine and has no text
+            page_cache.put(keys[page_num], {'page': extracted.get(page_num)})
+
+    page_texts = []
+    for page_num in range(len(keys)):
+        page_data = cached[page_num] if page_num in cached else extracted.get(page_num)
+        if page_data:
+            page_texts.append(renumber_page(page_data, page_num + 1))
+
+    if cached:
+        logger.info(f"Reused {len(cached)} of {len(keys)} pages, extracted {len(missing)}")
+    return page_texts, len(cached), len(missing)
@@ -0,0 +1,268 @@
+"""
+Asynchronous extraction jobs
+Uploads are saved next to a SQLite job store and processed by a bounded
+thread pool; job state and results live in SQLite so they survive restarts
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+JOBS_DIR = os.getenv('PDF_JOBS_DIR', 'jobs')
+JOB_WORKERS = int(os.getenv('PDF_JOB_WORKERS', 2))  # Documents extracted at once
+JOB_MAX_PENDING = int(os.getenv('PDF_JOB_MAX_PENDING', 32))  # Queued + running jobs before rejecting
+JOB_RETENTION = int(os.getenv('PDF_JOB_RETENTION', 24 * 60 * 60))  # Seconds finished jobs are kept
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    filename TEXT,
+    options TEXT NOT NULL,
+    pages_done INTEGER NOT NULL DEFAULT 0,
+    pages_total INTEGER,
+    result TEXT,
+    error TEXT,
+    worker_pid INTEGER,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+)
+"""
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+def pid_alive(pid):
+    """Whether a process with this id is still running on this host"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class JobStore:
+    """SQLite table of jobs, shared by the request handlers and the job threads"""
+
+    def __init__(self, jobs_dir):
+        self.jobs_dir = jobs_dir
+        os.makedirs(jobs_dir, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(
+            os.path.join(jobs_dir, 'jobs.db'), timeout=30, check_same_thread=False
+        )
+        self.db.row_factory = sqlite3.Row
+        with self.lock, self.db:
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute(SCHEMA)
+
+    def pdf_path(self, job_id):
+        return os.path.join(self.jobs_dir, f'{job_id}.pdf')
+
+    def execute(self, sql, params=()):
+        with self.lock, self.db:
+            return self.db.execute(sql, params).rowcount
+
+    def create(self, filename, options, status=QUEUED, result=None):
+        """Insert a job and return its id"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self.execute(
+            'INSERT INTO jobs (id, status, filename, options, result, created_at, finished_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (
+                job_id, status, filename, json.dumps(options),
+                json.dumps(result) if result is not None else None,
+                now, now if status == DONE else None
+            )
+        )
+        return job_id
+
+    def get(self, job_id):
+        """Return a job as a dict, or None if it does not exist"""
+        with self.lock:
+            row = self.db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        job = dict(row)
+        job['options'] = json.loads(job['options'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def claim(self, job_id):
+        """Mark a queued job as running in this process; False if someone else has it"""
+        return self.execute(
+            'UPDATE jobs SET status = ?, worker_pid = ?, started_at = ? WHERE id = ? AND status = ?',
+            (RUNNING, os.getpid(), time.time(), job_id, QUEUED)
+        ) == 1
+
+    def update_progress(self, job_id, pages_done, pages_total):
+        self.execute(
+            'UPDATE jobs SET pages_done = ?, pages_total = ? WHERE id = ?',
+            (pages_done, pages_total, job_id)
+        )
+
+    def finish(self, job_id, result):
+        self.execute(
+            'UPDATE jobs SET status = ?, result = ?, finished_at = ? WHERE id = ?',
+            (DONE, json.dumps(result), time.time(), job_id)
+        )
+
+    def fail(self, job_id, error):
+        self.execute(
+            'UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?',
+            (FAILED, error, time.time(), job_id)
+        )
+
+    def requeue_orphans(self):
+        """
+        Put jobs left running by a process that no longer exists back in the
+        queue and return the ids of every queued job
+        """
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT id, worker_pid FROM jobs WHERE status = ?', (RUNNING,)
+            ).fetchall()
+        for row in rows:
+            if row['worker_pid'] is None or not pid_alive(row['worker_pid']):
+                logger.info(f"Requeueing interrupted job {row['id']}")
+                self.execute(
+                    'UPDATE jobs SET status = ?, worker_pid = NULL, pages_done = 0 WHERE id = ? AND status = ?',
+                    (QUEUED, row['id'], RUNNING)
+                )
+
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT id FROM jobs WHERE status = ? ORDER BY created_at', (QUEUED,)
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+    def prune(self, max_age):
+        """Delete finished jobs older than max_age seconds"""
+        cutoff = time.time() - max_age
+        with self.lock, self.db:
+            rows = self.db.execute(
+                'SELECT id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?', (cutoff,)
+            ).fetchall()
+            self.db.execute(
+                'DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?', (cutoff,)
+            )
+        for row in rows:
+            self.discard_pdf(row['id'])
+        return len(rows)
+
+    def discard_pdf(self, job_id):
+        try:
+            os.remove(self.pdf_path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def counts(self):
+        """Number of jobs in each state"""
+        with self.lock:
+            rows = self.db.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return {status: count for status, count in rows}
+
+class JobQueue:
+    """
+    Runs jobs from a JobStore on a bounded thread pool.
+    runner(pdf_path, options, progress) does the extraction and returns the
+    job result; progress(pages_done, pages_total) records how far it got.
+    """
+
+    def __init__(self, store, runner, workers=None, max_pending=None, retention=None):
+        self.store = store
+        self.runner = runner
+        self.max_pending = max_pending or JOB_MAX_PENDING
+        self.retention = JOB_RETENTION if retention is None else retention
+
+        self.workers = workers or JOB_WORKERS
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='pdf-job')
+        self.pending = 0
+        self.pending_lock = threading.Lock()
+
+    def recover(self):
+        """Resume jobs that were queued or interrupted before a restart"""
+        job_ids = self.store.requeue_orphans()
+        for job_id in job_ids:
+            self.schedule(job_id, force=True)
+        if job_ids:
+            logger.info(f"Resumed {len(job_ids)} extraction jobs")
+
+    def submit(self, file, filename, options):
+        """Save an upload and queue it, returning the new job id"""
+        with self.pending_lock:
+            if self.pending >= self.max_pending:
+                raise QueueFull(f'{self.pending} jobs already pending')
+
+        self.store.prune(self.retention)
+
+        job_id = self.store.create(filename, options)
+        try:
+            file.save(self.store.pdf_path(job_id))
+        except Exception as e:
+            self.store.fail(job_id, f'Could not store upload: {str(e)}')
+            raise
+
+        self.schedule(job_id)
+        return job_id
+
+    def schedule(self, job_id, force=False):
+        with self.pending_lock:
+            if not force and self.pending >= self.max_pending:
+                self.store.fail(job_id, 'Job queue is full')
+                self.store.discard_pdf(job_id)
+                raise QueueFull(f'{self.pending} jobs already pending')
+            self.pending += 1
+        self.executor.submit(self.run, job_id)
+
+    def run(self, job_id):
+        try:
+            if not self.store.claim(job_id):
+                return
+
+            job = self.store.get(job_id)
+            progress = lambda done, total: self.store.update_progress(job_id, done, total)
+
+            try:
+                result = self.runner(self.store.pdf_path(job_id), job['options'], progress)
+            except Exception as e:
+                logger.error(f"Extraction job {job_id} failed: {str(e)}")
+                self.store.fail(job_id, str(e))
+            else:
+                self.store.finish(job_id, result)
+            finally:
+                self.store.discard_pdf(job_id)
+        finally:
+            with self.pending_lock:
+                self.pending -= 1
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'pending': self.pending,
+            'jobs': self.store.counts()
+        }
+
+    def shutdown(self, wait=True):
+        """Stop the job threads; jobs not yet started stay queued for recover()"""
+        self.executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,65 @@
+"""
+Per-request memory budget
+Upload size does not bound what a PDF costs once decompressed, so
+memory-bounded extraction watches the process RSS as pages are read and
+stops with partial results before the worker is OOM-killed
+"""
+
+import logging
+import os
+import resource
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+MEMORY_BUDGET_BYTES = int(os.getenv('PDF_MEMORY_BUDGET_BYTES', 512 * 1024 * 1024))  # RSS growth allowed per request
+OUTPUT_SPILL_THRESHOLD = int(os.getenv('PDF_OUTPUT_SPILL_THRESHOLD', 4 * 1024 * 1024))  # Extracted text kept in RAM
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def current_rss():
+    """Resident set size of this process in bytes"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        # No procfs (macOS): the peak is the best available figure, in bytes there
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+class MemoryBudget:
+    """
+    RSS growth allowed since the budget was created. Threads share the
+    process RSS, so concurrent requests count against each other's budgets;
+    the budget bounds the worker, not an exact per-request figure.
+    """
+
+    def __init__(self, limit_bytes=None):
+        self.limit_bytes = MEMORY_BUDGET_BYTES if limit_bytes is None else limit_bytes
+        self.baseline = current_rss()
+        self.peak = self.baseline
+
+    def used(self):
+        rss = current_rss()
+        self.peak = max(self.peak, rss)
+        return rss - self.baseline
+
+    def exceeded(self):
+        """Whether the budget is used up, after giving back PyMuPDF's cached resources"""
+        if self.used() <= self.limit_bytes:
+            return False
+
+        # Fonts and images PyMuPDF keeps for pages already read
+        fitz.TOOLS.store_shrink(100)
+        if self.used() <= self.limit_bytes:
+            return False
+
+        logger.warning(f"Memory budget of {self.limit_bytes} bytes exceeded ({self.used()} bytes used)")
+        return True
+
+    def as_dict(self):
+        return {
+            'budget_bytes': self.limit_bytes,
+            'peak_bytes': self.peak - self.baseline
+        }
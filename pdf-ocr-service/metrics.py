@@ -0,0 +1,203 @@
+"""
+Extraction profiling and Prometheus metrics
+StageTimings collects per-stage and per-page wall time for one document (and
+travels back from worker processes); the module-level histograms aggregate
+them for the /metrics endpoint in the Prometheus text format
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DOCUMENT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+class StageTimings:
+    """
+    Wall time of one document's extraction, split by stage.
+    Stages are backend names ('pymupdf', 'pdfplumber', 'pypdf2') for raw page
+    reads, 'cleaning' for page cleaning and quality checks, plus whatever the
+    caller measures itself (e.g. 'dedupe', 'finalize'). Shards extracted in
+    parallel are merged, so stage totals can exceed the elapsed time.
+    failed_pages holds the (1-based) pages whose result is missing something
+    because a backend, OCR or table extraction raised on them.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self.stages = {}
+        self.page_seconds = []
+        self.bytes = 0
+        self.failed_pages = set()
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def measure(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def add_page(self, seconds):
+        self.page_seconds.append(seconds)
+
+    def fail_page(self, page_num):
+        self.failed_pages.add(page_num)
+
+    def merge(self, other):
+        for stage, seconds in other.stages.items():
+            self.add(stage, seconds)
+        self.page_seconds.extend(other.page_seconds)
+        self.bytes += other.bytes
+        self.failed_pages |= other.failed_pages
+
+    def finish(self):
+        """Stop the document clock and return the elapsed seconds"""
+        self.elapsed = time.perf_counter() - self.started
+        return self.elapsed
+
+    def as_dict(self):
+        """JSON-friendly breakdown in milliseconds"""
+        pages = sorted(self.page_seconds)
+        elapsed = self.elapsed if self.elapsed is not None else time.perf_counter() - self.started
+        return {
+            'elapsed_ms': round(elapsed * 1000, 2),
+            'bytes': self.bytes,
+            'stages_ms': {stage: round(seconds * 1000, 2) for stage, seconds in self.stages.items()},
+            'pages': {
+                'count': len(pages),
+                'total_ms': round(sum(pages) * 1000, 2),
+                'p50_ms': round(percentile(pages, 0.5) * 1000, 3),
+                'p95_ms': round(percentile(pages, 0.95) * 1000, 3),
+                'max_ms': round(pages[-1] * 1000, 3) if pages else 0.0
+            }
+        }
+
+    def summary(self):
+        """One-line stage breakdown for logs"""
+        stages = ', '.join(
+            f"{stage}={seconds * 1000:.0f}ms"
+            for stage, seconds in sorted(self.stages.items(), key=lambda item: -item[1])
+        )
+        return f"{len(self.page_seconds)} pages, {self.bytes} bytes, {stages}"
+
+# --- Prometheus text format ---
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in pairs) + '}'
+
+def format_value(value):
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f'{self.name}{format_labels(self.labelnames, key)} {format_value(value)}')
+        return lines
+
+class Histogram:
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self.series = {}  # labels -> [count per bucket..., count above the last bucket, sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * (len(self.buckets) + 3)
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            for key, series in sorted(self.series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), series):
+                    cumulative += count
+                    labels = format_labels(self.labelnames, key, [('le', format_value(bound))])
+                    lines.append(f'{self.name}_bucket{labels} {cumulative}')
+                labels = format_labels(self.labelnames, key)
+                lines.append(f'{self.name}_sum{labels} {format_value(series[-2])}')
+                lines.append(f'{self.name}_count{labels} {series[-1]}')
+        return lines
+
+document_seconds = Histogram(
+    'pdf_extraction_seconds', 'Wall time to extract one document', DOCUMENT_BUCKETS, ['endpoint']
+)
+stage_seconds = Histogram(
+    'pdf_extraction_stage_seconds', 'Time spent per extraction stage for one document', STAGE_BUCKETS, ['stage']
+)
+page_seconds = Histogram(
+    'pdf_page_seconds', 'Time to extract and clean one page', PAGE_BUCKETS
+)
+documents_total = Counter(
+    'pdf_documents_total', 'Documents handled', ['endpoint', 'cached']
+)
+pages_total = Counter('pdf_pages_processed_total', 'Pages extracted')
+bytes_total = Counter('pdf_bytes_processed_total', 'PDF bytes extracted')
+coalesced_total = Counter(
+    'pdf_coalesced_requests_total', 'Requests served by an identical request already in flight', ['endpoint']
+)
+
+METRICS = (document_seconds, stage_seconds, page_seconds, documents_total, pages_total, bytes_total, coalesced_total)
+
+def observe_extraction(endpoint, timings):
+    """Feed one finished document's timings into the Prometheus metrics"""
+    documents_total.inc(endpoint=endpoint, cached='false')
+    document_seconds.observe(timings.elapsed, endpoint=endpoint)
+    for stage, seconds in timings.stages.items():
+        stage_seconds.observe(seconds, stage=stage)
+    for seconds in timings.page_seconds:
+        page_seconds.observe(seconds)
+    pages_total.inc(len(timings.page_seconds))
+    bytes_total.inc(timings.bytes)
+
+def observe_cache_hit(endpoint):
+    documents_total.inc(endpoint=endpoint, cached='true')
+
+def observe_coalesced(endpoint):
+    coalesced_total.inc(endpoint=endpoint)
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    return '\n'.join(line for metric in METRICS for line in metric.render()) + '\n'
@@ -0,0 +1,190 @@
+"""
+Near-duplicate page detection
+One-permutation MinHash signatures over word shingles, indexed with banded
+LSH so each page is only compared against pages that share a band bucket
+"""
+
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv('PDF_NEAR_DUPLICATE_THRESHOLD', 0.85))  # Estimated Jaccard similarity
+MINHASH_SIZE = int(os.getenv('PDF_MINHASH_SIZE', 64))  # Signature length
+SHINGLE_SIZE = 3  # Words per shingle
+
+WORD_PATTERN = re.compile(r'\w+')
+MASK64 = (1 << 64) - 1
+
+def choose_bands(num_perm, threshold):
+    """
+    Pick (bands, rows) with bands * rows == num_perm whose LSH threshold
+    (1 / bands) ** (1 / rows) sits closest to the similarity threshold
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+class NearDuplicateIndex:
+    """Banded LSH index of page MinHash signatures"""
+
+    def __init__(self, threshold=None, num_perm=None):
+        self.threshold = NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+        self.num_perm = num_perm or MINHASH_SIZE
+        self.bands, self.rows = choose_bands(self.num_perm, self.threshold)
+
+        self.buckets = [{} for _ in range(self.bands)]
+        self.signatures = {}
+
+    def shingles(self, text):
+        """Hashed word shingles of a page (single words for very short pages)"""
+        words = WORD_PATTERN.findall(text.lower())
+        if len(words) < SHINGLE_SIZE:
+            return {hash(word) & MASK64 for word in words}
+        return {
+            hash(' '.join(words[i:i + SHINGLE_SIZE])) & MASK64
+            for i in range(len(words) - SHINGLE_SIZE + 1)
+        }
+
+    def signature(self, text):
+        """
+        One-permutation MinHash signature of a page, or None if it has no
+        words. Each shingle hash lands in one of num_perm bins and the bin
+        keeps its minimum, so a page is hashed once rather than once per
+        permutation. Empty bins borrow from the next filled bin (rotation
+        densification) so signatures stay comparable position by position.
+        """
+        hashes = self.shingles(text)
+        if not hashes:
+            return None
+
+        size = self.num_perm
+        empty = MASK64 + 1
+        bins = [empty] * size
+        for value in hashes:
+            slot = value % size
+            value //= size
+            if value < bins[slot]:
+                bins[slot] = value
+
+        if empty in bins:
+            filled = [i for i, value in enumerate(bins) if value != empty]
+            for i in range(size):
+                if bins[i] == empty:
+                    # Nearest filled bin to the right, wrapping around
+                    nxt = next((j for j in filled if j > i), filled[0])
+                    steps = (nxt - i) % size
+                    bins[i] = bins[nxt] + steps * (MASK64 + 1)
+
+        return tuple(bins)
+
+    def similarity(self, sig_a, sig_b):
+        """Estimated Jaccard similarity of two signatures"""
+        return sum(a == b for a, b in zip(sig_a, sig_b)) / self.num_perm
+
+    def find(self, signature):
+        """Return (key, similarity) of the most similar indexed page above the threshold"""
+        candidates = set()
+        for band, bucket in enumerate(self.buckets):
+            start = band * self.rows
+            candidates.update(bucket.get(signature[start:start + self.rows], ()))
+
+        best = None
+        for key in candidates:
+            score = self.similarity(signature, self.signatures[key])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
+
+    def add(self, key, signature):
+        self.signatures[key] = signature
+        for band, bucket in enumerate(self.buckets):
+            start = band * self.rows
+            bucket.setdefault(signature[start:start + self.rows], []).append(key)
+
+    def remove(self, key):
+        signature = self.signatures.pop(key)
+        for band, bucket in enumerate(self.buckets):
+            start = band * self.rows
+            bucket[signature[start:start + self.rows]].remove(key)
+
+def iter_near_unique_pages(page_texts, threshold=None):
+    """
+    Yield pages from an iterable in page order, skipping near-duplicates.
+    Of a run of consecutive near-duplicate pages (an incremental slide
+    build) the longest is kept, so only that run's best page so far is held
+    back until a page that does not match it arrives. A page matching an
+    earlier, finished run is skipped.
+    """
+    index = NearDuplicateIndex(threshold)
+    seen_content = set()
+    held = None
+
+    for page_data in page_texts:
+        content = page_data['text'].strip()
+
+        # Skip empty pages
+        if not content:
+            continue
+
+        # Exact duplicates are caught the same way as remove_duplicate_pages
+        content_hash = hash(content[:500])
+        if content_hash in seen_content:
+            logger.info(f"Skipping duplicate page {page_data['page_num']}")
+            continue
+        seen_content.add(content_hash)
+
+        signature = index.signature(content)
+        match = index.find(signature) if signature is not None else None
+        if match and held is not None and match[0] == held['page_num']:
+            if len(content) <= len(held['text'].strip()):
+                logger.info(
+                    f"Skipping near-duplicate page {page_data['page_num']} "
+                    f"(~{match[1]:.2f} similar to page {match[0]})"
+                )
+                continue
+
+            logger.info(
+                f"Replacing near-duplicate page {match[0]} with fuller page "
+                f"{page_data['page_num']} (~{match[1]:.2f} similar)"
+            )
+            index.remove(match[0])
+            index.add(page_data['page_num'], signature)
+            held = page_data
+            continue
+
+        if match:
+            logger.info(
+                f"Skipping near-duplicate page {page_data['page_num']} "
+                f"(~{match[1]:.2f} similar to page {match[0]})"
+            )
+            continue
+
+        if held is not None:
+            yield held
+            held = None
+        if signature is None:
+            yield page_data
+        else:
+            index.add(page_data['page_num'], signature)
+            held = page_data
+
+    if held is not None:
+        yield held
+
+def remove_near_duplicate_pages(page_texts, threshold=None):
+    """
+    Remove near-duplicate pages with the same policy as
+    iter_near_unique_pages, so every endpoint keeps the same pages
+    """
+    if len(page_texts) <= 1:
+        return page_texts
+    return list(iter_near_unique_pages(page_texts, threshold))
@@ -0,0 +1,221 @@
+"""
+Local OCR for image-only pages
+Scanned pages are rendered once with PyMuPDF into an on-disk bitmap cache and
+recognised by a pluggable OCR engine (Tesseract by default) on a thread pool,
+so several pages are OCRed at once while pages still come back in order
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz  # PyMuPDF
+
+from pdf_source import page_fingerprint
+from probe import MIN_TEXT_CHARS, SCANNED_IMAGE_COVERAGE, image_coverage
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+OCR_ENGINE = os.getenv('PDF_OCR_ENGINE', 'tesseract').lower()  # 'none' disables OCR
+OCR_LANGUAGES = os.getenv('PDF_OCR_LANGUAGES', 'eng')  # Tesseract language codes, e.g. 'eng+sin'
+OCR_DPI = int(os.getenv('PDF_OCR_DPI', 300))  # Render resolution; Tesseract is tuned for ~300 DPI
+OCR_WORKERS = int(os.getenv('PDF_OCR_WORKERS', 0))  # Pages OCRed at once per process; 0 splits the cores between the processes extracting
+OCR_CACHE_DIR = os.getenv('PDF_OCR_CACHE_DIR', 'ocr_cache')
+OCR_CACHE_MAX_BYTES = int(os.getenv('PDF_OCR_CACHE_MAX_BYTES', 512 * 1024 * 1024))  # 512MB
+
+# Bump when rendering changes so stale bitmaps are never reused
+BITMAP_VERSION = 1
+
+class OcrUnavailable(Exception):
+    """Raised when an OCR engine's library or binary is missing"""
+
+class OcrEngine(ABC):
+    """
+    Turns a rendered page image into text. Engines are created once per
+    process and called from several threads at a time.
+    """
+
+    name = 'OCR'
+
+    @abstractmethod
+    def recognize(self, image_path):
+        """Text of the page image at image_path"""
+
+class TesseractEngine(OcrEngine):
+    """Tesseract through pytesseract; needs the tesseract binary on PATH"""
+
+    name = 'Tesseract'
+
+    def __init__(self, languages=None):
+        if pytesseract is None:
+            raise OcrUnavailable('pytesseract is not installed')
+        try:
+            self.version = str(pytesseract.get_tesseract_version())
+        except pytesseract.TesseractNotFoundError:
+            raise OcrUnavailable('tesseract binary not found')
+
+        self.languages = languages or OCR_LANGUAGES
+        # Pages already run in parallel; one thread per tesseract process
+        # avoids oversubscribing the cores
+        os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+    def recognize(self, image_path):
+        return pytesseract.image_to_string(image_path, lang=self.languages)
+
+# Engine name -> factory; add an entry to plug in another OCR library
+OCR_ENGINES = {
+    'tesseract': TesseractEngine,
+}
+
+_engine = None
+_engine_loaded = False
+_engine_lock = threading.Lock()
+# OCR thread pools, one per worker count
+_pools = {}
+
+def get_ocr_engine():
+    """The configured OCR engine, or None if OCR is disabled or unavailable"""
+    global _engine, _engine_loaded
+    with _engine_lock:
+        if not _engine_loaded:
+            _engine_loaded = True
+            if OCR_ENGINE != 'none':
+                try:
+                    _engine = OCR_ENGINES[OCR_ENGINE]()
+                except KeyError:
+                    logger.warning(f"Unknown OCR engine '{OCR_ENGINE}', OCR disabled")
+                except OcrUnavailable as e:
+                    logger.warning(f"OCR disabled: {str(e)}")
+        return _engine
+
+def ocr_workers(processes=1):
+    """
+    Pages each process OCRs at once while processes of them extract at the
+    same time: PDF_OCR_WORKERS if set, otherwise an equal share of the cores
+    """
+    if OCR_WORKERS > 0:
+        return OCR_WORKERS
+    return max(1, (os.cpu_count() or 1) // max(1, processes))
+
+def get_ocr_pool(workers):
+    """Thread pool of the given size, shared by every document OCRed in this process"""
+    with _engine_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pdf-ocr')
+            _pools[workers] = pool
+        return pool
+
+def ocr_status():
+    """OCR settings for the health endpoint"""
+    engine = get_ocr_engine()
+    return {
+        'enabled': engine is not None,
+        'engine': engine.name if engine else None,
+        'languages': OCR_LANGUAGES,
+        'dpi': OCR_DPI,
+        'workers': ocr_workers()
+    }
+
+def is_image_only(page, page_text):
+    """Whether a fitz page is a scan: (almost) no text layer, mostly covered by images"""
+    return (
+        len(page_text) < MIN_TEXT_CHARS
+        and bool(page.get_images())
+        and image_coverage(page) >= SCANNED_IMAGE_COVERAGE
+    )
+
+def page_image_key(page, dpi):
+    """Content key of a page rendering: the page's fingerprint and the DPI"""
+    return hashlib.sha256(f'{BITMAP_VERSION}:{dpi}:{page_fingerprint(page)}'.encode()).hexdigest()
+
+class PageImageCache:
+    """
+    Rendered page bitmaps as grayscale PNGs on disk, so a page is rasterized
+    once however often it is OCRed. Files are evicted oldest first past the
+    byte budget; each process tracks its own writes against the budget.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.entries = self._load_index()
+        self.total_bytes = sum(size for _, _, size in self.entries)
+
+    def _load_index(self):
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.png'):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    found.append((stat.st_mtime, path, stat.st_size))
+        return sorted(found)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f'{key}.png')
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self.entries:
+            _, path, size = self.entries.pop(0)
+            self.total_bytes -= size
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def render(self, page, dpi=None):
+        """Path of the page's bitmap, rendering it only on a cache miss"""
+        dpi = dpi or OCR_DPI
+        path = self._path(page_image_key(page, dpi))
+
+        try:
+            os.utime(path, None)
+            self.hits += 1
+            return path
+        except FileNotFoundError:
+            self.misses += 1
+
+        pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write atomically so a concurrent reader never sees a partial image
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        pix.save(temp_path, output='png')
+        os.replace(temp_path, path)
+
+        with self.lock:
+            size = os.path.getsize(path)
+            self.entries.append((time.time(), path, size))
+            self.total_bytes += size
+            self._evict()
+        return path
+
+_image_cache = None
+
+def get_image_cache():
+    global _image_cache
+    with _engine_lock:
+        if _image_cache is None:
+            _image_cache = PageImageCache(OCR_CACHE_DIR, OCR_CACHE_MAX_BYTES)
+        return _image_cache
+
+def recognize_page(engine, image_path):
+    """OCR one rendered page, returning (text, seconds); runs on the OCR pool"""
+    started = time.perf_counter()
+    text = engine.recognize(image_path)
+    return text, time.perf_counter() - started
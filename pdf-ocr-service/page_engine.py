@@ -0,0 +1,602 @@
+"""
+Page-sharded PDF extraction engine
+Splits a document into page ranges, extracts them in a process pool and
+returns the cleaned pages in page order
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import pdfplumber
+import PyPDF2
+
+from metrics import StageTimings
+from ocr import get_ocr_engine, get_ocr_pool, ocr_workers, get_image_cache, is_image_only, recognize_page
+from pdf_source import worker_source, open_fitz, open_binary
+from structure import page_lines
+from tables import is_table_page, extract_page_tables
+from text_cleaning import clean_extracted_text, validate_text_quality
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+EXTRACTION_WORKERS = int(os.getenv('PDF_EXTRACTION_WORKERS', os.cpu_count() or 1))
+EXTRACTION_SHARD_SIZE = int(os.getenv('PDF_EXTRACTION_SHARD_SIZE', 16))  # Pages per shard
+
+# Worker pools are kept alive between requests, one per worker count
+_pools = {}
+
+class PyMuPDFPages:
+    """Page-level access to a PDF through PyMuPDF"""
+
+    def __init__(self, pdf_source):
+        self.doc = open_fitz(pdf_source)
+        self.page_count = len(self.doc)
+
+    def page_text(self, page_num):
+        return self.doc.load_page(page_num).get_text()
+
+    def load_page(self, page_num):
+        return self.doc.load_page(page_num)
+
+    def close(self):
+        self.doc.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class PdfplumberPages(PyMuPDFPages):
+    """Page-level access to a PDF through pdfplumber"""
+
+    def __init__(self, pdf_source):
+        self.doc = pdfplumber.open(open_binary(pdf_source))
+        self.page_count = len(self.doc.pages)
+
+    def page_text(self, page_num):
+        return self.doc.pages[page_num].extract_text()
+
+    def load_page(self, page_num):
+        return self.doc.pages[page_num]
+
+    def close(self):
+        self.doc.close()
+        self.doc.stream.close()
+
+class PyPDF2Pages(PyMuPDFPages):
+    """Page-level access to a PDF through PyPDF2"""
+
+    def __init__(self, pdf_source):
+        self.file = open_binary(pdf_source)
+        self.doc = PyPDF2.PdfReader(self.file)
+        self.page_count = len(self.doc.pages)
+
+    def page_text(self, page_num):
+        return self.doc.pages[page_num].extract_text()
+
+    def close(self):
+        self.file.close()
+
+PAGE_SOURCES = {
+    'pymupdf': PyMuPDFPages,
+    'pdfplumber': PdfplumberPages,
+    'pypdf2': PyPDF2Pages,
+}
+
+BACKEND_NAMES = {
+    'pymupdf': 'PyMuPDF',
+    'pdfplumber': 'pdfplumber',
+    'pypdf2': 'PyPDF2',
+}
+
+# Slower backends tried, in order, for pages PyMuPDF extracts poorly
+FALLBACK_BACKENDS = ('pdfplumber', 'pypdf2')
+
+# Per-page PyMuPDF extraction with fallbacks; 'tables' also returns the
+# structured tables of pages with ruling lines
+ADAPTIVE_BACKENDS = ('adaptive', 'tables')
+
+# PyMuPDF extraction that also keeps each line's font size and weight
+STRUCTURE_BACKEND = 'structure'
+
+def count_pages(pdf_source, backend='pymupdf'):
+    """Count pages with the given backend"""
+    if backend in ADAPTIVE_BACKENDS or backend == STRUCTURE_BACKEND:
+        backend = 'pymupdf'
+    with PAGE_SOURCES[backend](pdf_source) as pages:
+        return pages.page_count
+
+def shard_pages(page_count, shard_size=None):
+    """Split page indices 0..page_count-1 into contiguous (start, end) ranges"""
+    shard_size = max(1, shard_size or EXTRACTION_SHARD_SIZE)
+    return [
+        (start, min(start + shard_size, page_count))
+        for start in range(0, page_count, shard_size)
+    ]
+
+def shard_page_list(page_nums, shard_size=None):
+    """Split sorted page indices into contiguous (start, end) runs of at most shard_size pages"""
+    shard_size = max(1, shard_size or EXTRACTION_SHARD_SIZE)
+    shards = []
+    for page_num in page_nums:
+        if shards and shards[-1][1] == page_num and page_num - shards[-1][0] < shard_size:
+            shards[-1] = (shards[-1][0], page_num + 1)
+        else:
+            shards.append((page_num, page_num + 1))
+    return shards
+
+def extract_shard(backend, pdf_source, start, end, processes=1):
+    """
+    Extract and clean one page range - runs inside a worker process.
+    processes is how many processes extract shards at the same time, which
+    sets this one's share of the cores for OCR.
+    Returns (page_texts, StageTimings) for the range.
+    """
+    timings = StageTimings()
+
+    if backend in ADAPTIVE_BACKENDS:
+        return extract_shard_adaptive(pdf_source, start, end, timings, backend == 'tables', processes), timings
+    if backend == STRUCTURE_BACKEND:
+        return extract_shard_structure(pdf_source, start, end, timings), timings
+
+    page_texts = []
+
+    opened = time.perf_counter()
+    with PAGE_SOURCES[backend](pdf_source) as pages:
+        timings.add(backend, time.perf_counter() - opened)
+
+        for page_num in range(start, min(end, pages.page_count)):
+            page_started = time.perf_counter()
+            page_text = pages.page_text(page_num)
+            page_read = time.perf_counter()
+            timings.add(backend, page_read - page_started)
+
+            if page_text:
+                # Clean up the page text
+                page_text = clean_extracted_text(page_text)
+
+                # Only keep non-empty pages
+                if page_text.strip():
+                    page_texts.append({
+                        'page_num': page_num + 1,
+                        'text': page_text.strip()
+                    })
+
+            page_done = time.perf_counter()
+            timings.add('cleaning', page_done - page_read)
+            timings.add_page(page_done - page_started)
+
+    return page_texts, timings
+
+def extract_shard_structure(pdf_source, start, end, timings):
+    """
+    PyMuPDF extraction of a page range that also returns each page's line
+    records (see structure.page_lines) under 'lines', for build_sections()
+    """
+    page_texts = []
+
+    opened = time.perf_counter()
+    with PyMuPDFPages(pdf_source) as pages:
+        timings.add('pymupdf', time.perf_counter() - opened)
+
+        for page_num in range(start, min(end, pages.page_count)):
+            page_started = time.perf_counter()
+            page_text, lines = page_lines(pages.load_page(page_num))
+            page_read = time.perf_counter()
+            timings.add('pymupdf', page_read - page_started)
+
+            page_text = clean_extracted_text(page_text).strip()
+            if page_text:
+                page_texts.append({
+                    'page_num': page_num + 1,
+                    'text': page_text,
+                    'lines': lines
+                })
+
+            page_done = time.perf_counter()
+            timings.add('cleaning', page_done - page_read)
+            timings.add_page(page_done - page_started)
+
+    return page_texts
+
+def open_fallback(fallbacks, backend, pdf_source, timings):
+    """Open a fallback backend at most once per shard; None if it cannot read the document"""
+    if backend not in fallbacks:
+        try:
+            with timings.measure(backend):
+                fallbacks[backend] = PAGE_SOURCES[backend](pdf_source)
+        except Exception as e:
+            logger.warning(f"{BACKEND_NAMES[backend]} could not open document: {str(e)}")
+            fallbacks[backend] = None
+    return fallbacks[backend]
+
+def extract_page_fallback(fallbacks, pdf_source, page_num, timings=None):
+    """
+    Re-extract a single page with the fallback backends.
+    Returns (text, backend, is_valid) for the first result that passes the
+    quality check, else the first non-empty result, else ('', None, False).
+    """
+    best_text, best_backend = '', None
+    timings = timings or StageTimings()
+
+    for backend in FALLBACK_BACKENDS:
+        pages = open_fallback(fallbacks, backend, pdf_source, timings)
+        if pages is None:
+            timings.fail_page(page_num + 1)
+            continue
+        if page_num >= pages.page_count:
+            continue
+
+        try:
+            with timings.measure(backend):
+                page_text = pages.page_text(page_num)
+            with timings.measure('cleaning'):
+                page_text = clean_extracted_text(page_text).strip()
+        except Exception as e:
+            logger.warning(f"{BACKEND_NAMES[backend]} failed on page {page_num + 1}: {str(e)}")
+            timings.fail_page(page_num + 1)
+            continue
+
+        with timings.measure('cleaning'):
+            is_valid = validate_text_quality(page_text)[0]
+        if is_valid:
+            return page_text, backend, True
+
+        if page_text and not best_text:
+            best_text, best_backend = page_text, backend
+
+    return best_text, best_backend, False
+
+def extract_shard_adaptive(pdf_source, start, end, timings=None, tables=False, processes=1):
+    """
+    Extract one page range with PyMuPDF, re-extracting only the pages that
+    fail the quality check with the slower backends
+    """
+    return list(iter_pages_adaptive(pdf_source, start, end, timings, tables, processes))
+
+def find_page_tables(fallbacks, pdf_source, fitz_page, page_num, timings):
+    """
+    Structured tables of a page, or [] when PyMuPDF sees no ruling lines.
+    Only pages with rules are opened with pdfplumber's table finder.
+    """
+    with timings.measure('table_detection'):
+        if not is_table_page(fitz_page):
+            return []
+
+    pages = open_fallback(fallbacks, 'pdfplumber', pdf_source, timings)
+    if pages is None:
+        timings.fail_page(page_num + 1)
+        return []
+    if page_num >= pages.page_count:
+        return []
+
+    try:
+        with timings.measure('tables'):
+            return extract_page_tables(pages.load_page(page_num), page_num)
+    except Exception as e:
+        logger.warning(f"Table extraction failed on page {page_num + 1}: {str(e)}")
+        timings.fail_page(page_num + 1)
+        return []
+
+def iter_pages_pymupdf(pdf_source, timings=None):
+    """
+    Yield cleaned, non-empty PyMuPDF pages one at a time, in page order.
+    Each page object is dropped as soon as its text is read, so only the
+    current page is held; closing the generator closes the document.
+    """
+    timings = timings or StageTimings()
+
+    opened = time.perf_counter()
+    with open_fitz(pdf_source) as doc:
+        timings.add('pymupdf', time.perf_counter() - opened)
+
+        for page_num in range(len(doc)):
+            page_started = time.perf_counter()
+            page = doc.load_page(page_num)
+            page_text = page.get_text()
+            del page
+            page_read = time.perf_counter()
+            timings.add('pymupdf', page_read - page_started)
+
+            page_text = clean_extracted_text(page_text).strip() if page_text else ''
+
+            page_done = time.perf_counter()
+            timings.add('cleaning', page_done - page_read)
+            timings.add_page(page_done - page_started)
+
+            if page_text:
+                yield {'page_num': page_num + 1, 'text': page_text}
+
+def iter_pages_adaptive(pdf_source, start=0, end=None, timings=None, tables=False, processes=1):
+    """
+    Yield adaptively extracted pages one at a time, in page order.
+    Stage and per-page times are added to timings, if given.
+    With tables=True, pages with ruled tables also carry a 'tables' list;
+    their text is kept from PyMuPDF without trying the fallback backends,
+    since cell text rarely passes the prose quality check anyway.
+    Image-only pages go straight to OCR, when an engine is available, and
+    are recognised on the OCR thread pool while later pages are extracted;
+    the pool gets this process's share of the cores, one of processes
+    extracting at the same time.
+    """
+    fallbacks = {}
+    timings = timings or StageTimings()
+    ocr_engine = get_ocr_engine()
+    ocr_threads = ocr_workers(processes)
+    # Pages not yet yielded, in page order: page dicts (or None for empty
+    # pages) and (page_num, seconds so far, Future) for OCR pages
+    pending = deque()
+
+    try:
+        with timings.measure('pymupdf'):
+            primary = PyMuPDFPages(pdf_source)
+
+        with primary:
+            end = primary.page_count if end is None else min(end, primary.page_count)
+            for page_num in range(start, end):
+                page_started = time.perf_counter()
+                fitz_page = primary.load_page(page_num)
+                page_text = fitz_page.get_text()
+                page_read = time.perf_counter()
+                timings.add('pymupdf', page_read - page_started)
+
+                page_text = clean_extracted_text(page_text).strip()
+                backend = 'pymupdf'
+
+                if ocr_engine and is_image_only(fitz_page, page_text):
+                    # Rasterize here (fitz is not thread-safe) and OCR in the
+                    # background; the text backends cannot read a scan
+                    with timings.measure('rasterize'):
+                        image_path = get_image_cache().render(fitz_page)
+                    future = get_ocr_pool(ocr_threads).submit(recognize_page, ocr_engine, image_path)
+                    pending.append((page_num, time.perf_counter() - page_started, future))
+                    yield from drain_pages(pending, timings, ocr_engine, ocr_threads)
+                    continue
+
+                is_valid, quality_msg = validate_text_quality(page_text)
+                timings.add('cleaning', time.perf_counter() - page_read)
+
+                page_tables = []
+                if tables:
+                    page_tables = find_page_tables(fallbacks, pdf_source, fitz_page, page_num, timings)
+
+                if not is_valid and not page_tables:
+                    logger.info(f"Page {page_num + 1} failed PyMuPDF quality check ({quality_msg}), trying fallbacks")
+                    fallback_text, fallback_backend, fallback_valid = extract_page_fallback(
+                        fallbacks, pdf_source, page_num, timings
+                    )
+
+                    # Keep the PyMuPDF text unless a fallback did better
+                    if fallback_text and (fallback_valid or not page_text):
+                        page_text, backend = fallback_text, fallback_backend
+
+                timings.add_page(time.perf_counter() - page_started)
+
+                page_data = None
+                if page_text or page_tables:
+                    page_data = {
+                        'page_num': page_num + 1,
+                        'text': page_text,
+                        'method': BACKEND_NAMES[backend]
+                    }
+                    if page_tables:
+                        page_data['tables'] = page_tables
+                pending.append(page_data)
+                yield from drain_pages(pending, timings, ocr_engine, ocr_threads)
+
+            yield from drain_pages(pending, timings, ocr_engine, ocr_threads, wait=True)
+    finally:
+        for item in pending:
+            if isinstance(item, tuple):
+                item[2].cancel()
+        for pages in fallbacks.values():
+            if pages is not None:
+                pages.close()
+
+def drain_pages(pending, timings, ocr_engine, ocr_threads, wait=False):
+    """
+    Yield the finished pages at the head of the pending queue. Waits for
+    OCR when wait is set, or when more OCR pages are queued than a pool of
+    ocr_threads can work on, so lookahead stays bounded.
+    """
+    while pending:
+        item = pending[0]
+        if isinstance(item, tuple):
+            page_num, seconds, future = item
+            in_flight = sum(1 for other in pending if isinstance(other, tuple))
+            if not (wait or future.done() or in_flight > 2 * ocr_threads):
+                return
+
+            pending.popleft()
+            page_text = ''
+            try:
+                page_text, ocr_seconds = future.result()
+                timings.add('ocr', ocr_seconds)
+                seconds += ocr_seconds
+                with timings.measure('cleaning'):
+                    page_text = clean_extracted_text(page_text).strip()
+            except Exception as e:
+                logger.warning(f"OCR failed on page {page_num + 1}: {str(e)}")
+                timings.fail_page(page_num + 1)
+            timings.add_page(seconds)
+
+            if page_text:
+                yield {
+                    'page_num': page_num + 1,
+                    'text': page_text,
+                    'method': ocr_engine.name
+                }
+        else:
+            pending.popleft()
+            if item is not None:
+                yield item
+
+def get_pool(workers):
+    """Return the shared process pool for the given worker count"""
+    pool = _pools.get(workers)
+    if pool is None:
+        # Spawn rather than fork: the Flask server may be threaded and
+        # MuPDF state must not be shared with children
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+        _pools[workers] = pool
+    return pool
+
+def shutdown_pools():
+    """Stop all worker pools"""
+    for pool in _pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+    _pools.clear()
+
+def merge_shards(results, timings=None):
+    """Flatten (page_texts, StageTimings) shard results, merging the timings"""
+    page_texts = []
+    for shard_texts, shard_timings in results:
+        page_texts.extend(shard_texts)
+        if timings is not None:
+            timings.merge(shard_timings)
+    return page_texts
+
+def extract_shards_inline(backend, pdf_source, shards, progress=None):
+    """Extract shards one after another in this process"""
+    results = []
+    pages_done = 0
+    pages_total = sum(end - start for start, end in shards)
+    for start, end in shards:
+        results.append(extract_shard(backend, pdf_source, start, end))
+        pages_done += end - start
+        if progress:
+            progress(pages_done, pages_total)
+    return results
+
+def extract_pages(pdf_source, backend='pymupdf', workers=None, shard_size=None, progress=None, timings=None, pages=None):
+    """
+    Extract cleaned, non-empty pages from a PDF in page order.
+    pdf_source is a file path, PDF bytes or a PdfSource.
+    backend is 'pymupdf', 'pdfplumber', 'pypdf2', 'adaptive' (per-page
+    PyMuPDF with fallbacks; each page dict then carries a 'method' key) or
+    'tables' (adaptive, plus a 'tables' list on pages with ruled tables) or
+    'structure' (PyMuPDF, plus the 'lines' records structure.build_sections()
+    turns into a section tree).
+    Documents that fit in a single shard, or a worker count of 1, are
+    extracted inline without touching the process pool.
+    pages, if given, is a sorted list of the page indices to extract.
+    progress, if given, is called as progress(pages_done, page_count) once
+    the page count is known and after every finished shard. Stage and page
+    times of every shard are merged into timings, if given.
+    """
+    workers = EXTRACTION_WORKERS if workers is None else workers
+    if pages is None:
+        page_count = count_pages(pdf_source, backend)
+        shards = shard_pages(page_count, shard_size)
+    else:
+        page_count = len(pages)
+        shards = shard_page_list(pages, shard_size)
+
+    if progress:
+        progress(0, page_count)
+
+    if workers <= 1 or len(shards) <= 1:
+        results = extract_shards_inline(backend, pdf_source, shards, progress)
+    else:
+        try:
+            pool = get_pool(workers)
+            shared_source = worker_source(pdf_source)
+            processes = min(workers, len(shards))
+            futures = [
+                pool.submit(extract_shard, backend, shared_source, start, end, processes)
+                for start, end in shards
+            ]
+            if progress:
+                pages_done = 0
+                shard_sizes = {future: end - start for future, (start, end) in zip(futures, shards)}
+                for future in as_completed(futures):
+                    pages_done += shard_sizes[future]
+                    progress(pages_done, page_count)
+            # Futures are collected in submission order, so pages stay ordered
+            results = [future.result() for future in futures]
+        except BrokenProcessPool:
+            logger.warning(f"{backend} worker pool crashed, extracting inline")
+            _pools.pop(workers, None)
+            results = extract_shards_inline(backend, pdf_source, shards, progress)
+
+    return merge_shards(results, timings)
+
+def extract_document_inline(backend, pdf_source, shards, timings=None):
+    """Inline extraction of one batch document, returning an exception instead of raising"""
+    if isinstance(shards, Exception):
+        return shards
+    try:
+        return merge_shards(extract_shards_inline(backend, pdf_source, shards), timings)
+    except Exception as e:
+        return e
+
+def extract_documents(pdf_sources, backend='pymupdf', workers=None, shard_size=None, timings=None):
+    """
+    Extract several PDFs at once. The shards of every document are queued on
+    the same pool, so a batch of small files keeps all workers busy the way
+    one large file would.
+    Returns one entry per source in order: its page list as extract_pages()
+    would return it, or the exception that document raised, so one broken
+    file does not fail the whole batch. timings, if given, is a list with one
+    StageTimings per source.
+    """
+    workers = EXTRACTION_WORKERS if workers is None else workers
+    timings = timings or [None] * len(pdf_sources)
+
+    document_shards = []
+    for pdf_source in pdf_sources:
+        try:
+            document_shards.append(shard_pages(count_pages(pdf_source, backend), shard_size))
+        except Exception as e:
+            document_shards.append(e)
+
+    total_shards = sum(len(shards) for shards in document_shards if not isinstance(shards, Exception))
+    if workers <= 1 or total_shards <= 1:
+        return [
+            extract_document_inline(backend, pdf_source, shards, document_timings)
+            for pdf_source, shards, document_timings in zip(pdf_sources, document_shards, timings)
+        ]
+
+    try:
+        pool = get_pool(workers)
+        processes = min(workers, total_shards)
+        document_futures = []
+        for pdf_source, shards in zip(pdf_sources, document_shards):
+            if isinstance(shards, Exception):
+                document_futures.append(shards)
+                continue
+            shared_source = worker_source(pdf_source)
+            document_futures.append([
+                pool.submit(extract_shard, backend, shared_source, start, end, processes)
+                for start, end in shards
+            ])
+
+        results = []
+        for futures, document_timings in zip(document_futures, timings):
+            if isinstance(futures, Exception):
+                results.append(futures)
+                continue
+            try:
+                results.append(merge_shards([future.result() for future in futures], document_timings))
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                results.append(e)
+        return results
+    except BrokenProcessPool:
+        logger.warning(f"{backend} worker pool crashed, extracting batch inline")
+        _pools.pop(workers, None)
+        return [
+            extract_document_inline(backend, pdf_source, shards, document_timings)
+            for pdf_source, shards, document_timings in zip(pdf_sources, document_shards, timings)
+        ]
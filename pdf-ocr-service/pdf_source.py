@@ -0,0 +1,207 @@
+"""
+In-memory PDF ingestion
+Uploads are parsed straight into memory; uploads over the spill threshold
+are written once to a named temp file and read back through an mmap, so no
+request needs a second copy of the PDF on disk
+"""
+
+import hashlib
+import io
+import logging
+import mmap
+import os
+import tempfile
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+INGEST_SPILL_THRESHOLD = int(os.getenv('PDF_INGEST_SPILL_THRESHOLD', 4 * 1024 * 1024))  # 4MB in RAM
+
+def upload_buffer(total_content_length):
+    """
+    Buffer for an incoming multipart file: memory up to the spill threshold,
+    otherwise a named temp file that is later mmapped in place
+    """
+    # Browsers rarely send a per-file length, so decide on the request total
+    if total_content_length is not None and total_content_length <= INGEST_SPILL_THRESHOLD:
+        return io.BytesIO()
+    return tempfile.NamedTemporaryFile(suffix='.pdf')
+
+class BufferReader(io.RawIOBase):
+    """Read-only seekable file object over a buffer, with its own position"""
+
+    def __init__(self, buffer):
+        self.view = memoryview(buffer)
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += len(self.view)
+        self.pos = max(0, offset)
+        return self.pos
+
+    def read(self, size=-1):
+        end = len(self.view) if size is None or size < 0 else min(len(self.view), self.pos + size)
+        data = self.view[self.pos:end].tobytes()
+        self.pos = max(self.pos, end)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.view.release()
+        super().close()
+
+class PdfSource:
+    """
+    An uploaded PDF held in memory, or spilled to a temp file and mmapped.
+    `data` is what in-process readers open, `worker_source` is what is sent
+    to extraction worker processes (raw bytes, or the spill file path).
+    """
+
+    def __init__(self, data, spill_file=None, mapping=None):
+        self.data = data
+        self.spill_file = spill_file
+        self.mapping = mapping
+
+    @classmethod
+    def from_upload(cls, file):
+        """Wrap a werkzeug FileStorage without writing it to disk again"""
+        stream = file.stream
+        stream.seek(0)
+
+        if isinstance(stream, io.BytesIO):
+            return cls(stream.getvalue())
+
+        name = getattr(stream, 'name', None)
+        if not isinstance(name, str) or not os.path.exists(name):
+            # Some other stream type - copy it into a spill file of our own
+            spill_file = tempfile.NamedTemporaryFile(suffix='.pdf')
+            file.save(spill_file)
+            spill_file.flush()
+            stream = spill_file
+        else:
+            spill_file = stream
+            spill_file.flush()
+
+        if os.fstat(stream.fileno()).st_size == 0:
+            return cls(b'', spill_file)
+
+        mapping = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(memoryview(mapping), spill_file, mapping)
+
+    @property
+    def size(self):
+        return len(self.data)
+
+    @property
+    def worker_source(self):
+        if self.spill_file is not None:
+            return self.spill_file.name
+        return self.data
+
+    def close(self):
+        if self.mapping is not None:
+            try:
+                self.data.release()
+                self.mapping.close()
+            except BufferError:
+                # A reader still holds a view; the mapping is freed with it
+                logger.warning("PDF mmap still in use at close, leaving it to the garbage collector")
+            self.mapping = None
+        if self.spill_file is not None:
+            self.spill_file.close()
+            self.spill_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def local_source(source):
+    """The form of a source that can be opened in this process"""
+    return source.data if isinstance(source, PdfSource) else source
+
+def worker_source(source):
+    """The picklable form of a source for a worker process"""
+    return source.worker_source if isinstance(source, PdfSource) else source
+
+def open_fitz(source):
+    """Open a path, bytes/memoryview or PdfSource with PyMuPDF"""
+    source = local_source(source)
+    if isinstance(source, str):
+        return fitz.open(source)
+    return fitz.open(stream=source, filetype='pdf')
+
+def open_binary(source):
+    """Open a path, bytes/memoryview or PdfSource as a binary file object"""
+    source = local_source(source)
+    if isinstance(source, str):
+        return open(source, 'rb')
+    return BufferReader(source)
+
+def source_size(source):
+    """Size in bytes of a path, bytes/memoryview or PdfSource"""
+    source = local_source(source)
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    return len(source)
+
+def font_digest(doc, xref):
+    """
+    SHA-256 of what decides a font's glyphs and the text they map to: its
+    type, name and encoding, its /ToUnicode CMap and the embedded font program
+    """
+    basefont, _, font_type, program = doc.extract_font(xref)
+    digest = hashlib.sha256(f'{font_type}:{basefont}'.encode())
+    kind, encoding = doc.xref_get_key(xref, 'Encoding')
+    if kind == 'xref':
+        encoding = doc.xref_object(int(encoding.split()[0]), compressed=True)
+    digest.update(encoding.encode())
+    kind, to_unicode = doc.xref_get_key(xref, 'ToUnicode')
+    if kind == 'xref':
+        # Decoded: a re-save may compress it differently
+        digest.update(doc.xref_stream(int(to_unicode.split()[0])) or b'')
+    digest.update(program or b'')
+    return digest.digest()
+
+def page_fingerprint(page, font_digests=None):
+    """
+    SHA-256 of what a fitz page draws: its content stream, the XObjects,
+    images and fonts it uses (by content, not xref number) and its geometry.
+    Pass the same font_digests dict for every page of a document to hash
+    shared fonts once.
+    """
+    doc = page.parent
+    font_digests = {} if font_digests is None else font_digests
+    xrefs = {item[0] for item in page.get_xobjects()} | {item[0] for item in page.get_images(full=True)}
+    digest = hashlib.sha256(f'{page.rotation}:{tuple(page.rect)}'.encode())
+    digest.update(page.read_contents())
+    # Re-saved files renumber objects, so order the resources by content
+    resources = [hashlib.sha256(doc.xref_stream_raw(xref) or b'').digest() for xref in xrefs]
+    for font in page.get_fonts(full=True):
+        xref = font[0]
+        if xref not in font_digests:
+            font_digests[xref] = font_digest(doc, xref)
+        resources.append(font_digests[xref])
+    for resource in sorted(resources):
+        digest.update(resource)
+    return digest.hexdigest()
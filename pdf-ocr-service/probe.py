@@ -0,0 +1,105 @@
+"""
+Cheap document probe
+Reads the metadata, xref table size and page count of a PDF and samples a
+few pages to estimate how much of it has a text layer, without extracting
+the whole document
+"""
+
+import logging
+import os
+
+from pdf_source import open_fitz
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+PROBE_SAMPLE_PAGES = int(os.getenv('PDF_PROBE_SAMPLE_PAGES', 8))  # Pages inspected per probe
+MIN_TEXT_CHARS = 20  # A page with fewer characters counts as having no text layer
+SCANNED_IMAGE_COVERAGE = 0.5  # Image area share of a text-less page that marks it as scanned
+
+def document_metadata(doc):
+    """Title, author and date fields of an open fitz document"""
+    return {
+        'page_count': len(doc),
+        'title': doc.metadata.get('title', ''),
+        'author': doc.metadata.get('author', ''),
+        'subject': doc.metadata.get('subject', ''),
+        'creator': doc.metadata.get('creator', ''),
+        'producer': doc.metadata.get('producer', ''),
+        'creation_date': doc.metadata.get('creationDate', ''),
+        'modification_date': doc.metadata.get('modDate', '')
+    }
+
+def sample_page_numbers(page_count, sample_size=None):
+    """Evenly spaced page indices, always including the first and last page"""
+    sample_size = min(page_count, max(1, sample_size or PROBE_SAMPLE_PAGES))
+    if sample_size == 1:
+        return [0] if page_count else []
+    step = (page_count - 1) / (sample_size - 1)
+    return sorted({round(i * step) for i in range(sample_size)})
+
+def image_coverage(page):
+    """Share of the page area covered by images (overlaps counted twice, capped at 1)"""
+    page_area = abs(page.rect)
+    if not page_area:
+        return 0.0
+    covered = sum(abs(page.rect & info['bbox']) for info in page.get_image_info())
+    return min(1.0, covered / page_area)
+
+def classify_page(page):
+    """Return ('text' | 'scanned' | 'empty', char_count) for one page"""
+    char_count = len(page.get_text('text').strip())
+    if char_count >= MIN_TEXT_CHARS:
+        return 'text', char_count
+    if page.get_images() and image_coverage(page) >= SCANNED_IMAGE_COVERAGE:
+        return 'scanned', char_count
+    return 'empty', char_count
+
+def probe_document(pdf_source, sample_size=None):
+    """
+    Describe a PDF without extracting it: metadata, page count, xref size and
+    the share of sampled pages with a text layer versus scanned images
+    """
+    with open_fitz(pdf_source) as doc:
+        encrypted = doc.needs_pass
+        result = {
+            'metadata': document_metadata(doc) if not encrypted else {'page_count': len(doc)},
+            'page_count': len(doc),
+            'pdf_version': doc.metadata.get('format', '') if doc.metadata else '',
+            'xref_count': doc.xref_length(),
+            'encrypted': bool(encrypted)
+        }
+
+        counts = {'text': 0, 'scanned': 0, 'empty': 0}
+        sampled_chars = 0
+        pages = [] if encrypted else sample_page_numbers(len(doc), sample_size)
+        for page_num in pages:
+            kind, char_count = classify_page(doc[page_num])
+            counts[kind] += 1
+            sampled_chars += char_count
+
+    sampled = len(pages)
+    text_ratio = counts['text'] / sampled if sampled else 0.0
+    scanned_ratio = counts['scanned'] / sampled if sampled else 0.0
+
+    if not sampled:
+        content_type = 'unknown'
+    elif text_ratio >= 0.8:
+        content_type = 'text'
+    elif scanned_ratio >= 0.8:
+        content_type = 'scanned'
+    else:
+        content_type = 'mixed'
+
+    result['sample'] = {
+        'pages': [page_num + 1 for page_num in pages],
+        'text_pages': counts['text'],
+        'scanned_pages': counts['scanned'],
+        'empty_pages': counts['empty'],
+        'text_ratio': round(text_ratio, 3),
+        'scanned_ratio': round(scanned_ratio, 3),
+        'avg_chars_per_page': round(sampled_chars / sampled) if sampled else 0
+    }
+    result['content_type'] = content_type
+    result['estimated_char_count'] = round(sampled_chars / sampled * result['page_count']) if sampled else 0
+    return result
@@ -0,0 +1,200 @@
+"""
+Section and heading structure from font metadata
+PyMuPDF's get_text('dict') gives every line's font size and weight in the same
+pass that reads the text; lines set noticeably larger (or bold) than the body
+text become headings, and the text between them becomes their section
+"""
+
+import logging
+import os
+import re
+from collections import Counter
+
+import fitz  # PyMuPDF
+
+from text_cleaning import clean_extracted_text
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+HEADING_SIZE_RATIO = float(os.getenv('PDF_HEADING_SIZE_RATIO', 1.15))  # Font size over body size that marks a heading
+MAX_HEADING_LEVELS = 3
+MAX_HEADING_CHARS = 120  # Longer lines are body text whatever their font
+RUNNING_HEADER_SHARE = 0.5  # A heading repeated on this share of pages is a running header
+
+BOLD_FLAG = 16  # PyMuPDF span flag
+HAS_LETTER = re.compile(r'[^\W\d_]')
+
+def span_is_bold(span):
+    return bool(span['flags'] & BOLD_FLAG) or 'bold' in span['font'].lower()
+
+def page_lines(page):
+    """
+    Read a fitz page once with get_text('dict'). Returns the page text (one
+    line per text line, as get_text() lays it out) and a [text, size, bold]
+    record per non-blank line, size being that of the line's dominant span.
+    """
+    text_lines = []
+    records = []
+
+    # Same flags as plain get_text(), so image blocks are not decoded
+    for block in page.get_text('dict', flags=fitz.TEXTFLAGS_TEXT)['blocks']:
+        if block['type'] != 0:
+            continue
+        for line in block['lines']:
+            spans = line['spans']
+            text = ''.join(span['text'] for span in spans)
+            text_lines.append(text)
+
+            stripped = text.strip()
+            if not stripped:
+                continue
+            inked = [span for span in spans if span['text'].strip()]
+            dominant = max(inked, key=lambda span: len(span['text']))
+            records.append([
+                stripped,
+                round(dominant['size'] * 2) / 2,
+                all(span_is_bold(span) for span in inked)
+            ])
+
+    return '\n'.join(text_lines), records
+
+def body_font_size(page_texts):
+    """Font size carrying the most characters"""
+    sizes = Counter()
+    for page_data in page_texts:
+        for text, size, _ in page_data['lines']:
+            sizes[size] += len(text)
+    return sizes.most_common(1)[0][0] if sizes else 0
+
+def heading_levels(page_texts, body_size):
+    """
+    Map each heading line to its level: distinct heading font sizes from the
+    largest down are levels 1, 2, ...; bold body-size lines come last.
+    Running headers (the same heading on many pages) are left out.
+    """
+    candidates = []
+    pages_with_heading = Counter()
+    for page_data in page_texts:
+        seen = set()
+        for index, (text, size, bold) in enumerate(page_data['lines']):
+            if len(text) > MAX_HEADING_CHARS or not HAS_LETTER.search(text):
+                continue
+            if size >= body_size * HEADING_SIZE_RATIO or (bold and size >= body_size and not text.endswith('.')):
+                candidates.append((page_data['page_num'], index, text, size))
+                seen.add(text.lower())
+        pages_with_heading.update(seen)
+
+    repeat_limit = max(3, len(page_texts) * RUNNING_HEADER_SHARE)
+    candidates = [
+        candidate for candidate in candidates
+        if pages_with_heading[candidate[2].lower()] < repeat_limit
+    ]
+
+    sizes = sorted({size for _, _, _, size in candidates if size >= body_size * HEADING_SIZE_RATIO}, reverse=True)
+    rank = {size: min(position + 1, MAX_HEADING_LEVELS) for position, size in enumerate(sizes)}
+    bold_level = min(len(sizes) + 1, MAX_HEADING_LEVELS)
+
+    return {
+        (page_num, index): rank.get(size, bold_level)
+        for page_num, index, _, size in candidates
+    }
+
+def new_section(title, level, page_num):
+    return {'title': title, 'level': level, 'page_num': page_num, 'lines': [], 'sections': []}
+
+def finish_section(section):
+    """Turn a section's collected lines into cleaned text, depth first"""
+    section['text'] = clean_extracted_text('\n'.join(section.pop('lines'))).strip()
+    for child in section['sections']:
+        finish_section(child)
+    return section
+
+def build_sections(page_texts):
+    """
+    Heading/section tree of pages extracted with page_lines(). Each section
+    is {'title', 'level', 'page_num', 'text', 'sections'}; text before the
+    first heading goes into a leading section titled None. The 'lines'
+    records are removed from the pages.
+    """
+    if not page_texts:
+        return []
+
+    body_size = body_font_size(page_texts)
+    levels = heading_levels(page_texts, body_size)
+
+    roots = []
+    stack = []  # open sections, outermost first
+    previous_heading = None  # (page_num, index, level) of the last heading line
+
+    for page_data in page_texts:
+        page_num = page_data['page_num']
+        for index, (text, _, _) in enumerate(page_data.pop('lines')):
+            level = levels.get((page_num, index))
+            if level is None:
+                if not stack:
+                    stack.append(new_section(None, 1, page_num))
+                    roots.append(stack[0])
+                stack[-1]['lines'].append(text)
+                continue
+
+            # A title wrapped over several lines continues the same heading
+            if previous_heading == (page_num, index - 1, level) and not stack[-1]['lines']:
+                stack[-1]['title'] += ' ' + text
+                previous_heading = (page_num, index, level)
+                continue
+
+            while stack and stack[-1]['level'] >= level:
+                stack.pop()
+            section = new_section(text, level, page_num)
+            (stack[-1]['sections'] if stack else roots).append(section)
+            stack.append(section)
+            previous_heading = (page_num, index, level)
+
+    return [finish_section(section) for section in roots]
+
+def iter_blocks(page_texts):
+    """
+    Yield (section title, page_num, text) runs of text in reading order,
+    split at headings and page breaks, for consumers such as the chunker
+    that need each line's page rather than a tree. Every heading is a block
+    of its own, titled with itself. Pages without 'lines' records (from
+    another backend) are one block of their text.
+    """
+    structured = [page_data for page_data in page_texts if 'lines' in page_data]
+    levels = heading_levels(structured, body_font_size(structured))
+
+    title = None
+    previous_heading = None
+    for page_data in page_texts:
+        page_num = page_data['page_num']
+        if 'lines' not in page_data:
+            yield title, page_num, page_data['text']
+            continue
+
+        headings = []  # heading texts waiting for their (possibly wrapped) title to end
+        lines = []
+        for index, (text, _, _) in enumerate(page_data.pop('lines')):
+            level = levels.get((page_num, index))
+            if level is None:
+                for heading in headings:
+                    yield heading, page_num, heading
+                headings = []
+                lines.append(text)
+                continue
+
+            if lines:
+                yield title, page_num, clean_extracted_text('\n'.join(lines)).strip()
+                lines = []
+            # A title wrapped over several lines continues the same heading
+            if headings and previous_heading == (page_num, index - 1, level):
+                headings[-1] += ' ' + text
+            else:
+                headings.append(text)
+            title = headings[-1]
+            previous_heading = (page_num, index, level)
+
+        for heading in headings:
+            yield heading, page_num, heading
+        if lines:
+            yield title, page_num, clean_extracted_text('\n'.join(lines)).strip()
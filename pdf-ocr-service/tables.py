@@ -0,0 +1,76 @@
+"""
+Table extraction fast path
+PyMuPDF's vector drawing list is used to spot pages with ruled tables; only
+those pages are handed to pdfplumber's (much slower) table finder
+"""
+
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+TABLE_MIN_RULES = int(os.getenv('PDF_TABLE_MIN_RULES', 3))  # Horizontal and vertical rules a table page needs
+MIN_RULE_LENGTH = 20  # Points; shorter strokes are underlines, bullets or glyph art
+MAX_RULE_THICKNESS = 2  # Points; thicker filled rects are shapes, not rules
+
+WHITESPACE = re.compile(r'\s+')
+
+def count_rules(page):
+    """Count (horizontal, vertical) ruling lines among a fitz page's drawings"""
+    horizontal = vertical = 0
+
+    for path in page.get_cdrawings():
+        for item in path['items']:
+            if item[0] == 'l':
+                (x0, y0), (x1, y1) = item[1], item[2]
+                width, height = abs(x1 - x0), abs(y1 - y0)
+            elif item[0] == 're':
+                x0, y0, x1, y1 = item[1]
+                width, height = abs(x1 - x0), abs(y1 - y0)
+                if width > MAX_RULE_THICKNESS and height > MAX_RULE_THICKNESS:
+                    # A cell or boxed table: its edges act as two rules each way
+                    if width >= MIN_RULE_LENGTH and height >= MIN_RULE_LENGTH / 2:
+                        horizontal += 2
+                        vertical += 2
+                    continue
+            else:
+                continue
+
+            if height <= MAX_RULE_THICKNESS and width >= MIN_RULE_LENGTH:
+                horizontal += 1
+            elif width <= MAX_RULE_THICKNESS and height >= MIN_RULE_LENGTH:
+                vertical += 1
+
+    return horizontal, vertical
+
+def is_table_page(page):
+    """Whether a fitz page has enough ruling lines to hold a table"""
+    horizontal, vertical = count_rules(page)
+    return horizontal >= TABLE_MIN_RULES and vertical >= TABLE_MIN_RULES
+
+def clean_cell(cell):
+    return WHITESPACE.sub(' ', cell).strip() if cell else ''
+
+def extract_page_tables(plumber_page, page_num):
+    """
+    Structured tables of one pdfplumber page, as
+    {'page_num', 'bbox', 'rows'} dicts with empty rows dropped
+    """
+    tables = []
+
+    for table in plumber_page.find_tables():
+        rows = [
+            [clean_cell(cell) for cell in row]
+            for row in table.extract()
+        ]
+        rows = [row for row in rows if any(row)]
+        if rows:
+            tables.append({
+                'page_num': page_num + 1,
+                'bbox': [round(value, 2) for value in table.bbox],
+                'rows': rows
+            })
+
+    return tables
@@ -0,0 +1,179 @@
+"""
+Text cleaning helpers for the PDF OCR Service
+Shared by the Flask app and the page extraction workers
+"""
+
+import logging
+import re
+import string
+from collections import Counter, namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Patterns are compiled once at import instead of on every call
+EXCESS_NEWLINES = re.compile(r'\n\s*\n\s*\n+')  # Max 2 consecutive newlines
+EXCESS_SPACES = re.compile(r'[ \t]+')  # Normalize spaces
+CONTROL_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]')  # Control characters
+
+# Deleting ASCII letters via str.translate counts them far faster than
+# calling str.isalpha per character, and is exact for ASCII text
+ASCII_LETTERS_TABLE = str.maketrans('', '', string.ascii_letters)
+
+# Result of one pass over a text: raw lines, their stripped forms, counts of
+# non-empty stripped lines and the number of alphabetic characters
+TextStats = namedtuple('TextStats', ['lines', 'stripped', 'line_counts', 'alpha_chars', 'length'])
+
+class TextCleaner:
+    """
+    Cleans extracted text and judges its quality.
+    validate() and remove_repetitions() accept the TextStats of a previous
+    analyze() so a document is split and counted only once.
+    """
+
+    def __init__(self, min_repetitions=3, max_kept_repetitions=2):
+        self.min_repetitions = min_repetitions
+        self.max_kept_repetitions = max_kept_repetitions
+
+    def clean(self, text):
+        """Clean up extracted text by removing excessive whitespace and artifacts"""
+        if not text:
+            return ""
+
+        # Remove excessive whitespace
+        text = EXCESS_NEWLINES.sub('\n\n', text)
+        text = EXCESS_SPACES.sub(' ', text)
+
+        # Remove common OCR artifacts
+        text = CONTROL_CHARS.sub('', text)
+
+        # Drop page numbers (short digit-only lines) and very short lines,
+        # keeping blank lines as they are
+        cleaned_lines = []
+        for line in text.split('\n'):
+            stripped = line.strip()
+            if not stripped or (len(stripped) > 2 and not (len(stripped) <= 3 and stripped.isdigit())):
+                cleaned_lines.append(line)
+
+        return '\n'.join(cleaned_lines)
+
+    def analyze(self, text):
+        """Split, strip and count a text once for validate() and remove_repetitions()"""
+        lines = text.split('\n')
+        stripped = [line.strip() for line in lines]
+        line_counts = Counter(filter(None, stripped))
+        if text.isascii():
+            alpha_chars = len(text) - len(text.translate(ASCII_LETTERS_TABLE))
+        else:
+            alpha_chars = sum(map(str.isalpha, text))
+        return TextStats(lines, stripped, line_counts, alpha_chars, len(text))
+
+    def validate(self, text, stats=None):
+        """Check if extracted text is of good quality"""
+        if not text or len(text.strip()) < 10:
+            return False, "Text too short"
+
+        stats = stats or self.analyze(text)
+
+        # Check for excessive repetition
+        total_lines = sum(stats.line_counts.values())
+        if not total_lines:
+            return False, "No content lines"
+
+        most_common = stats.line_counts.most_common(1)[0]
+
+        # If any line repeats more than 50% of total lines, it's likely garbage
+        if total_lines > 10 and most_common[1] > total_lines * 0.5:
+            return False, f"Excessive repetition detected: '{most_common[0][:50]}...'"
+
+        # Check for reasonable character distribution
+        if stats.length > 0 and stats.alpha_chars / stats.length < 0.3:
+            return False, "Too few alphabetic characters"
+
+        return True, "Quality OK"
+
+    def remove_repetitions(self, text, stats=None, min_repetitions=None):
+        """Detect and remove repetitive content patterns"""
+        min_repetitions = min_repetitions or self.min_repetitions
+        stats = stats or self.analyze(text)
+
+        # Find lines that repeat excessively
+        repetitive_lines = {
+            line for line, count in stats.line_counts.items()
+            if count >= min_repetitions and len(line) > 10
+        }
+
+        if not repetitive_lines:
+            return text
+
+        # Keep only the first few occurrences of each repetitive line
+        cleaned_lines = []
+        line_seen_count = {}
+
+        for line, stripped in zip(stats.lines, stats.stripped):
+            if stripped in repetitive_lines:
+                count = line_seen_count.get(stripped, 0)
+                line_seen_count[stripped] = count + 1
+
+                if count < self.max_kept_repetitions:
+                    cleaned_lines.append(line)
+                else:
+                    logger.info(f"Removing repetitive content: {stripped[:50]}...")
+            else:
+                cleaned_lines.append(line)
+
+        return '\n'.join(cleaned_lines)
+
+    def finalize(self, text):
+        """
+        Validate a combined document and strip repetitive lines from it using
+        a single analysis pass. Returns (is_valid, quality_msg, text).
+        """
+        stats = self.analyze(text)
+        is_valid, quality_msg = self.validate(text, stats)
+        if is_valid:
+            text = self.remove_repetitions(text, stats)
+        return is_valid, quality_msg, text
+
+# Shared default cleaner
+text_cleaner = TextCleaner()
+
+def clean_extracted_text(text):
+    """Clean up extracted text by removing excessive whitespace and artifacts"""
+    return text_cleaner.clean(text)
+
+def iter_unique_pages(page_texts):
+    """Yield pages from an iterable, skipping duplicates as they arrive"""
+    seen_content = set()
+
+    for page_data in page_texts:
+        # Create a signature of the page content
+        content = page_data['text'].strip()
+
+        # Skip empty pages
+        if not content:
+            continue
+
+        # Create a hash of first 500 chars (or full content if shorter)
+        content_hash = hash(content[:500])
+
+        # Check for exact duplicates
+        if content_hash not in seen_content:
+            seen_content.add(content_hash)
+            yield page_data
+        else:
+            logger.info(f"Skipping duplicate page {page_data['page_num']}")
+
+def remove_duplicate_pages(page_texts):
+    """Remove duplicate pages based on content similarity"""
+    if len(page_texts) <= 1:
+        return page_texts
+
+    return list(iter_unique_pages(page_texts))
+
+def detect_repetitive_content(text, min_repetitions=3):
+    """Detect and remove repetitive content patterns"""
+    return text_cleaner.remove_repetitions(text, min_repetitions=min_repetitions)
+
+def validate_text_quality(text):
+    """Check if extracted text is of good quality"""
+    return text_cleaner.validate(text)
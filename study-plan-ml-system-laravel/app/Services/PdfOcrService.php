@@ -544,6 +544,301 @@ private function decodePdfString(string $pdfString): string
         return trim($decoded);
     }
 
+    /**
+     * Extract text page by page from the streaming endpoint.
+     * $onPage is called with each page (page_num, text, method, char_count,
+     * elapsed_ms) as soon as the service emits it, so callers can start
+     * chunking before the whole document has been processed.
+     */
+    public function extractTextStreaming(UploadedFile $file, callable $onPage): array
+    {
+        try {
+            if (!$this->isServiceAvailable()) {
+                return [
+                    'success' => false,
+                    'error' => 'PDF processing service is not available'
+                ];
+            }
+
+            $response = Http::timeout($this->timeout)
+                ->withOptions(['stream' => true])
+                ->attach('file', file_get_contents($file->getPathname()), $file->getClientOriginalName())
+                ->post($this->serviceUrl . '/extract-text-stream');
+
+            if (!$response->successful()) {
+                return [
+                    'success' => false,
+                    'error' => 'Failed to communicate with PDF processing service (HTTP ' . $response->status() . ')'
+                ];
+            }
+
+            $body = $response->toPsrResponse()->getBody();
+            $buffer = '';
+            $pages = [];
+            $summary = null;
+
+            while (!$body->eof()) {
+                $buffer .= $body->read(8192);
+
+                // Each NDJSON line is one complete event
+                while (($newline = strpos($buffer, "\n")) !== false) {
+                    $line = trim(substr($buffer, 0, $newline));
+                    $buffer = substr($buffer, $newline + 1);
+
+                    if ($line === '') {
+                        continue;
+                    }
+
+                    $event = json_decode($line, true);
+
+                    if (($event['type'] ?? null) === 'page') {
+                        $pages[] = "--- Page {$event['page_num']} ---\n" . $event['text'];
+                        $onPage($event);
+                    } elseif (($event['type'] ?? null) === 'error') {
+                        Log::error('PdfOcrService: Streaming extraction error: ' . ($event['error'] ?? 'Unknown error'));
+                        return [
+                            'success' => false,
+                            'error' => $event['error'] ?? 'Unknown error occurred'
+                        ];
+                    } elseif (($event['type'] ?? null) === 'end') {
+                        $summary = $event;
+                    }
+                }
+            }
+
+            if (!$summary || !($summary['success'] ?? false)) {
+                return [
+                    'success' => false,
+                    'error' => 'Could not extract text from PDF'
+                ];
+            }
+
+            $text = implode("\n\n", $pages);
+
+            return [
+                'success' => true,
+                'text' => $text,
+                'method' => $summary['method'] ?? 'External OCR Service',
+                'char_count' => strlen($text),
+                'word_count' => str_word_count($text),
+                'page_count' => $summary['page_count'] ?? count($pages)
+            ];
+
+        } catch (\Exception $e) {
+            Log::error('Streaming PDF OCR processing failed: ' . $e->getMessage());
+            return [
+                'success' => false,
+                'error' => 'Failed to process PDF: ' . $e->getMessage()
+            ];
+        }
+    }
+
+    /**
+     * Page count, metadata and text-versus-scanned estimate of a PDF,
+     * without extracting its text
+     */
+    public function probePdf(UploadedFile $file): array
+    {
+        try {
+            $response = Http::timeout(10)
+                ->attach('file', file_get_contents($file->getPathname()), $file->getClientOriginalName())
+                ->post($this->serviceUrl . '/probe');
+
+            $result = $response->json() ?? [];
+
+            if ($response->successful() && ($result['success'] ?? false)) {
+                return $result;
+            }
+
+            return [
+                'success' => false,
+                'error' => $result['error'] ?? 'Failed to communicate with PDF processing service'
+            ];
+
+        } catch (\Exception $e) {
+            Log::error('PDF probe failed: ' . $e->getMessage());
+            return [
+                'success' => false,
+                'error' => 'Failed to probe PDF: ' . $e->getMessage()
+            ];
+        }
+    }
+
+    /**
+     * Extract a PDF straight into sentence-aligned chunks sized for the quiz
+     * services. Each chunk has 'text', 'token_estimate', 'page_start',
+     * 'page_end' and the 'section' heading it starts under.
+     */
+    public function extractChunks(UploadedFile $file, int $maxTokens = 750, int $overlapTokens = 50): array
+    {
+        try {
+            if (!$this->isServiceAvailable()) {
+                return [
+                    'success' => false,
+                    'error' => 'PDF processing service is not available'
+                ];
+            }
+
+            $response = Http::timeout($this->timeout)
+                ->attach('file', file_get_contents($file->getPathname()), $file->getClientOriginalName())
+                ->post($this->serviceUrl . '/chunk', [
+                    'max_tokens' => $maxTokens,
+                    'overlap_tokens' => $overlapTokens
+                ]);
+
+            $result = $response->json() ?? [];
+
+            if ($response->successful() && ($result['success'] ?? false)) {
+                return [
+                    'success' => true,
+                    'chunks' => $result['chunks'] ?? [],
+                    'method' => $result['method'] ?? 'unknown'
+                ];
+            }
+
+            return [
+                'success' => false,
+                'error' => $result['error'] ?? 'Failed to communicate with PDF processing service'
+            ];
+
+        } catch (\Exception $e) {
+            Log::error('PDF chunking failed: ' . $e->getMessage());
+            return [
+                'success' => false,
+                'error' => 'Failed to chunk PDF: ' . $e->getMessage()
+            ];
+        }
+    }
+
+    /**
+     * Extract text from several PDFs in a single request.
+     * Returns one result per file in the same order, each with 'filename'
+     * and either the extracted 'text' or an 'error'.
+     *
+     * @param UploadedFile[] $files
+     */
+    public function extractTextBatch(array $files): array
+    {
+        try {
+            if (!$this->isServiceAvailable()) {
+                return [
+                    'success' => false,
+                    'error' => 'PDF processing service is not available'
+                ];
+            }
+
+            $request = Http::timeout($this->timeout * max(1, count($files)));
+            foreach ($files as $file) {
+                $request = $request->attach('files[]', file_get_contents($file->getPathname()), $file->getClientOriginalName());
+            }
+
+            $response = $request->post($this->serviceUrl . '/extract-batch');
+            $result = $response->json() ?? [];
+
+            if ($response->successful() && ($result['success'] ?? false)) {
+                return [
+                    'success' => true,
+                    'results' => $result['results'] ?? [],
+                    'succeeded' => $result['succeeded'] ?? 0,
+                    'failed' => $result['failed'] ?? 0,
+                    'timing' => $result['timing'] ?? null
+                ];
+            }
+
+            return [
+                'success' => false,
+                'error' => $result['error'] ?? 'Failed to communicate with PDF processing service'
+            ];
+
+        } catch (\Exception $e) {
+            Log::error('Batch PDF OCR processing failed: ' . $e->getMessage());
+            return [
+                'success' => false,
+                'error' => 'Failed to process PDFs: ' . $e->getMessage()
+            ];
+        }
+    }
+
+    /**
+     * Queue a PDF for background extraction on the service.
+     * Returns the job id immediately; poll getExtractionJob() for progress
+     * instead of holding one long HTTP request open for large files.
+     */
+    public function submitExtractionJob(UploadedFile $file): array
+    {
+        try {
+            if (!$this->isServiceAvailable()) {
+                return [
+                    'success' => false,
+                    'error' => 'PDF processing service is not available'
+                ];
+            }
+
+            $response = Http::timeout($this->timeout)
+                ->attach('file', file_get_contents($file->getPathname()), $file->getClientOriginalName())
+                ->post($this->serviceUrl . '/jobs');
+
+            $result = $response->json() ?? [];
+
+            if ($response->successful() && isset($result['job_id'])) {
+                return [
+                    'success' => true,
+                    'job_id' => $result['job_id'],
+                    'status' => $result['status'] ?? 'queued',
+                    'result' => $result['result'] ?? null
+                ];
+            }
+
+            return [
+                'success' => false,
+                'error' => $result['error'] ?? 'Failed to communicate with PDF processing service'
+            ];
+
+        } catch (\Exception $e) {
+            Log::error('Queueing PDF OCR job failed: ' . $e->getMessage());
+            return [
+                'success' => false,
+                'error' => 'Failed to queue PDF: ' . $e->getMessage()
+            ];
+        }
+    }
+
+    /**
+     * Status of a background extraction job: 'status' (queued, running,
+     * done or failed), 'progress' (pages_done, pages_total, percent) and,
+     * once done, the extraction 'result'
+     */
+    public function getExtractionJob(string $jobId): array
+    {
+        try {
+            $response = Http::timeout(10)->get($this->serviceUrl . '/jobs/' . urlencode($jobId));
+            $result = $response->json() ?? [];
+
+            if ($response->notFound()) {
+                return [
+                    'success' => false,
+                    'error' => 'Job not found'
+                ];
+            }
+
+            if (!$response->successful()) {
+                return [
+                    'success' => false,
+                    'error' => 'Failed to communicate with PDF processing service'
+                ];
+            }
+
+            return $result;
+
+        } catch (\Exception $e) {
+            Log::error('Fetching PDF OCR job failed: ' . $e->getMessage());
+            return [
+                'success' => false,
+                'error' => 'Failed to fetch job status: ' . $e->getMessage()
+            ];
+        }
+    }
+
     /**
      * Extract text with advanced options and metadata
      */
@@ -562,6 +857,10 @@ public function extractTextAdvanced(UploadedFile $file, array $options = []): ar
                 'method' => $options['method'] ?? 'auto'
             ];
 
+            if (!empty($options['include_structure'])) {
+                $formData['include_structure'] = 'true';
+            }
+
             $response = Http::timeout($this->timeout)
                 ->attach('file', file_get_contents($file->getPathname()), $file->getClientOriginalName())
                 ->post($this->serviceUrl . '/extract-text-advanced', $formData);
@@ -577,7 +876,8 @@ public function extractTextAdvanced(UploadedFile $file, array $options = []): ar
                         'char_count' => $result['char_count'] ?? 0,
                         'word_count' => $result['word_count'] ?? 0,
                         'line_count' => $result['line_count'] ?? 0,
-                        'metadata' => $result['metadata'] ?? null
+                        'metadata' => $result['metadata'] ?? null,
+                        'sections' => $result['sections'] ?? null
                     ];
                 } else {
                     return [
@@ -0,0 +1,91 @@
+"""
+Annotated document shared by the quiz generation stages
+
+The content is parsed once, by spaCy when its model is available, and every
+stage reads sentences, tokens, POS tags and entities from the result instead
+of tokenizing and tagging the text again
+"""
+
+from typing import Dict, List, Tuple
+
+def load_spacy_pipeline(name: str = "en_core_web_sm"):
+    """
+    A spaCy pipeline for AnnotatedDocument: without the lemmatizer, which no
+    stage uses, and with the fast sentence recognizer instead of the
+    dependency parser for sentence boundaries. Raises OSError if the model
+    is not installed.
+    """
+    import spacy
+
+    nlp = spacy.load(name, exclude=["lemmatizer"])
+    if 'senter' in nlp.disabled and 'parser' in nlp.pipe_names:
+        nlp.disable_pipe('parser')
+        nlp.enable_pipe('senter')
+    return nlp
+
+class AnnotatedDocument:
+    """
+    Sentences of a text with their tokens, Penn Treebank POS tags and the
+    named entities found in it. Build one with from_spacy() or, without a
+    spaCy model, from_nltk() (tags are then computed per sentence on first use).
+    """
+
+    def __init__(self, sentences: List[str], tokens: List[List[str]],
+                 tags: List[List[Tuple[str, str]]] = None, entities: List[Dict[str, str]] = None,
+                 pos_tag=None):
+        self.sentences = sentences
+        self.tokens = tokens  # Tokens of each sentence, as written
+        self.entities = entities or []
+        self._tags = tags
+        self._pos_tag = pos_tag
+        self._index = {sentence: i for i, sentence in reversed(list(enumerate(sentences)))}
+        self._lower_tokens = None
+
+    @classmethod
+    def from_spacy(cls, nlp, text: str) -> 'AnnotatedDocument':
+        """One spaCy pass: sentence boundaries, tagger and NER together"""
+        import spacy
+
+        doc = nlp(text)
+        sentences = []
+        tokens = []
+        tags = []
+        for sent in doc.sents:
+            sentence = sent.text.strip()
+            if not sentence:
+                continue
+            words = [token for token in sent if not token.is_space]
+            sentences.append(sentence)
+            tokens.append([token.text for token in words])
+            tags.append([(token.text, token.tag_) for token in words])
+
+        entities = [
+            {
+                'text': ent.text.strip(),
+                'label': ent.label_,
+                'description': spacy.explain(ent.label_) or ent.label_
+            }
+            for ent in doc.ents
+        ]
+        return cls(sentences, tokens, tags, entities)
+
+    @classmethod
+    def from_nltk(cls, text: str, sent_tokenize, word_tokenize, pos_tag) -> 'AnnotatedDocument':
+        """NLTK fallback: sentences and tokens now, POS tags on demand, no entities"""
+        sentences = sent_tokenize(text)
+        return cls(sentences, [word_tokenize(sentence) for sentence in sentences], pos_tag=pos_tag)
+
+    def lower_tokens(self) -> List[List[str]]:
+        """Lowercased tokens of each sentence"""
+        if self._lower_tokens is None:
+            self._lower_tokens = [[token.lower() for token in tokens] for tokens in self.tokens]
+        return self._lower_tokens
+
+    def pos_tags(self, sentence: str) -> List[Tuple[str, str]]:
+        """(token, tag) pairs of one of the document's sentences"""
+        i = self._index[sentence]
+        if self._tags is None:
+            self._tags = [None] * len(self.sentences)
+        if self._tags[i] is None:
+            self._tags[i] = self._pos_tag(self.tokens[i])
+        return self._tags[i]
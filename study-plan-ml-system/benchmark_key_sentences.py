@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark: vectorized key sentence scoring vs the per-sentence loop
+Scores synthetic notes with the old loop, the vectorized path and
+score_sentences (which picks between them by sentence count), checks that
+all pick the same sentences in the same order, and times them. Tokens come from a regex split, so no
+spaCy model or NLTK data is needed.
+
+    python benchmark_key_sentences.py [pages] [repeats]
+"""
+
+import random
+import re
+import statistics
+import sys
+import time
+
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+from key_sentences import score_sentences, score_sentences_vectorized, top_k
+
+WORDS = (
+    'process thread memory kernel scheduler cache network protocol packet database index '
+    'transaction algorithm complexity graph tree queue stack compiler register pipeline '
+    'virtual paging deadlock semaphore mutex latency throughput bandwidth encryption key'
+).split()
+FILLER = ['the', 'a', 'of', 'and', 'to', 'in', 'is', 'it', 'that', 'with', 'for', 'on']
+SENTENCES_PER_PAGE = 40
+MAX_KEY_SENTENCES = 10
+
+def make_notes(pages, seed=11):
+    """Sentences of mixed length and stop-word share, with repeats and ties"""
+    rng = random.Random(seed)
+    sentences = []
+    for _ in range(pages * SENTENCES_PER_PAGE):
+        if sentences and rng.random() < 0.05:
+            sentences.append(rng.choice(sentences))
+            continue
+        words = [rng.choice(FILLER if rng.random() < 0.4 else WORDS) for _ in range(rng.randint(1, 30))]
+        words[0] = words[0].capitalize()
+        sentences.append(' '.join(words) + '.')
+    return sentences
+
+def tokenize(sentence):
+    return re.findall(r"\w+|[^\w\s]", sentence)
+
+def loop_key_sentences(sentences, tokens, stop_words):
+    """QuizGenerator._identify_key_sentences before vectorizing"""
+    if len(sentences) <= MAX_KEY_SENTENCES:
+        return list(sentences)
+    sentence_scores = []
+    for i, (sentence, words) in enumerate(zip(sentences, tokens)):
+        words = [word.lower() for word in words]
+        score = 0
+        score += 1 - (i / len(sentences)) * 0.3
+        score += (min(len(words) / 20, 1) if len(words) > 5 else 0) * 0.5
+        score += sum(1 for word in words if word not in stop_words) / len(words) * 0.3
+        sentence_scores.append((sentence, score))
+    sentence_scores.sort(key=lambda x: x[1], reverse=True)
+    return [sent[0] for sent in sentence_scores[:MAX_KEY_SENTENCES]]
+
+def key_sentences(score, sentences, tokens, stop_words):
+    if len(sentences) <= MAX_KEY_SENTENCES:
+        return list(sentences)
+    return [sentences[i] for i in top_k(score(tokens, stop_words), MAX_KEY_SENTENCES)]
+
+def timed(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), result
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    stop_words = set(ENGLISH_STOP_WORDS)
+
+    for size in sorted({1, 5, max(1, pages // 10), pages}):
+        sentences = make_notes(size)
+        tokens = [tokenize(sentence) for sentence in sentences]
+        loop_seconds, loop = timed(lambda: loop_key_sentences(sentences, tokens, stop_words), repeats)
+        vector_seconds, vector = timed(
+            lambda: key_sentences(score_sentences_vectorized, sentences, tokens, stop_words), repeats
+        )
+        chosen_seconds, chosen = timed(lambda: key_sentences(score_sentences, sentences, tokens, stop_words), repeats)
+
+        print(f"\n{size} pages, {len(sentences)} sentences, {sum(map(len, tokens))} tokens")
+        print(f"  loop       {loop_seconds * 1000:9.2f} ms")
+        print(f"  vectorized {vector_seconds * 1000:9.2f} ms")
+        print(f"  speedup    {loop_seconds / vector_seconds:9.2f}x")
+        print(f"  score_sentences {chosen_seconds * 1000:9.2f} ms ({loop_seconds / chosen_seconds:.2f}x)")
+        print(f"  same key sentences, same order: {loop == vector == chosen}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark: one shared spaCy parse vs the previous per-stage tokenization
+Times the tokenizing, tagging and NER work of QuizGenerator.analyze_content
+plus MCQ generation on synthetic notes, both ways. KeyBERT and textstat run
+the same in both and are left out. Needs en_core_web_sm and the NLTK punkt,
+stopwords and averaged_perceptron_tagger data.
+
+    python benchmark_quiz_analysis.py [paragraphs] [repeats]
+"""
+
+import random
+import statistics
+import sys
+import time
+
+import spacy
+from nltk.corpus import stopwords
+from nltk.tag import pos_tag
+from nltk.tokenize import sent_tokenize, word_tokenize
+
+from annotated_document import AnnotatedDocument, load_spacy_pipeline
+
+WORDS = (
+    'process thread memory kernel scheduler cache network protocol packet database index '
+    'transaction algorithm complexity graph tree queue stack compiler register pipeline '
+    'virtual paging deadlock semaphore mutex latency throughput bandwidth encryption key'
+).split()
+NAMES = ['Alan Turing', 'Ada Lovelace', 'Linus Torvalds', 'Grace Hopper', 'Edsger Dijkstra']
+PLACES = ['Cambridge', 'London', 'Helsinki', 'Washington', 'Amsterdam']
+VERBS = ['is', 'are', 'was', 'can', 'will', 'must']
+
+MAX_KEY_SENTENCES = 10
+MCQ_SENTENCES = 12  # _generate_mcq looks at up to num_questions * 2 key sentences
+
+def make_notes(paragraphs, seed=7):
+    rng = random.Random(seed)
+    sentences = []
+    for _ in range(paragraphs * 6):
+        words = rng.sample(WORDS, rng.randint(6, 14))
+        words.insert(2, rng.choice(VERBS))
+        if rng.random() < 0.3:
+            words.append(f'according to {rng.choice(NAMES)} in {rng.choice(PLACES)}')
+        sentences.append(' '.join(words).capitalize() + '.')
+    return ' '.join(sentences)
+
+def score_sentences(sentences, sentence_words, stop_words):
+    """The _identify_key_sentences scoring, shared by both paths"""
+    if len(sentences) <= MAX_KEY_SENTENCES:
+        return list(sentences)
+    scored = []
+    for i, (sentence, words) in enumerate(zip(sentences, sentence_words)):
+        score = 1 - (i / len(sentences)) * 0.3
+        score += (min(len(words) / 20, 1) if len(words) > 5 else 0) * 0.5
+        score += sum(1 for word in words if word not in stop_words) / len(words) * 0.3
+        scored.append((sentence, score))
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return [sentence for sentence, _ in scored[:MAX_KEY_SENTENCES]]
+
+def legacy_analysis(nlp, content, stop_words):
+    """Previous flow: NLTK twice, a full spaCy parse for entities, pos_tag per MCQ sentence"""
+    sentence_count = len(sent_tokenize(content))
+    entities = [ent.text for ent in nlp(content).ents if len(ent.text.strip()) > 2][:20]
+    sentences = sent_tokenize(content)
+    key_sentences = score_sentences(sentences, [word_tokenize(s.lower()) for s in sentences], stop_words)
+    tags = [pos_tag(word_tokenize(sentence)) for sentence in key_sentences[:MCQ_SENTENCES]]
+    return sentence_count, entities, key_sentences, tags
+
+def shared_analysis(nlp, content, stop_words):
+    """Current flow: one AnnotatedDocument read by every stage"""
+    doc = AnnotatedDocument.from_spacy(nlp, content)
+    entities = [entity['text'] for entity in doc.entities if len(entity['text']) > 2][:20]
+    key_sentences = score_sentences(doc.sentences, doc.lower_tokens(), stop_words)
+    tags = [doc.pos_tags(sentence) for sentence in key_sentences[:MCQ_SENTENCES]]
+    return len(doc.sentences), entities, key_sentences, tags
+
+def timed(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), result
+
+def main():
+    paragraphs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    stop_words = set(stopwords.words('english'))
+    legacy_nlp = spacy.load('en_core_web_sm')
+    shared_nlp = load_spacy_pipeline()
+    print(f"Pipelines: legacy {legacy_nlp.pipe_names}, shared {shared_nlp.pipe_names}")
+
+    for size in sorted({max(1, paragraphs // 10), paragraphs}):
+        content = make_notes(size)
+        legacy_seconds, legacy = timed(lambda: legacy_analysis(legacy_nlp, content, stop_words), repeats)
+        shared_seconds, shared = timed(lambda: shared_analysis(shared_nlp, content, stop_words), repeats)
+
+        print(f"\n{size} paragraphs, {len(content.split())} words")
+        print(f"  legacy  {legacy_seconds * 1000:9.1f} ms  {legacy[0]} sentences, {len(legacy[1])} entities")
+        print(f"  shared  {shared_seconds * 1000:9.1f} ms  {shared[0]} sentences, {len(shared[1])} entities")
+        print(f"  speedup {legacy_seconds / shared_seconds:9.2f}x")
+        same = len(set(legacy[2]) & set(shared[2]))
+        print(f"  key sentences in common: {same}/{len(legacy[2])}")
+
+if __name__ == '__main__':
+    main()
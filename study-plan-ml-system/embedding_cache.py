@@ -0,0 +1,392 @@
+"""
+Embedding cache shared by the quiz services
+Course material repeats heavily, so the same keyphrases and sentences are
+embedded request after request. Vectors are kept by a hash of the
+normalized text in an in-process LRU and, across restarts and gunicorn
+workers, in memory-mapped float16 files on disk with append-only indexes,
+rotated so the oldest vectors make room once the disk budget is reached
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no file locks, so only one process should use a cache directory
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv('QUIZ_EMBEDDING_CACHE_DIR', 'embedding_cache')  # Empty keeps vectors in memory only
+LRU_SIZE = int(os.getenv('QUIZ_EMBEDDING_CACHE_SIZE', '20000'))  # Vectors per model kept in memory
+MAX_DISK_ROWS = int(os.getenv('QUIZ_EMBEDDING_CACHE_MAX_DISK_ROWS', '500000'))  # ~370MB at 384 dimensions; the oldest half goes when full
+
+def normalize(text: str) -> str:
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', text)).strip()
+
+def text_key(text: str) -> str:
+    return hashlib.blake2b(normalize(text).encode('utf-8'), digest_size=16).hexdigest()
+
+class DiskSegment:
+    """
+    One generation of a model's vectors on disk: row i of <path>.f16 belongs
+    to the key on line i + 2 of <path>.index, whose first line holds the
+    dimension. The files are kept open, so a segment keeps reading the
+    generation it opened after another process rotates it away.
+    """
+
+    def __init__(self, path):
+        self.index_path = f'{path}.index'
+        self.vectors_path = f'{path}.f16'
+        self.dim = None
+        self.rows = {}
+        self.count = 0
+        self.offset = 0
+        self.inode = None
+        self.index_file = None
+        self.vectors_file = None
+        self.vectors = None
+
+    def open(self):
+        """Open the files now at the segment's paths, if they exist"""
+        try:
+            index_file = open(self.index_path, 'rb')
+        except OSError:
+            return
+        try:
+            self.vectors_file = open(self.vectors_path, 'rb')
+        except OSError:
+            index_file.close()
+            return
+        self.index_file = index_file
+        self.inode = os.fstat(index_file.fileno()).st_ino
+        self.refresh()
+
+    def close(self):
+        for f in (self.index_file, self.vectors_file):
+            if f is not None:
+                f.close()
+        self.vectors = None
+
+    def refresh(self):
+        if self.index_file is None:
+            return
+        size = os.fstat(self.index_file.fileno()).st_size
+        if size <= self.offset:
+            return
+        self.index_file.seek(self.offset)
+        data = self.index_file.read(size - self.offset)
+        # Whole lines only; the rest is still being written
+        end = data.rfind(b'\n') + 1
+        lines = data[:end].decode('ascii').splitlines()
+        if self.offset == 0 and lines:
+            self.dim = int(lines.pop(0))
+        for line in lines:
+            self.rows.setdefault(line, self.count)
+            self.count += 1
+        self.offset += end
+
+    def get(self, key):
+        row = self.rows.get(key)
+        if row is None:
+            return None
+        if self.vectors is None or row >= len(self.vectors):
+            self.vectors = np.memmap(self.vectors_file, dtype=np.float16, mode='r', shape=(self.count, self.dim))
+        return np.array(self.vectors[row])
+
+class DiskTier:
+    """
+    Vectors of one model on disk, in two generations of up to max_rows / 2
+    rows: <model>.index/.f16 takes new rows and <model>.old.* holds the
+    generation before it. When the newest is full it becomes the old one
+    and the oldest vectors are dropped, so the cache keeps taking new
+    vectors within its budget. Writers append and rotate under an
+    exclusive lock on <model>.lock; readers pick up rows and rotations from
+    other processes with refresh().
+    """
+
+    def __init__(self, directory, name, max_rows):
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r'[^\w.-]', '_', name)
+        self.path = os.path.join(directory, slug)
+        self.lock_path = f'{self.path}.lock'
+        self.segment_rows = max(1, max_rows // 2)
+        self.rotations = 0
+        self.current = DiskSegment(self.path)
+        self.previous = DiskSegment(f'{self.path}.old')
+        with self.locked(exclusive=False):
+            self.load()
+
+    @property
+    def vectors_path(self):
+        return self.current.vectors_path
+
+    @property
+    def count(self):
+        return self.current.count + self.previous.count
+
+    @property
+    def fill(self):
+        """Share of the newest generation in use; it rotates when full"""
+        return self.current.count / self.segment_rows
+
+    @contextmanager
+    def locked(self, exclusive=True):
+        with open(self.lock_path, 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def load(self):
+        """Reopen both generations from the files now on disk (lock held)"""
+        for segment in (self.current, self.previous):
+            segment.close()
+        self.current = DiskSegment(self.path)
+        self.previous = DiskSegment(f'{self.path}.old')
+        self.current.open()
+        self.previous.open()
+
+    def rotated(self):
+        """Whether the newest generation on disk is not the one this tier has open"""
+        try:
+            inode = os.stat(self.current.index_path).st_ino
+        except OSError:
+            inode = None
+        return inode != self.current.inode
+
+    def refresh(self):
+        if self.rotated():
+            with self.locked(exclusive=False):
+                self.load()
+        else:
+            self.current.refresh()
+
+    def get(self, key):
+        vector = self.current.get(key)
+        if vector is None:
+            vector = self.previous.get(key)
+        return vector
+
+    def put_many(self, keys, vectors):
+        with self.locked():
+            if self.rotated():
+                self.load()
+            else:
+                self.current.refresh()
+            dim = self.current.dim or self.previous.dim
+            if dim is not None and dim != vectors.shape[1]:
+                logger.warning(f"Not caching {vectors.shape[1]}-dimensional vectors in {self.current.index_path} ({dim})")
+                return
+            dim = vectors.shape[1]
+
+            new = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self.current.rows and key not in self.previous.rows and key not in new:
+                    new[key] = vector
+            new = list(new.items())[:self.segment_rows]
+            if not new:
+                return
+            if self.current.count + len(new) > self.segment_rows:
+                self.rotate(dim)
+
+            current = self.current
+            header = b'' if current.dim else f'{dim}\n'.encode('ascii')
+            # Vectors first: an index line never points past the end of the file
+            fd = os.open(current.vectors_path, os.O_RDWR | os.O_CREAT, 0o644)
+            with os.fdopen(fd, 'r+b') as out:
+                out.seek(current.count * dim * 2)
+                out.write(np.asarray([vector for _, vector in new], dtype=np.float16).tobytes())
+            with open(current.index_path, 'ab') as index:
+                index.write(header + ''.join(f'{key}\n' for key, _ in new).encode('ascii'))
+            if current.inode is None:
+                current.open()
+            else:
+                current.refresh()
+
+    def rotate(self, dim):
+        """Turn the full newest generation into the old one and start an empty one (lock held)"""
+        dropped = self.previous.count
+        for ext in ('.f16', '.index'):
+            os.replace(f'{self.path}{ext}', f'{self.path}.old{ext}')
+        open(f'{self.path}.f16', 'wb').close()
+        with open(f'{self.path}.index', 'wb') as index:
+            index.write(f'{dim}\n'.encode('ascii'))
+        self.rotations += 1
+        logger.info(f"Embedding cache {self.path} is full at {self.count} vectors: dropped the oldest {dropped}")
+        self.load()
+
+class EmbeddingCache:
+    """
+    Embeddings of one model, looked up in memory, then on disk, and computed
+    for the rest in one call. Vectors are stored and returned as float16
+    values (in float32 arrays) whether or not they were cached, so a text
+    always gets the same vector.
+    """
+
+    def __init__(self, name, directory=CACHE_DIR, lru_size=LRU_SIZE, max_disk_rows=MAX_DISK_ROWS):
+        self.name = name
+        self.lock = threading.Lock()
+        self.lru_size = lru_size
+        self.memory = OrderedDict()
+        self.disk = None
+        if directory:
+            try:
+                self.disk = DiskTier(directory, name, max_disk_rows)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Embedding cache for {name} kept in memory only: {e}")
+        self.hits = {'memory': 0, 'disk': 0}
+        self.misses = 0
+
+    def embed(self, texts, embed_fn):
+        """Embeddings of texts, one row each; embed_fn(list of texts) computes the uncached ones"""
+        keys = [text_key(text) for text in texts]
+        found = {}
+        missing = {}
+        with self.lock:
+            if self.disk:
+                self.disk.refresh()
+            for key, text in zip(keys, texts):
+                if key in found or key in missing:
+                    continue
+                vector = self.memory.get(key)
+                if vector is not None:
+                    self.memory.move_to_end(key)
+                    self.hits['memory'] += 1
+                elif self.disk:
+                    vector = self.disk.get(key)
+                    if vector is not None:
+                        self._remember(key, vector)
+                        self.hits['disk'] += 1
+                if vector is None:
+                    missing[key] = text
+                    self.misses += 1
+                else:
+                    found[key] = vector
+
+        if missing:
+            vectors = np.asarray(embed_fn(list(missing.values())), dtype=np.float32).astype(np.float16)
+            with self.lock:
+                for key, vector in zip(missing, vectors):
+                    found[key] = vector
+                    self._remember(key, vector)
+                if self.disk:
+                    try:
+                        self.disk.put_many(list(missing), vectors)
+                    except OSError as e:
+                        logger.warning(f"Could not write embeddings to {self.disk.vectors_path}: {e}")
+
+        if not keys:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([found[key] for key in keys]).astype(np.float32)
+
+    def _remember(self, key, vector):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.lru_size:
+            self.memory.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            hits = self.hits['memory'] + self.hits['disk']
+            lookups = hits + self.misses
+            return {
+                'memory_entries': len(self.memory),
+                'disk_entries': self.disk.count if self.disk else None,
+                'disk_fill': round(self.disk.fill, 4) if self.disk else None,
+                'disk_rotations': self.disk.rotations if self.disk else None,
+                'memory_hits': self.hits['memory'],
+                'disk_hits': self.hits['disk'],
+                'misses': self.misses,
+                'hit_ratio': round(hits / lookups, 4) if lookups else None
+            }
+
+caches = {}
+caches_lock = threading.Lock()
+
+def get_cache(name: str) -> EmbeddingCache:
+    """The process-wide cache of a model, shared by everything that embeds with it"""
+    with caches_lock:
+        if name not in caches:
+            caches[name] = EmbeddingCache(name)
+        return caches[name]
+
+def keybert_keywords(kw_model, docs, cache, keyphrase_ngram_range=(1, 1), stop_words='english', **kwargs):
+    """
+    KeyBERT extract_keywords over non-empty docs, one keyword list per doc.
+    Candidate n-grams are collected over all docs, so a phrase found in
+    several of them is embedded once; the docs and candidates go through
+    the cache and the misses are embedded in a single batch. Each doc is
+    still scored against its own candidates, as KeyBERT does for one.
+    """
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    vectorizer = CountVectorizer(ngram_range=keyphrase_ngram_range, stop_words=stop_words)
+    try:
+        words = vectorizer.fit(docs).get_feature_names_out()
+    except ValueError:
+        # Nothing but stop words
+        return [[] for _ in docs]
+
+    embeddings = cache.embed(list(docs) + list(words), kw_model.model.embed)
+    keywords = kw_model.extract_keywords(
+        docs,
+        vectorizer=vectorizer,
+        doc_embeddings=embeddings[:len(docs)],
+        word_embeddings=embeddings[len(docs):],
+        **kwargs
+    )
+    # KeyBERT unwraps the result of a single document
+    return [keywords] if len(docs) == 1 else keywords
+
+def render_metrics():
+    """Cache counters of every model in this process, in the Prometheus text format"""
+    stats = {name: cache.stats() for name, cache in sorted(caches.items())}
+    lines = [
+        '# HELP quiz_embedding_cache_lookups_total Embedding cache lookups by result',
+        '# TYPE quiz_embedding_cache_lookups_total counter'
+    ]
+    for name, s in stats.items():
+        for result, value in (('memory_hit', s['memory_hits']), ('disk_hit', s['disk_hits']), ('miss', s['misses'])):
+            lines.append(f'quiz_embedding_cache_lookups_total{{model="{name}",result="{result}"}} {value}')
+    lines += [
+        '# HELP quiz_embedding_cache_hit_ratio Share of lookups served from memory or disk',
+        '# TYPE quiz_embedding_cache_hit_ratio gauge'
+    ]
+    for name, s in stats.items():
+        lines.append(f'quiz_embedding_cache_hit_ratio{{model="{name}"}} {s["hit_ratio"] or 0}')
+    lines += [
+        '# HELP quiz_embedding_cache_entries Vectors held, by tier',
+        '# TYPE quiz_embedding_cache_entries gauge'
+    ]
+    for name, s in stats.items():
+        lines.append(f'quiz_embedding_cache_entries{{model="{name}",tier="memory"}} {s["memory_entries"]}')
+        if s['disk_entries'] is not None:
+            lines.append(f'quiz_embedding_cache_entries{{model="{name}",tier="disk"}} {s["disk_entries"]}')
+    lines += [
+        '# HELP quiz_embedding_cache_disk_fill_ratio Share of the newest disk generation in use; it is rotated out at 1',
+        '# TYPE quiz_embedding_cache_disk_fill_ratio gauge'
+    ]
+    for name, s in stats.items():
+        if s['disk_fill'] is not None:
+            lines.append(f'quiz_embedding_cache_disk_fill_ratio{{model="{name}"}} {s["disk_fill"]}')
+    lines += [
+        '# HELP quiz_embedding_cache_disk_rotations_total Disk generations this process rotated out, dropping the oldest vectors',
+        '# TYPE quiz_embedding_cache_disk_rotations_total counter'
+    ]
+    for name, s in stats.items():
+        if s['disk_rotations'] is not None:
+            lines.append(f'quiz_embedding_cache_disk_rotations_total{{model="{name}"}} {s["disk_rotations"]}')
+    return '\n'.join(lines) + '\n'
@@ -26,6 +26,8 @@ from transformers import (
 )
 import torch
 
+from serving import add_health_probes
+
 app = Flask(__name__)
 CORS(app)
 
@@ -600,6 +602,14 @@ def generate_quiz():
             'error': 'Failed to generate quiz. Please try again.'
         }), 500
 
+# The generator is built at import and falls back to rule-based questions when
+# its models fail to load, so there is no model state to wait for
+add_health_probes(app)
+
+def create_app():
+    """App factory for gunicorn; the generator is loaded at import, before workers fork"""
+    return app
+
 if __name__ == '__main__':
     print("🚀 Starting Enhanced Free Quiz Generation Service...")
     print("💰 Cost: $0 (Completely Free!)")
@@ -19,6 +19,8 @@ import os
 from typing import Dict, List, Any
 import google.generativeai as genai
 
+from serving import add_health_probes
+
 app = Flask(__name__)
 CORS(app)
 
@@ -346,6 +348,13 @@ def generate_quiz():
         }), 500
 
 
+# quiz_gen stays None without a key or when the Gemini client fails to initialize
+add_health_probes(app, lambda: quiz_gen is not None and bool(GEMINI_API_KEY))
+
+def create_app():
+    """App factory for gunicorn; the generator is loaded at import, before workers fork"""
+    return app
+
 if __name__ == '__main__':
     print("🚀 Starting Gemini AI Quiz Generation Service...")
     print(f"🤖 Model: {GeminiQuizGenerator().model_name}")
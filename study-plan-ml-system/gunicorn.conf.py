@@ -0,0 +1,77 @@
+"""
+Gunicorn settings for the quiz services
+
+    gunicorn -c gunicorn.conf.py 't5_quiz_service:create_app()'
+
+create_app() loads the service's models in the master before the workers
+fork (preload_app), so every worker shares one copy of the weights.
+Every service answers GET /health/live and GET /health/ready (503 until its
+generator is loaded or warmed up, and again from SIGTERM on while running
+quizzes finish). Settings come from the environment:
+
+    PORT / QUIZ_BIND            listen address (default 0.0.0.0:5002)
+    QUIZ_WEB_WORKERS            worker processes (default 2)
+    QUIZ_WEB_THREADS            threads per worker (default 1)
+    QUIZ_WEB_TIMEOUT            seconds before a stuck request is killed (default 180)
+    QUIZ_WEB_GRACEFUL_TIMEOUT   seconds running quizzes get on SIGTERM (default 120)
+    QUIZ_TORCH_THREADS          torch threads per worker (default cores / workers)
+
+quiz_ml_service loads its models on first use; QUIZ_ML_WARMUP=preload loads
+them in the master instead, shared by the workers, and QUIZ_ML_WARMUP=background
+loads them in each worker after it starts.
+
+Workers keep their own in-memory embedding cache but share the one on disk
+(QUIZ_EMBEDDING_CACHE_DIR, default ./embedding_cache; see embedding_cache.py).
+
+The Phi-3 services were written for one request at a time; give them more
+workers rather than threads.
+"""
+
+import multiprocessing
+import os
+import signal
+import sys
+
+bind = os.getenv('QUIZ_BIND', f"0.0.0.0:{os.getenv('PORT', '5002')}")
+workers = int(os.getenv('QUIZ_WEB_WORKERS', 2))
+threads = int(os.getenv('QUIZ_WEB_THREADS', 1))  # >1 switches to the gthread worker
+worker_class = 'gthread' if threads > 1 else 'sync'
+preload_app = True
+
+timeout = int(os.getenv('QUIZ_WEB_TIMEOUT', 180))  # CPU generation can take minutes
+graceful_timeout = int(os.getenv('QUIZ_WEB_GRACEFUL_TIMEOUT', 120))  # Let running quizzes finish on SIGTERM
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+
+# Torch threads per worker, so workers split the cores instead of each using all of them
+TORCH_THREADS = int(os.getenv('QUIZ_TORCH_THREADS', max(1, multiprocessing.cpu_count() // workers)))
+
+# Keep the master single-threaded while it loads models: an OpenMP pool
+# started before fork can deadlock the workers
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+
+def post_fork(server, worker):
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        torch.set_num_threads(TORCH_THREADS)
+
+def post_worker_init(worker):
+    # Services with a background warm-up (serving.add_warm_up) start it per worker
+    from serving import shutting_down, start_warm_up
+    start_warm_up(worker.wsgi)
+
+    # Fail readiness as soon as SIGTERM arrives, not once the worker has drained
+    handle_exit = worker.handle_exit
+
+    def handle_sigterm(sig, frame):
+        shutting_down.set()
+        handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    signal.siginterrupt(signal.SIGTERM, False)
+
+def worker_int(worker):
+    from serving import shutting_down
+    shutting_down.set()
@@ -18,6 +18,8 @@ import re
 import random
 from typing import Dict, List, Tuple
 
+from serving import add_health_probes
+
 app = Flask(__name__)
 CORS(app)
 
@@ -334,6 +336,13 @@ def generate_quiz():
             'error': str(e)
         }), 500
 
+# Templates only, no models to load
+add_health_probes(app)
+
+def create_app():
+    """App factory for gunicorn; the generator is loaded at import, before workers fork"""
+    return app
+
 if __name__ == '__main__':
     logger.info("=" * 80)
     logger.info("⚡ HYBRID Quiz Generation Service")
@@ -0,0 +1,93 @@
+"""
+Key sentence scoring for quiz generation
+Long documents are scored all at once from a sparse sentence-by-term count
+matrix instead of looping over sentences and words in Python. Below
+VECTORIZE_MIN_SENTENCES the matrix costs more to build than the loop it
+replaces (chunked quiz requests are usually that small), so short documents
+keep the loop; both give the same scores.
+"""
+
+import os
+from itertools import chain
+from typing import Iterable, List
+
+import numpy as np
+from scipy import sparse
+
+POSITION_WEIGHT = 0.3  # Earlier sentences score up to this much higher
+LENGTH_WEIGHT = 0.5  # Sentences of 20+ tokens get all of it, 5 or fewer none
+KEYWORD_WEIGHT = 0.3  # Times the share of tokens that are not stop words
+VECTORIZE_MIN_SENTENCES = int(os.getenv('QUIZ_VECTORIZE_MIN_SENTENCES', '400'))  # Break-even measured with benchmark_key_sentences.py
+
+def term_matrix(tokens: List[List[str]]):
+    """Lowercased term counts of each sentence (CSR) and the terms of its columns"""
+    lengths = np.fromiter((len(sentence) for sentence in tokens), dtype=np.int64, count=len(tokens))
+    indptr = np.concatenate(([0], np.cumsum(lengths)))
+    # Number the distinct tokens as written, then merge their lowercase forms:
+    # the vocabulary is far smaller than the text
+    vocabulary = {}
+    columns = np.fromiter(
+        (vocabulary.setdefault(token, len(vocabulary)) for token in chain.from_iterable(tokens)),
+        dtype=np.int64, count=indptr[-1]
+    )
+    terms, lower_columns = np.unique(np.char.lower(np.array(list(vocabulary), dtype=str)), return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(columns)), lower_columns.reshape(-1)[columns], indptr),
+        shape=(len(tokens), len(terms))
+    )
+    matrix.sum_duplicates()
+    return matrix, terms
+
+def score_sentences(tokens: List[List[str]], stop_words: Iterable[str]) -> np.ndarray:
+    """
+    Score of each sentence: position, plus medium length, plus the density
+    of non-stop-word tokens, with the weights above
+    """
+    if len(tokens) < VECTORIZE_MIN_SENTENCES:
+        return score_sentences_loop(tokens, stop_words)
+    return score_sentences_vectorized(tokens, stop_words)
+
+def score_sentences_loop(tokens: List[List[str]], stop_words: Iterable[str]) -> np.ndarray:
+    """score_sentences one sentence at a time"""
+    stop_words = stop_words if isinstance(stop_words, (set, frozenset)) else set(stop_words)
+    count = len(tokens)
+    scores = np.zeros(count)
+    for i, words in enumerate(tokens):
+        length = len(words)
+        score = 1 - (i / count) * POSITION_WEIGHT
+        score += (min(length / 20, 1) if length > 5 else 0) * LENGTH_WEIGHT
+        if length:
+            score += sum(1 for word in words if word.lower() not in stop_words) / length * KEYWORD_WEIGHT
+        scores[i] = score
+    return scores
+
+def score_sentences_vectorized(tokens: List[List[str]], stop_words: Iterable[str]) -> np.ndarray:
+    """score_sentences from a sparse sentence-by-term count matrix"""
+    count = len(tokens)
+    if count == 0:
+        return np.zeros(0)
+    matrix, terms = term_matrix(tokens)
+    lengths = np.asarray(matrix.sum(axis=1)).reshape(-1)
+
+    position = 1 - (np.arange(count) / count) * POSITION_WEIGHT
+    length = np.where(lengths > 5, np.minimum(lengths / 20, 1), 0)
+    content_terms = ~np.isin(terms, list(stop_words))
+    content_counts = matrix @ content_terms.astype(np.float64)
+    density = np.divide(content_counts, lengths, out=np.zeros(count), where=lengths > 0)
+
+    return position + length * LENGTH_WEIGHT + density * KEYWORD_WEIGHT
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, highest first; equal scores keep
+    document order, as a stable sort would
+    """
+    if k >= len(scores):
+        return np.lexsort((np.arange(len(scores)), -scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    threshold = scores[np.argpartition(-scores, k - 1)[:k]].min()
+    above = np.flatnonzero(scores > threshold)
+    tied = np.flatnonzero(scores == threshold)[:k - len(above)]
+    chosen = np.concatenate((above, tied))
+    return chosen[np.lexsort((chosen, -scores[chosen]))]
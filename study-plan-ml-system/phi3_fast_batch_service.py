@@ -21,6 +21,8 @@ from transformers import AutoModelForCausalLM, AutoTokenizer
 import torch
 from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 
+from serving import add_health_probes
+
 app = Flask(__name__)
 CORS(app)
 
@@ -352,6 +354,13 @@ def generate_quiz():
         logger.error(f"Error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# quiz_generator stays None when Phi-3 fails to load at import
+add_health_probes(app, lambda: quiz_generator is not None)
+
+def create_app():
+    """App factory for gunicorn; the generator is loaded at import, before workers fork"""
+    return app
+
 if __name__ == '__main__':
     print("\n" + "=" * 80)
     print("⚡ Phi-3 Quiz Service - FAST BATCH MODE")
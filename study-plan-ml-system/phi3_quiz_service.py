@@ -25,6 +25,8 @@ from typing import Dict, List
 import torch
 from transformers import AutoModelForCausalLM, AutoTokenizer
 
+from serving import add_health_probes
+
 app = Flask(__name__)
 CORS(app)
 
@@ -390,6 +392,13 @@ def generate_quiz():
             'error': str(e)
         }), 500
 
+# Phi-3 loads at import and the import fails without it: nothing to wait for
+add_health_probes(app)
+
+def create_app():
+    """App factory for gunicorn; the generator is loaded at import, before workers fork"""
+    return app
+
 if __name__ == '__main__':
     print("\n" + "=" * 80)
     print("🚀 Phi-3-Mini Quiz Generation Service")
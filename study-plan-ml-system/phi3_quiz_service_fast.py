@@ -19,6 +19,8 @@ from typing import Dict, List
 import torch
 from transformers import AutoModelForCausalLM, AutoTokenizer
 
+from serving import add_health_probes
+
 app = Flask(__name__)
 CORS(app)
 
@@ -298,6 +300,16 @@ def generate_quiz():
             'error': str(e)
         }), 500
 
+# The generator is loaded by create_app(); None when the app was served without it
+add_health_probes(app, lambda: generator is not None)
+
+def create_app():
+    """App factory for gunicorn: loads the generator before workers fork"""
+    global generator
+    if generator is None:
+        generator = FastPhi3QuizGenerator()
+    return app
+
 if __name__ == '__main__':
     logger.info("=" * 80)
     logger.info("⚡ FAST Phi-3-Mini Quiz Generation Service")
@@ -310,7 +322,7 @@ if __name__ == '__main__':
     logger.info("=" * 80)
     
     # Initialize generator
-    generator = FastPhi3QuizGenerator()
+    create_app()
     
     # Start Flask app
     app.run(host='0.0.0.0', port=5002, debug=False, threaded=False)
@@ -15,6 +15,8 @@ from typing import List
 import re
 import time
 
+from serving import add_health_probes
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
@@ -490,6 +492,16 @@ def generate_quiz():
         logger.error(f"Error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# The generator is loaded by create_app(); None when the app was served without it
+add_health_probes(app, lambda: generator is not None)
+
+def create_app():
+    """App factory for gunicorn: loads the generator before workers fork"""
+    global generator
+    if generator is None:
+        generator = SmartPhi3QuizGenerator()
+    return app
+
 if __name__ == '__main__':
     print("\n" + "="*60)
     print("🧠 Phi-3 SMART FALLBACK Quiz Service")
@@ -499,7 +511,7 @@ if __name__ == '__main__':
     print("✅ No more garbage: Uses full sentences, not single words")
     print("="*60 + "\n")
     
-    generator = SmartPhi3QuizGenerator()
+    create_app()
     
     print("\n🚀 Starting Flask server on http://127.0.0.1:5002")
     print("📊 Ready for quiz generation!\n")
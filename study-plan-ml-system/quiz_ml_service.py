@@ -10,6 +10,10 @@ using various ML techniques including:
 - Content analysis
 """
 
+import time
+
+STARTED = time.perf_counter()
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import json
@@ -20,22 +24,30 @@ import re
 import random
 from typing import Dict, List, Any, Tuple
 
-# ML/NLP Libraries
+# ML/NLP Libraries; transformers, KeyBERT and scikit-learn are imported by
+# the loaders that need them, on first use
 import nltk
-import spacy
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
-from sklearn.feature_extraction.text import TfidfVectorizer
-from keybert import KeyBERT
 import textstat
 
-# Download required NLTK data
-try:
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
-    nltk.download('wordnet', quiet=True)
-    nltk.download('averaged_perceptron_tagger', quiet=True)
-except:
-    pass
+from annotated_document import AnnotatedDocument, load_spacy_pipeline
+from embedding_cache import get_cache, keybert_keywords, render_metrics
+from key_sentences import score_sentences, top_k
+from serving import (
+    LazyModel, add_health_probes, add_metrics, add_warm_up, current_rss, models_ready, start_warm_up, warm_up_status
+)
+
+# off: load each model on first use; background: load them in a thread once a
+# worker starts; preload: load them before serving (in the gunicorn master
+# with preload_app, shared by the workers)
+QUIZ_ML_WARMUP = os.getenv('QUIZ_ML_WARMUP', 'off').lower()
+
+# NLTK data is never downloaded at runtime; install it with the image
+# (NLTK 3.9 and later read punkt_tab and averaged_perceptron_tagger_eng)
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'  # KeyBERT's default, shared with t5_quiz_service's embedding cache
+KEYPHRASE_NGRAM_RANGE = (1, 3)
+KEYWORD_BATCH_MAX_DOCS = int(os.getenv('QUIZ_KEYWORD_BATCH_MAX_DOCS', '64'))  # Contents per /extract-keywords-batch request
+
+NLTK_DATA_HINT = "python -m nltk.downloader punkt punkt_tab stopwords averaged_perceptron_tagger averaged_perceptron_tagger_eng"
 
 app = Flask(__name__)
 CORS(app)
@@ -46,61 +58,131 @@ logger = logging.getLogger(__name__)
 
 class QuizGenerator:
     def __init__(self):
-        """Initialize the quiz generation system"""
+        """Initialize the quiz generation system; models load on first use"""
         logger.info("Initializing Quiz Generator...")
         
-        # Load spaCy model
+        self.models = {
+            'spacy': LazyModel('spaCy en_core_web_sm', self._load_spacy, fallback='NLTK tokenizers, no entities'),
+            'keybert': LazyModel('KeyBERT', self._load_keybert, fallback='TF-IDF keywords'),
+            # Not used by any endpoint yet; loaded only if something asks for it
+            't5': LazyModel('T5 question generator', self._load_question_generator)
+        }
+        
+        self.embeddings = get_cache(EMBEDDING_MODEL)
+        
+        # NLTK components, from locally installed data only
+        self.stop_words = self._load_stop_words()
+        self.sent_tokenize, self.word_tokenize = self._load_tokenizers()
+        self.pos_tag = self._load_pos_tagger()
+        
+        logger.info("Quiz Generator initialized successfully!")
+    
+    @property
+    def nlp(self):
+        return self.models['spacy'].get()
+    
+    @property
+    def kw_model(self):
+        return self.models['keybert'].get()
+    
+    @property
+    def question_generator(self):
+        return self.models['t5'].get()
+    
+    def _load_spacy(self):
         try:
-            self.nlp = spacy.load("en_core_web_sm")
+            return load_spacy_pipeline()
         except OSError:
             logger.warning("spaCy model not found. Install with: python -m spacy download en_core_web_sm")
-            self.nlp = None
-        
-        # Initialize keyword extraction
-        self.kw_model = KeyBERT()
-        
-        # Initialize question generation pipeline (using T5)
+            raise
+    
+    def _load_keybert(self):
+        from keybert import KeyBERT
+        return KeyBERT(model=EMBEDDING_MODEL)
+    
+    def _load_question_generator(self):
+        from transformers import pipeline
+        return pipeline(
+            "text2text-generation",
+            model="t5-small",
+            tokenizer="t5-small"
+        )
+    
+    def _load_stop_words(self):
         try:
-            self.question_generator = pipeline(
-                "text2text-generation",
-                model="t5-small",
-                tokenizer="t5-small"
-            )
-        except Exception as e:
-            logger.warning(f"Question generation model not available: {e}")
-            self.question_generator = None
-        
-        # NLTK components
-        from nltk.corpus import stopwords
-        from nltk.tokenize import sent_tokenize, word_tokenize
+            from nltk.corpus import stopwords
+            return set(stopwords.words('english'))
+        except LookupError:
+            from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+            logger.warning(f"NLTK stopwords not found, using scikit-learn's list. Install with: {NLTK_DATA_HINT}")
+            return set(ENGLISH_STOP_WORDS)
+    
+    def _load_tokenizers(self):
+        from nltk.tokenize import NLTKWordTokenizer, sent_tokenize, word_tokenize
+        try:
+            sent_tokenize("Probe. Sentence.")
+            return sent_tokenize, word_tokenize
+        except LookupError:
+            logger.warning(f"NLTK punkt not found, splitting sentences on punctuation. Install with: {NLTK_DATA_HINT}")
+        
+        word_tokenizer = NLTKWordTokenizer()
+        def split_sentences(text):
+            return [s for s in re.split(r'(?<=[.!?])\s+', text.strip()) if s]
+        def split_words(text):
+            return [word for sentence in split_sentences(text) for word in word_tokenizer.tokenize(sentence)]
+        return split_sentences, split_words
+    
+    def _load_pos_tagger(self):
         from nltk.tag import pos_tag
-        
-        self.stop_words = set(stopwords.words('english'))
-        self.sent_tokenize = sent_tokenize
-        self.word_tokenize = word_tokenize
-        self.pos_tag = pos_tag
-        
-        logger.info("Quiz Generator initialized successfully!")
+        try:
+            pos_tag(['probe'])
+            return pos_tag
+        except LookupError:
+            pass
+        logger.warning(f"NLTK POS tagger not found, MCQs need spaCy. Install with: {NLTK_DATA_HINT}")
+        return lambda tokens: [(token, '') for token in tokens]
+    
+    def warm_up(self):
+        """Load the models the endpoints use and run one analysis through them"""
+        self.models['spacy'].get()
+        self.models['keybert'].get()
+        self.analyze_content("Warm-up text. The service loads its models before the first request.")
+    
+    def status(self) -> Dict[str, Any]:
+        return {name: model.status() for name, model in self.models.items()}
+    
+    def annotate(self, clean_content: str) -> AnnotatedDocument:
+        """Parse cleaned content once for every analysis and generation stage"""
+        if self.nlp and len(clean_content) < self.nlp.max_length:
+            try:
+                return AnnotatedDocument.from_spacy(self.nlp, clean_content)
+            except Exception as e:
+                logger.warning(f"spaCy parsing failed, using NLTK: {e}")
+        return AnnotatedDocument.from_nltk(clean_content, self.sent_tokenize, self.word_tokenize, self.pos_tag)
     
-    def analyze_content(self, content: str) -> Dict[str, Any]:
+    def analyze_content(self, content: str, doc: AnnotatedDocument = None) -> Dict[str, Any]:
         """Analyze the content to understand its structure and key concepts"""
         
         # Clean content
         clean_content = self._clean_text(content)
         
+        # Parse once; every stage below reads the same annotations
+        if doc is None:
+            doc = self.annotate(clean_content)
+        
         # Basic statistics
         word_count = len(clean_content.split())
-        sentence_count = len(self.sent_tokenize(clean_content))
+        sentence_count = len(doc.sentences)
         reading_level = textstat.flesch_reading_ease(clean_content)
         
         # Extract keywords
         keywords = self._extract_keywords(clean_content)
         
         # Extract named entities
-        entities = self._extract_entities(clean_content)
+        entities = self._extract_entities(doc)
         
         # Identify key sentences
-        key_sentences = self._identify_key_sentences(clean_content)
+        key_sentences = self._identify_key_sentences(doc)
         
         # Detect subject area
         subject_area = self._detect_subject_area(clean_content, keywords)
@@ -125,8 +207,9 @@ class QuizGenerator:
         if question_types is None:
             question_types = ['multiple_choice', 'true_false', 'fill_blank', 'short_answer']
         
-        # Analyze content first
-        analysis = self.analyze_content(content)
+        # Analyze content first, keeping its parse for the generators
+        doc = self.annotate(self._clean_text(content))
+        analysis = self.analyze_content(content, doc)
         
         # Generate questions based on analysis
         questions = {
@@ -142,7 +225,7 @@ class QuizGenerator:
         for q_type in question_types:
             if q_type == 'multiple_choice':
                 questions['multiple_choice'] = self._generate_mcq(
-                    content, analysis, min(questions_per_type, 6)
+                    content, analysis, min(questions_per_type, 6), doc
                 )
             elif q_type == 'true_false':
                 questions['true_false'] = self._generate_true_false(
@@ -181,22 +264,41 @@ class QuizGenerator:
     
     def _extract_keywords(self, content: str, max_keywords: int = 15) -> List[Dict[str, Any]]:
         """Extract important keywords using KeyBERT"""
-        try:
-            keywords = self.kw_model.extract_keywords(
-                content, 
-                keyphrase_ngram_range=(1, 3), 
-                stop_words='english',
-                top_k=max_keywords
-            )
-            return [{'keyword': kw[0], 'score': float(kw[1])} for kw in keywords]
-        except Exception as e:
-            logger.warning(f"Keyword extraction failed: {e}")
-            # Fallback: TF-IDF based extraction
-            return self._extract_keywords_tfidf(content, max_keywords)
+        return self.extract_keywords_batch([content], max_keywords)[0]
+    
+    def extract_keywords_batch(self, contents: List[str], max_keywords: int = 15) -> List[List[Dict[str, Any]]]:
+        """Keywords of each content, with one KeyBERT pass over all of them"""
+        kw_model = self.kw_model
+        if kw_model is not None:
+            try:
+                return self._keybert_keywords(kw_model, contents, max_keywords)
+            except Exception as e:
+                logger.warning(f"Keyword extraction failed: {e}")
+        # Fallback: TF-IDF based extraction
+        return [self._extract_keywords_tfidf(content, max_keywords) for content in contents]
+    
+    def _keybert_keywords(self, kw_model, contents: List[str], max_keywords: int) -> List[List[Dict[str, Any]]]:
+        """KeyBERT over the non-empty contents, with embeddings from the shared cache"""
+        results = [[] for _ in contents]
+        present = [i for i, content in enumerate(contents) if content.strip()]
+        if not present:
+            return results
+        
+        keywords = keybert_keywords(
+            kw_model,
+            [contents[i] for i in present],
+            self.embeddings,
+            keyphrase_ngram_range=KEYPHRASE_NGRAM_RANGE,
+            top_n=max_keywords
+        )
+        for i, doc_keywords in zip(present, keywords):
+            results[i] = [{'keyword': kw[0], 'score': float(kw[1])} for kw in doc_keywords]
+        return results
     
     def _extract_keywords_tfidf(self, content: str, max_keywords: int = 15) -> List[Dict[str, Any]]:
         """Fallback keyword extraction using TF-IDF"""
         try:
+            from sklearn.feature_extraction.text import TfidfVectorizer
             vectorizer = TfidfVectorizer(
                 max_features=max_keywords,
                 stop_words='english',
@@ -216,56 +318,22 @@ class QuizGenerator:
             logger.warning(f"TF-IDF keyword extraction failed: {e}")
             return []
     
-    def _extract_entities(self, content: str) -> List[Dict[str, str]]:
-        """Extract named entities from content"""
-        entities = []
-        
-        if self.nlp:
-            try:
-                doc = self.nlp(content)
-                for ent in doc.ents:
-                    if len(ent.text.strip()) > 2:  # Filter out very short entities
-                        entities.append({
-                            'text': ent.text.strip(),
-                            'label': ent.label_,
-                            'description': spacy.explain(ent.label_) or ent.label_
-                        })
-            except Exception as e:
-                logger.warning(f"Entity extraction failed: {e}")
-        
+    def _extract_entities(self, doc: AnnotatedDocument) -> List[Dict[str, str]]:
+        """Named entities found when the content was parsed"""
+        # Filter out very short entities
+        entities = [entity for entity in doc.entities if len(entity['text']) > 2]
         return entities[:20]  # Limit to top 20 entities
     
-    def _identify_key_sentences(self, content: str, max_sentences: int = 10) -> List[str]:
+    def _identify_key_sentences(self, doc: AnnotatedDocument, max_sentences: int = 10) -> List[str]:
         """Identify the most important sentences for question generation"""
-        sentences = self.sent_tokenize(content)
+        sentences = doc.sentences
         
         if len(sentences) <= max_sentences:
-            return sentences
-        
-        # Score sentences based on keyword density and position
-        sentence_scores = []
+            return list(sentences)
         
-        for i, sentence in enumerate(sentences):
-            score = 0
-            words = self.word_tokenize(sentence.lower())
-            
-            # Position score (earlier sentences get higher scores)
-            position_score = 1 - (i / len(sentences)) * 0.3
-            score += position_score
-            
-            # Length score (prefer medium-length sentences)
-            length_score = min(len(words) / 20, 1) if len(words) > 5 else 0
-            score += length_score * 0.5
-            
-            # Keyword score (sentences with important terms)
-            keyword_score = sum(1 for word in words if word not in self.stop_words) / len(words)
-            score += keyword_score * 0.3
-            
-            sentence_scores.append((sentence, score))
-        
-        # Sort by score and return top sentences
-        sentence_scores.sort(key=lambda x: x[1], reverse=True)
-        return [sent[0] for sent in sentence_scores[:max_sentences]]
+        # Score sentences based on keyword density, length and position
+        scores = score_sentences(doc.tokens, self.stop_words)
+        return [sentences[i] for i in top_k(scores, max_sentences)]
     
     def _detect_subject_area(self, content: str, keywords: List[Dict[str, Any]]) -> str:
         """Detect the subject area based on content and keywords"""
@@ -305,7 +373,8 @@ class QuizGenerator:
         else:
             return 'hard'
     
-    def _generate_mcq(self, content: str, analysis: Dict[str, Any], num_questions: int) -> List[Dict[str, Any]]:
+    def _generate_mcq(self, content: str, analysis: Dict[str, Any], num_questions: int,
+                      doc: AnnotatedDocument) -> List[Dict[str, Any]]:
         """Generate multiple choice questions"""
         questions = []
         keywords = analysis['keywords'][:10]  # Top 10 keywords
@@ -318,19 +387,19 @@ class QuizGenerator:
                 break
                 
             # Try to create question from sentence
-            question_data = self._create_mcq_from_sentence(sentence, keywords, entities)
+            question_data = self._create_mcq_from_sentence(sentence, keywords, entities, doc)
             if question_data:
                 questions.append(question_data)
                 question_count += 1
         
         return questions
     
-    def _create_mcq_from_sentence(self, sentence: str, keywords: List[Dict], entities: List[Dict]) -> Dict[str, Any]:
+    def _create_mcq_from_sentence(self, sentence: str, keywords: List[Dict], entities: List[Dict],
+                                  doc: AnnotatedDocument) -> Dict[str, Any]:
         """Create a multiple choice question from a sentence"""
         
-        # Find important terms in the sentence
-        words = self.word_tokenize(sentence)
-        pos_tags = self.pos_tag(words)
+        # Find important terms in the sentence, tagged when it was parsed
+        pos_tags = doc.pos_tags(sentence)
         
         # Look for nouns, proper nouns, and adjectives that could be answer choices
         important_terms = []
@@ -598,13 +667,20 @@ class QuizGenerator:
 
 # Initialize quiz generator
 quiz_gen = QuizGenerator()
+STARTUP_SECONDS = round(time.perf_counter() - STARTED, 3)
+logger.info(f"Started in {STARTUP_SECONDS}s, models load on first use")
 
 @app.route('/', methods=['GET'])
 def health_check():
     return jsonify({
         'status': 'healthy',
         'service': 'Quiz Generation ML Service',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'startup_seconds': STARTUP_SECONDS,
+        'rss_bytes': current_rss(),
+        'models': quiz_gen.status(),
+        'embedding_cache': quiz_gen.embeddings.stats(),
+        'warm_up': warm_up_status(app)
     })
 
 @app.route('/generate-quiz', methods=['POST'])
@@ -685,5 +761,74 @@ def analyze_content():
             'error': 'Failed to analyze content. Please try again.'
         }), 500
 
+@app.route('/extract-keywords-batch', methods=['POST'])
+def extract_keywords_batch():
+    """Keywords for many contents (e.g. the chunks of one note) in one request"""
+    
+    try:
+        data = request.json
+        
+        if not data or 'contents' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'Contents are required'
+            }), 400
+        
+        contents = data['contents']
+        max_keywords = data.get('max_keywords', 15)
+        
+        if not isinstance(contents, list) or not all(isinstance(content, str) for content in contents):
+            return jsonify({
+                'success': False,
+                'error': 'Contents must be a list of strings'
+            }), 400
+        
+        if not contents or len(contents) > KEYWORD_BATCH_MAX_DOCS:
+            return jsonify({
+                'success': False,
+                'error': f'Send between 1 and {KEYWORD_BATCH_MAX_DOCS} contents'
+            }), 400
+        
+        if not isinstance(max_keywords, int) or max_keywords < 1:
+            return jsonify({
+                'success': False,
+                'error': 'max_keywords must be a positive integer'
+            }), 400
+        
+        # Extract keywords, cleaned as analyze_content cleans its content
+        keywords = quiz_gen.extract_keywords_batch(
+            [quiz_gen._clean_text(content) for content in contents],
+            max_keywords
+        )
+        
+        return jsonify({
+            'success': True,
+            'results': [
+                {'index': i, 'keywords': doc_keywords}
+                for i, doc_keywords in enumerate(keywords)
+            ]
+        })
+        
+    except Exception as e:
+        logger.error(f"Batch keyword extraction error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to extract keywords. Please try again.'
+        }), 500
+
+# Ready once warm-up (if enabled) is done and each model loaded or fell back;
+# T5 is not used by any endpoint
+add_health_probes(app, lambda: models_ready(app, [quiz_gen.models['spacy'], quiz_gen.models['keybert']]))
+add_metrics(app, render_metrics)
+
+def create_app():
+    """App factory for gunicorn; QUIZ_ML_WARMUP decides when the models load"""
+    if QUIZ_ML_WARMUP == 'preload':
+        quiz_gen.warm_up()
+    elif QUIZ_ML_WARMUP == 'background':
+        add_warm_up(app, quiz_gen.warm_up)
+    return app
+
 if __name__ == '__main__':
+    start_warm_up(create_app())
     app.run(debug=True, host='0.0.0.0', port=5001)
@@ -0,0 +1,168 @@
+"""
+Production serving support shared by the quiz services
+Adds liveness and readiness probes and a /metrics endpoint to a service's
+Flask app, loads models on first use and warms them up in the background;
+see gunicorn.conf.py for the worker model
+"""
+
+import logging
+import os
+import resource
+import threading
+import time
+
+from flask import Response, jsonify
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def current_rss():
+    """Resident set size of this process in bytes"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        # No procfs (macOS): the peak is the best available figure, in bytes there
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+class LazyModel:
+    """
+    A model loaded on first get(), once, however many threads ask for it.
+    Records how long loading took and how much the process RSS grew, which
+    approximates the model's memory when models load one at a time. A
+    loader that fails is not retried: get() returns None from then on.
+    fallback names what the service does instead when the model is missing;
+    without one, a failed load makes the service not ready.
+    """
+
+    def __init__(self, name, loader, fallback=None):
+        self.name = name
+        self.loader = loader
+        self.fallback = fallback
+        self.lock = threading.Lock()
+        self.model = None
+        self.loaded = False
+        self.error = None
+        self.load_seconds = None
+        self.rss_bytes = None
+
+    def get(self):
+        if self.loaded:
+            return self.model
+        with self.lock:
+            if not self.loaded:
+                rss_before = current_rss()
+                started = time.perf_counter()
+                try:
+                    self.model = self.loader()
+                except Exception as e:
+                    logger.warning(f"Could not load {self.name}: {e}")
+                    self.error = str(e)
+                self.load_seconds = round(time.perf_counter() - started, 3)
+                self.rss_bytes = max(0, current_rss() - rss_before)
+                self.loaded = True
+                if self.model is not None:
+                    logger.info(f"Loaded {self.name} in {self.load_seconds}s (+{self.rss_bytes / 2**20:.0f}MB RSS)")
+        return self.model
+
+    def usable(self):
+        """Not tried yet, loaded, or failed with a fallback to use instead"""
+        return not self.loaded or self.model is not None or self.fallback is not None
+
+    def status(self):
+        return {
+            'loaded': self.loaded and self.model is not None,
+            'load_seconds': self.load_seconds,
+            'rss_bytes': self.rss_bytes,
+            'error': self.error,
+            'fallback': self.fallback if self.loaded and self.model is None else None
+        }
+
+def add_warm_up(app, warm_up):
+    """
+    Register warm_up() to run in a background thread of every serving
+    process (see start_warm_up); requests are served meanwhile, loading
+    whatever they need on demand
+    """
+    app.extensions['quiz_warm_up'] = {'fn': warm_up, 'thread': None, 'done': False}
+
+def start_warm_up(app):
+    """
+    Start the app's warm-up thread, if it has one, in this process. Call it
+    after forking: gunicorn.conf.py does so in post_worker_init, since a
+    thread started in the master would not exist in the workers.
+    """
+    state = app.extensions.get('quiz_warm_up')
+    if not state or state['thread'] is not None:
+        return
+
+    def run():
+        started = time.perf_counter()
+        try:
+            state['fn']()
+            logger.info(f"Warm-up finished in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            logger.warning(f"Warm-up failed: {e}")
+        state['done'] = True
+
+    state['thread'] = threading.Thread(target=run, name='quiz-warm-up', daemon=True)
+    state['thread'].start()
+
+def warm_up_status(app):
+    state = app.extensions.get('quiz_warm_up')
+    if not state:
+        return 'off'
+    if state['thread'] is None:
+        return 'pending'
+    return 'done' if state['done'] else 'running'
+
+def models_ready(app, models):
+    """
+    Readiness of a service with lazily loaded models: its warm-up, if it has
+    one, has finished, and every model in models is usable
+    """
+    if warm_up_status(app) in ('pending', 'running'):
+        return False
+    return all(model.usable() for model in models)
+
+# Set when the worker gets SIGTERM (gunicorn.conf.py), so readiness fails
+# while running requests drain
+shutting_down = threading.Event()
+
+def add_health_probes(app, is_ready=None):
+    """
+    Register GET /health/live (the process answers requests) and
+    GET /health/ready (the worker is not shutting down and is_ready(), if
+    given, holds: models loaded, keys configured). Services that cannot
+    import without their models pass no is_ready. Liveness never touches
+    the models, so a slow model load is not mistaken for a hung process.
+    """
+
+    @app.route('/health/live', methods=['GET'])
+    def liveness():
+        return jsonify({'status': 'alive'})
+
+    @app.route('/health/ready', methods=['GET'])
+    def readiness():
+        if shutting_down.is_set():
+            return jsonify({'status': 'shutting_down'}), 503
+        if is_ready is None:
+            return jsonify({'status': 'ready'})
+        try:
+            ready = is_ready()
+        except Exception as e:
+            return jsonify({'status': 'not_ready', 'error': str(e)}), 503
+        if not ready:
+            return jsonify({'status': 'not_ready'}), 503
+        return jsonify({'status': 'ready'})
+
+def add_metrics(app, render):
+    """
+    Register GET /metrics serving render() in the Prometheus text format.
+    Counters are per process: each gunicorn worker reports its own.
+    """
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
@@ -11,6 +11,8 @@ import re
 import random
 from typing import Dict, List, Any
 
+from serving import add_health_probes
+
 app = Flask(__name__)
 CORS(app)
 
@@ -204,9 +206,20 @@ def generate_quiz():
         }), 500
 
 
+# No models to load; the generator is built on first use if create_app did not
+add_health_probes(app)
+
+def create_app():
+    """App factory for gunicorn: loads the generator before workers fork"""
+    global quiz_gen
+    if quiz_gen is None:
+        quiz_gen = SimpleFreeQuizGenerator()
+    return app
+
 if __name__ == '__main__':
     print("🚀 Starting Simple Free Quiz Generation Service...")
     print("✅ No model downloads needed!")
     print("📍 Available at: http://localhost:5002")
     print()
+    create_app()
     app.run(debug=True, host='0.0.0.0', port=5002)
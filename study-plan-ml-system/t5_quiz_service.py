@@ -17,6 +17,11 @@ import re
 from typing import List, Tuple
 import time
 
+from embedding_cache import get_cache, keybert_keywords, render_metrics
+from serving import add_health_probes, add_metrics
+
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'  # Used by both KeyBERT and the sentence ranking
+
 # Download NLTK data
 try:
     nltk.data.find('tokenizers/punkt')
@@ -36,11 +41,14 @@ class IntelligentQuizGenerator:
         
         # KeyBERT for extracting key concepts from ANY content
         logger.info("Loading KeyBERT for concept extraction...")
-        self.kw_model = KeyBERT(model='all-MiniLM-L6-v2')
+        self.kw_model = KeyBERT(model=EMBEDDING_MODEL)
         
         # Sentence transformer for finding important sentences
         logger.info("Loading SentenceTransformer for semantic analysis...")
-        self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.sentence_model = SentenceTransformer(EMBEDDING_MODEL)
+        
+        # Same model for both, so they share cached phrase and sentence vectors
+        self.embeddings = get_cache(EMBEDDING_MODEL)
         
         logger.info("✅ AI models loaded!")
     
@@ -78,13 +86,15 @@ class IntelligentQuizGenerator:
         try:
             # Extract key concepts using KeyBERT (works for ANY domain!)
             # This uses transformers to understand semantic meaning
-            keywords = self.kw_model.extract_keywords(
-                content,
+            keywords = keybert_keywords(
+                self.kw_model,
+                [content],
+                self.embeddings,
                 keyphrase_ngram_range=(1, 3),  # 1-3 word phrases
                 stop_words='english',
                 top_n=15,  # Get top 15 concepts
                 diversity=0.7  # Diverse concepts
-            )
+            )[0]
             
             logger.info(f"✅ Extracted {len(keywords)} key concepts")
             
@@ -251,7 +261,7 @@ class IntelligentQuizGenerator:
             
             # Use sentence transformer to find most important/representative sentences
             # This uses AI to understand semantic importance
-            embeddings = self.sentence_model.encode(clean_sentences)
+            embeddings = self.embeddings.embed(clean_sentences, self.sentence_model.encode)
             
             # Calculate importance: sentences similar to the mean (central concepts)
             mean_embedding = embeddings.mean(axis=0)
@@ -389,7 +399,8 @@ def health():
         'service': 'T5 Intelligent Quiz Generator',
         'model': 'KeyBERT + SentenceTransformers',
         'quality': 'AI-powered concept extraction (works for ANY content)',
-        'speed': '15-30 seconds per quiz'
+        'speed': '15-30 seconds per quiz',
+        'embedding_cache': generator.embeddings.stats() if generator else None
     })
 
 @app.route('/generate-quiz', methods=['POST'])
@@ -413,6 +424,17 @@ def generate_quiz():
         logger.error(f"Error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# The generator is loaded by create_app(); None when the app was served without it
+add_health_probes(app, lambda: generator is not None)
+add_metrics(app, render_metrics)
+
+def create_app():
+    """App factory for gunicorn: loads the generator before workers fork"""
+    global generator
+    if generator is None:
+        generator = IntelligentQuizGenerator()
+    return app
+
 if __name__ == '__main__':
     print("\n" + "="*70)
     print("🧠 T5 INTELLIGENT Quiz Generator")
@@ -425,7 +447,7 @@ if __name__ == '__main__':
     print("✅ 100% Free, runs locally, no API limits")
     print("="*70 + "\n")
     
-    generator = IntelligentQuizGenerator()
+    create_app()
     
     print("\n🚀 Starting Flask server on http://127.0.0.1:5002")
     print("📊 Ready for INTELLIGENT quiz generation!\n")